@@ -0,0 +1,100 @@
+# benchmarks/container_selection.py
+"""
+Compara la Capa 1 original (un soup.select + get_text por selector y contenedor) con el recorrido
+único de src.html_extraction, y el constructor html.parser con lxml, sobre HTML guardados.
+Falla (código 1) si algún resultado difiere.
+
+Uso: python -m benchmarks.container_selection [archivo.html ...]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+from src.html_extraction import CANDIDATE_SELECTORS, available_parser, make_soup, scan_document, script_image_urls, select_main_container
+
+DEFAULT_FIXTURES = sorted(glob.glob(os.path.join('tests', 'fixtures', 'html', '*.html')))
+REPEATS = 5
+
+
+def legacy_select_main_container(soup):
+    """Copia de referencia del algoritmo anterior, cuadrático en el anidamiento."""
+    best_container = None
+    max_text_len = 0
+    for selector in CANDIDATE_SELECTORS:
+        for container in soup.select(selector):
+            text_len = len(container.get_text(strip=True))
+            if text_len > max_text_len:
+                max_text_len = text_len
+                best_container = container
+    return best_container, max_text_len
+
+
+def single_pass_select_main_container(soup):
+    candidates, _ = scan_document(soup)
+    return select_main_container(candidates)
+
+
+def best_of(fn, *args):
+    best, result = float('inf'), None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def describe(container):
+    if container is None:
+        return None
+    return (container.name, ' '.join(container.get('class') or []), container.get('id'), len(container.get_text(strip=True)))
+
+
+def extraction_fingerprint(soup):
+    """Contenedor elegido, sus <img> y las URLs de los <script>: lo que depende del constructor del árbol."""
+    container, text_len = single_pass_select_main_container(soup)
+    body = container or soup.body
+    images = [img.get('data-src') or img.get('src') for img in body.find_all('img')]
+    script_urls = [url for script in soup.find_all('script') if script.string for url in script_image_urls(script.string)]
+    return describe(container), text_len, images, script_urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('files', nargs='*', default=DEFAULT_FIXTURES)
+    args = parser.parse_args()
+
+    failures = 0
+    for path in args.files:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            html_content = f.read()
+        print(f"{path} ({len(html_content) / 1024:.0f} KB)")
+
+        soup = make_soup(html_content, 'html.parser')
+        legacy_time, legacy = best_of(legacy_select_main_container, soup)
+        single_time, single = best_of(single_pass_select_main_container, soup)
+        same = legacy[0] is single[0] and legacy[1] == single[1]
+        failures += not same
+        print(f"  Capa 1 original:        {legacy_time * 1000:8.2f} ms -> {describe(legacy[0])}")
+        print(f"  Capa 1 recorrido único: {single_time * 1000:8.2f} ms -> {describe(single[0])} "
+              f"({legacy_time / single_time:.1f}x) {'OK' if same else 'DIFERENTE'}")
+
+        fingerprints = {}
+        for backend in ('html.parser', 'lxml'):
+            if available_parser(backend) != backend:
+                print(f"  {backend}: no instalado, se omite.")
+                continue
+            parse_time, backend_soup = best_of(make_soup, html_content, backend)
+            fingerprints[backend] = extraction_fingerprint(backend_soup)
+            print(f"  Árbol con {backend:<12}: {parse_time * 1000:8.2f} ms")
+        if len(fingerprints) == 2:
+            same = fingerprints['html.parser'] == fingerprints['lxml']
+            failures += not same
+            print(f"  Extracción html.parser vs lxml: {'idéntica' if same else 'DIFERENTE'}")
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# benchmarks/curator_load.py
+"""
+Prueba de carga de extremo a extremo de curator.main sin Supabase, Gemini ni Internet.
+Encola N artículos de un servidor HTTP local en un Supabase en memoria, sustituye el modelo de visión
+por un stub y ejecuta el worker real; al terminar informa de throughput, latencia p50/p99 por URL, viajes a la BD
+y llamadas a Storage (contadas aparte).
+
+Uso:
+    python -m benchmarks.curator_load --urls 2000 --concurrency 8 --db-latency 0.02 --vision-latency 0.4
+    python -m benchmarks.curator_load --urls 500 -- --vision-batch-size 1   # argumentos extra para curator.py
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSupabase, FixtureServer, StubVisionModel
+
+# --- CONFIGURACIÓN ---
+WORKER_LOGGER_NAME = "curator-worker-v10"
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Percentil por rango más cercano; 0.0 si no hay valores."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def build_report(fake: FakeSupabase, server: FixtureServer, elapsed: float, url_count: int) -> dict:
+    latencies = fake.latencies()
+    round_trips = sum(fake.round_trips.values())
+    finished = len(latencies)
+    return {
+        'urls': url_count,
+        'estados': dict(fake.states()),
+        'segundos': round(elapsed, 2),
+        'urls_por_segundo': round(finished / elapsed, 2) if elapsed else 0.0,
+        'latencia_p50_s': round(percentile(latencies, 0.50), 3),
+        'latencia_p99_s': round(percentile(latencies, 0.99), 3),
+        'viajes_bd': round_trips,
+        'viajes_bd_por_url': round(round_trips / finished, 2) if finished else 0.0,
+        'viajes_bd_por_tipo': dict(sorted(fake.round_trips.items())),
+        'llamadas_storage': sum(fake.storage_calls.values()),
+        'llamadas_storage_por_tipo': dict(sorted(fake.storage_calls.items())),
+        'imagenes_guardadas': len(fake.images),
+        'objetos_storage': len(fake.objects),
+        'vision': dict(StubVisionModel.counters),
+        'peticiones_http': dict(server.counters),
+    }
+
+
+def print_report(report: dict):
+    print(f"URLs: {report['urls']} -> {report['estados']}")
+    print(f"Tiempo total: {report['segundos']:.2f}s, throughput: {report['urls_por_segundo']:.2f} URLs/s")
+    print(f"Latencia por URL: p50 {report['latencia_p50_s']:.3f}s, p99 {report['latencia_p99_s']:.3f}s")
+    print(f"Viajes a la BD: {report['viajes_bd']} ({report['viajes_bd_por_url']:.2f} por URL) {report['viajes_bd_por_tipo']}")
+    print(f"Llamadas a Storage: {report['llamadas_storage']} {report['llamadas_storage_por_tipo']}")
+    print(f"Imágenes guardadas: {report['imagenes_guardadas']}, objetos en Storage: {report['objetos_storage']}")
+    print(f"Modelo de visión: {report['vision']}")
+    print(f"Servidor de fixtures: {report['peticiones_http']}")
+
+
+def main():
+    argv = sys.argv[1:]
+    curator_args = []
+    if '--' in argv:
+        split = argv.index('--')
+        argv, curator_args = argv[:split], argv[split + 1:]
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--urls', type=int, default=1000, help='Artículos a encolar.')
+    parser.add_argument('--concurrency', type=int, default=8, help='--concurrency del curador (también su --per-host-limit).')
+    parser.add_argument('--images-per-article', type=int, default=6)
+    parser.add_argument('--db-latency', type=float, default=0.02, help='Segundos por viaje de ida y vuelta a la BD simulada.')
+    parser.add_argument('--http-latency', type=float, default=0.0, help='Segundos por petición al servidor de fixtures.')
+    parser.add_argument('--vision-latency', type=float, default=0.4, help='Segundos por petición al modelo de visión.')
+    parser.add_argument('--vision-error-rate', type=float, default=0.02, help='Fracción de peticiones de visión que fallan.')
+    parser.add_argument('--relevant-ratio', type=float, default=0.7, help='Fracción de imágenes que el stub aprueba.')
+    parser.add_argument('--json', dest='json_path', help='Guarda el informe en este archivo JSON.')
+    parser.add_argument('--verbose', action='store_true', help='Muestra el log del worker.')
+    args = parser.parse_args(argv)
+
+    server = FixtureServer(images_per_article=args.images_per_article, latency=args.http_latency)
+    server.start()
+    fake = FakeSupabase(latency=args.db_latency)
+    fake.enqueue([server.article_url(number) for number in range(args.urls)])
+    StubVisionModel.configure(latency=args.vision_latency, error_rate=args.vision_error_rate, relevant_ratio=args.relevant_ratio)
+
+    # Importación diferida: requiere las dependencias del curador (pero no sus servicios externos)
+    import curator
+    from src import content_processor, db_manager
+
+    db_manager.get_supabase_client = lambda logger: fake
+    content_processor.genai.GenerativeModel = StubVisionModel
+    if not args.verbose:
+        # get_logger no añade sus manejadores a un logger que ya tiene alguno
+        worker_log = logging.getLogger(WORKER_LOGGER_NAME)
+        worker_log.addHandler(logging.NullHandler())
+        worker_log.propagate = False
+
+    original_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='runa_carga_') as workdir:
+        # .runa_cache y output_images quedan aislados de los de las ejecuciones reales
+        os.chdir(workdir)
+        sys.argv = ['curator.py', '--concurrency', str(args.concurrency), '--per-host-limit', str(args.concurrency)] + curator_args
+        start = time.perf_counter()
+        try:
+            curator.main()
+        finally:
+            elapsed = time.perf_counter() - start
+            os.chdir(original_cwd)
+            server.close()
+
+    report = build_report(fake, server, elapsed, args.urls)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
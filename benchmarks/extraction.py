@@ -0,0 +1,144 @@
+# benchmarks/extraction.py
+"""
+Banco de pruebas de la extracción (parse_article_html) sobre un corpus de HTML guardados, sin navegador ni red.
+Mide por fixture la mediana de cada fase, el pico de memoria y los candidatos examinados, y falla
+(código 1) si empeora respecto a la línea base guardada más allá de la tolerancia.
+
+Uso:
+    python -m benchmarks.extraction                    # compara con la línea base
+    python -m benchmarks.extraction --update-baseline  # regenera la línea base (tras un cambio intencionado)
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+# --- CONFIGURACIÓN ---
+FIXTURES_DIR = os.path.join('tests', 'fixtures', 'html')
+BASELINE_PATH = os.path.join('benchmarks', 'baseline_extraction.json')
+# URL base ficticia para absolutizar rutas relativas; el corpus no depende de ella
+FIXTURE_BASE_URL = 'https://fixture.invalid/articulo'
+DEFAULT_REPEATS = 7
+# Empeoramiento relativo tolerado en tiempos y memoria antes de fallar
+DEFAULT_TOLERANCE = 0.5
+# Por debajo de estas diferencias absolutas el ruido de la máquina domina: no se consideran regresión
+MIN_TIME_DELTA_MS = 2.0
+MIN_MEMORY_DELTA_KB = 256
+PHASES = ['arbol', 'og_image', 'contenedor', 'img', 'fondos', 'scripts', 'dedup', 'urljoin']
+
+
+def profile_fixture(path: str, repeats: int, parser: str) -> dict:
+    """Ejecuta la extracción `repeats` veces (más una con tracemalloc) y resume tiempos, memoria y candidatos."""
+    # Importación diferida: compare() y los tests no necesitan las dependencias del curador
+    from src.content_processor import parse_article_html
+
+    quiet = logging.getLogger('benchmark-extraccion')
+    quiet.disabled = True
+    with open(path, encoding='utf-8', errors='replace') as f:
+        html_content = f.read()
+
+    samples = {phase: [] for phase in PHASES + ['total']}
+    profile = {}
+    for _ in range(repeats):
+        profile = {}
+        start = time.perf_counter()
+        metadata = parse_article_html(html_content, FIXTURE_BASE_URL, quiet, parser=parser, profile=profile)
+        samples['total'].append(time.perf_counter() - start)
+        if metadata is None:
+            raise RuntimeError(f"La extracción falló para {path}")
+        for phase in PHASES:
+            samples[phase].append(profile['tiempos'].get(phase, 0.0))
+
+    tracemalloc.start()
+    parse_article_html(html_content, FIXTURE_BASE_URL, quiet, parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'tamano_kb': round(len(html_content.encode('utf-8')) / 1024, 1),
+        'tiempos_ms': {phase: round(statistics.median(values) * 1000, 3) for phase, values in samples.items()},
+        'memoria_pico_kb': round(peak / 1024, 1),
+        'candidatos': profile['candidatos'],
+        'imagenes': metadata['urls_imagenes'],
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> list:
+    """Devuelve la lista de regresiones (texto) de `results` frente a `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        # Los candidatos y las imágenes son deterministas: cualquier cambio es un cambio de comportamiento
+        if result['candidatos'] != reference['candidatos']:
+            regressions.append(f"{name}: candidatos {reference['candidatos']} -> {result['candidatos']}")
+        if result['imagenes'] != reference['imagenes']:
+            regressions.append(f"{name}: las imágenes extraídas cambiaron ({len(reference['imagenes'])} -> {len(result['imagenes'])})")
+        for phase, value in result['tiempos_ms'].items():
+            before = reference['tiempos_ms'].get(phase)
+            if before is not None and value > before * (1 + tolerance) and value - before > MIN_TIME_DELTA_MS:
+                regressions.append(f"{name}: fase '{phase}' {before:.2f} ms -> {value:.2f} ms")
+        before = reference['memoria_pico_kb']
+        value = result['memoria_pico_kb']
+        if value > before * (1 + tolerance) and value - before > MIN_MEMORY_DELTA_KB:
+            regressions.append(f"{name}: memoria pico {before:.0f} KB -> {value:.0f} KB")
+    return regressions
+
+
+def print_report(results: dict):
+    header = f"{'fixture':<22}{'KB':>7}" + ''.join(f"{phase:>11}" for phase in PHASES + ['total']) + f"{'mem KB':>10}{'imgs':>6}"
+    print(header)
+    for name, result in results.items():
+        times = result['tiempos_ms']
+        print(f"{name:<22}{result['tamano_kb']:>7.0f}" + ''.join(f"{times[phase]:>11.2f}" for phase in PHASES + ['total'])
+              + f"{result['memoria_pico_kb']:>10.0f}{len(result['imagenes']):>6}")
+    print("Tiempos: mediana en ms por fase.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--fixtures', default=FIXTURES_DIR, help='Directorio con los HTML guardados.')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='JSON con la línea base.')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='Empeoramiento relativo tolerado (0.5 = 50%%).')
+    parser.add_argument('--parser', default='html.parser', help="Constructor del árbol: 'html.parser' o 'lxml'.")
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.fixtures, '*.html')))
+    if not paths:
+        print(f"No hay fixtures en {args.fixtures}.")
+        return 1
+    results = {os.path.basename(path): profile_fixture(path, args.repeats, args.parser) for path in paths}
+    print_report(results)
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Línea base actualizada en {args.baseline}.")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No existe la línea base {args.baseline}; genérala con --update-baseline.")
+        return 1
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    missing = sorted(set(results) - set(baseline))
+    if missing:
+        print(f"Fixtures sin línea base (no se comparan): {', '.join(missing)}")
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESIÓN: {regression}")
+    print("Sin regresiones." if not regressions else f"{len(regressions)} regresiones.")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+# benchmarks/fakes.py
+"""
+Dobles locales para las pruebas de carga del curador: un Supabase en memoria (las RPC de db_manager y Storage),
+un modelo de visión con latencia y tasa de error configurables, y un servidor HTTP con artículos e imágenes sintéticos.
+"""
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from src.canonical_url import canonicalize_url
+
+# --- CONFIGURACIÓN ---
+FAKE_STORAGE_URL = 'http://supabase.invalid/storage/v1/object/public'
+IMAGE_SIZE = (400, 300)
+TRACKING_PIXEL_SIZE = (1, 1)
+ARTICLE_PARAGRAPHS = 6
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Call:
+    """Equivalente a la petición que construye supabase-py: no hace nada hasta execute()."""
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def execute(self):
+        return FakeResponse(self._fn())
+
+
+class _FakeBucket:
+    def __init__(self, db, name: str):
+        self._db = db
+        self._name = name
+
+    def upload(self, path: str, file, file_options: dict | None = None):
+        data = file if isinstance(file, (bytes, bytearray)) else file.read()
+        self._db._storage_call('upload')
+        key = f"{self._name}/{path}"
+        upsert = str((file_options or {}).get('upsert', 'false')).lower() == 'true'
+        with self._db._lock:
+            if key in self._db.objects and not upsert:
+                # Mismo error que devuelve Storage al subir sin upsert un objeto existente
+                raise RuntimeError({'statusCode': 409, 'error': 'Duplicate', 'message': 'The resource already exists'})
+            self._db.objects[key] = bytes(data)
+        return FakeResponse({'Key': key})
+
+    def download(self, path: str) -> bytes:
+        self._db._storage_call('download')
+        with self._db._lock:
+            data = self._db.objects.get(f"{self._name}/{path}")
+        if data is None:
+            raise RuntimeError({'statusCode': '404', 'error': 'not_found', 'message': 'Object not found'})
+        return data
+
+    def get_public_url(self, path: str) -> str:
+        # En supabase-py se construye localmente: no es un viaje de ida y vuelta
+        return f"{FAKE_STORAGE_URL}/{self._name}/{path}"
+
+
+class _FakeStorage:
+    def __init__(self, db):
+        self._db = db
+
+    def from_(self, bucket: str) -> _FakeBucket:
+        return _FakeBucket(self._db, bucket)
+
+
+class FakeSupabase:
+    """
+    Cliente de Supabase en memoria con la misma semántica que las RPC de db_manager (cola con lease,
+    inicio, resolución canónica, final y fallo de la curación) y Storage. Cada llamada cuenta como un
+    viaje de ida y vuelta y espera `latency` segundos, como lo haría la red hasta PostgREST.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.storage = _FakeStorage(self)
+        self.urls = {}
+        self.assets = {}
+        self.images = []
+        self.objects = {}
+        # Viajes a la base de datos (RPC) y, aparte, llamadas a Storage: estas crecen con las imágenes, no con las URLs
+        self.round_trips = Counter()
+        self.storage_calls = Counter()
+        # url_id -> [inicio, fin] de la curación, para las latencias por URL
+        self.url_timings = {}
+        self._lock = threading.Lock()
+        self._next_asset_id = 1
+
+    def enqueue(self, urls: list) -> list:
+        with self._lock:
+            return [self._insert_url(url) for url in urls]
+
+    def _insert_url(self, url: str) -> int:
+        url_id = len(self.urls) + 1
+        self.urls[url_id] = {'id': url_id, 'url': url, 'estado': 'pendiente', 'ultimo_error': None,
+                             'worker_id': None, 'lease_expira': None, 'url_canonica': canonicalize_url(url)}
+        return url_id
+
+    def table(self, name: str):
+        raise NotImplementedError(f"FakeSupabase no implementa table('{name}'): el curador solo debería usar RPC y Storage.")
+
+    def rpc(self, function_name: str, params: dict) -> _Call:
+        handler = getattr(self, f'_rpc_{function_name}', None)
+        if handler is None:
+            raise NotImplementedError(f"FakeSupabase no implementa la RPC '{function_name}'.")
+
+        def call():
+            self._round_trip(f'rpc:{function_name}')
+            with self._lock:
+                return handler(**params)
+        return _Call(call)
+
+    def _round_trip(self, kind: str):
+        with self._lock:
+            self.round_trips[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _storage_call(self, kind: str):
+        with self._lock:
+            self.storage_calls[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _rpc_reclamar_urls(self, p_worker_id, p_limite, p_lease_segundos=900):
+        now = time.time()
+        claimed = []
+        for row in self.urls.values():
+            if len(claimed) >= p_limite:
+                break
+            if row['estado'] == 'pendiente' or (row['estado'] == 'en_proceso' and (row['lease_expira'] or 0) < now):
+                row.update(estado='en_proceso', worker_id=p_worker_id, lease_expira=now + p_lease_segundos)
+                claimed.append(dict(row))
+        return claimed
+
+    def _rpc_renovar_leases(self, p_worker_id, p_lease_segundos=900):
+        rows = [row for row in self.urls.values() if row['worker_id'] == p_worker_id and row['estado'] == 'en_proceso']
+        for row in rows:
+            row['lease_expira'] = time.time() + p_lease_segundos
+        return len(rows)
+
+    def _rpc_liberar_urls(self, p_worker_id, p_ids):
+        for url_id in p_ids:
+            row = self.urls[url_id]
+            if row['worker_id'] == p_worker_id and row['estado'] == 'en_proceso':
+                row.update(estado='pendiente', worker_id=None, lease_expira=None)
+
+    def _rpc_iniciar_curacion(self, p_url_id, p_url, p_worker_id=None):
+        if not self._owns(p_url_id, p_worker_id):
+            return None
+        self.urls[p_url_id]['estado'] = 'en_proceso'
+        for asset_id in [a for a, asset in self.assets.items() if asset['source_url_id'] == p_url_id]:
+            del self.assets[asset_id]
+        self.images = [image for image in self.images if image['asset_id'] in self.assets]
+        asset_id = self._next_asset_id
+        self._next_asset_id += 1
+        self.assets[asset_id] = {'id': asset_id, 'source_url_id': p_url_id, 'url_original': p_url, 'estado_curacion': 'iniciado'}
+        self.url_timings[p_url_id] = [time.perf_counter(), None]
+        return asset_id
+
+    def _rpc_encolar_urls(self, p_urls):
+        # Como el ON CONFLICT DO NOTHING de la RPC: se ignora la URL literal ya encolada y la clave canónica repetida
+        inserted = 0
+        for url in p_urls:
+            key = canonicalize_url(url)
+            if any(row['url'] == url or row['url_canonica'] == key for row in self.urls.values()):
+                continue
+            self._insert_url(url)
+            inserted += 1
+        return inserted
+
+    def _rpc_resolver_url_canonica(self, p_url_id, p_url_canonica, p_worker_id=None):
+        if not self._owns(p_url_id, p_worker_id):
+            return None
+        key = canonicalize_url(p_url_canonica)
+        original = next((row['id'] for row in self.urls.values() if row['url_canonica'] == key and row['id'] != p_url_id), None)
+        if original is None:
+            self.urls[p_url_id]['url_canonica'] = key
+            return None
+        for asset_id in [a for a, asset in self.assets.items() if asset['source_url_id'] == p_url_id]:
+            del self.assets[asset_id]
+        self.urls[p_url_id].update(estado='duplicado', ultimo_error=f'Duplicado de la URL ID {original}', lease_expira=None)
+        self._finish(p_url_id)
+        return original
+
+    def _owns(self, url_id, worker_id) -> bool:
+        return worker_id is None or self.urls[url_id]['worker_id'] == worker_id
+
+    def _rpc_finalizar_curacion(self, p_url_id, p_asset_id, p_metadatos, p_imagenes, p_worker_id=None):
+        if not self._owns(p_url_id, p_worker_id):
+            return False
+        self.assets[p_asset_id].update(p_metadatos, estado_curacion='completado')
+        self.images.extend(dict(image, asset_id=p_asset_id) for image in p_imagenes)
+        self.urls[p_url_id].update(estado='completado', ultimo_error=None, lease_expira=None)
+        self._finish(p_url_id)
+        return True
+
+    def _rpc_fallar_curacion(self, p_url_id, p_asset_id, p_error, p_worker_id=None):
+        if not self._owns(p_url_id, p_worker_id):
+            return False
+        if p_asset_id in self.assets:
+            self.assets[p_asset_id]['estado_curacion'] = 'fallido'
+        self.urls[p_url_id].update(estado='error', ultimo_error=p_error, lease_expira=None)
+        self._finish(p_url_id)
+        return True
+
+    def _finish(self, url_id: int):
+        if url_id in self.url_timings:
+            self.url_timings[url_id][1] = time.perf_counter()
+
+    def latencies(self) -> list:
+        """Segundos entre el inicio y el final de la curación de cada URL terminada."""
+        return [end - start for start, end in self.url_timings.values() if end is not None]
+
+    def states(self) -> Counter:
+        return Counter(row['estado'] for row in self.urls.values())
+
+
+class StubVisionModel:
+    """
+    Sustituto de genai.GenerativeModel: responde con el mismo formato que el modelo real (un objeto JSON
+    por imagen o un array con 'indice' para los lotes), tras `latency` segundos y fallando con `error_rate`.
+    La relevancia se decide por el hash de los bytes, así que es estable entre ejecuciones.
+    """
+
+    latency = 0.0
+    error_rate = 0.0
+    relevant_ratio = 0.7
+    counters = Counter()
+    _lock = threading.Lock()
+    _random = random.Random(0)
+
+    @classmethod
+    def configure(cls, latency: float = 0.0, error_rate: float = 0.0, relevant_ratio: float = 0.7, seed: int = 0):
+        cls.latency = latency
+        cls.error_rate = error_rate
+        cls.relevant_ratio = relevant_ratio
+        cls.counters = Counter()
+        cls._random = random.Random(seed)
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @classmethod
+    def _verdict(cls, image_bytes: bytes) -> dict:
+        relevant = hashlib.sha256(image_bytes).digest()[0] < 256 * cls.relevant_ratio
+        return {
+            'tipo': 'fotografia_principal' if relevant else 'irrelevante',
+            'es_relevante': relevant,
+            'descripcion_ia': 'Imagen sintética de la prueba de carga.',
+        }
+
+    def generate_content(self, prompt_parts: list):
+        images = [part['data'] for part in prompt_parts if isinstance(part, dict)]
+        with self._lock:
+            self.counters['peticiones'] += 1
+            self.counters['imagenes'] += len(images)
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.counters['errores'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise RuntimeError("Error simulado del modelo de visión.")
+
+        verdicts = [self._verdict(image) for image in images]
+        # Las peticiones por lotes numeran las imágenes con "Imagen N:"
+        if any(isinstance(part, str) and part.startswith('Imagen ') for part in prompt_parts):
+            text = json.dumps([dict(verdict, indice=index) for index, verdict in enumerate(verdicts)], ensure_ascii=False)
+        else:
+            text = json.dumps(verdicts[0], ensure_ascii=False)
+        usage = SimpleNamespace(prompt_token_count=100 + 258 * len(images), candidates_token_count=30 * len(images))
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def make_png(width: int, height: int, seed: str) -> bytes:
+    """
+    PNG en escala de grises válido con una cuadrícula de 9x8 bloques cuyos tonos salen de `seed`:
+    imágenes distintas tienen bytes y dHash distintos, y siguen siendo muy comprimibles.
+    """
+    shades = hashlib.shake_128(seed.encode('utf-8')).digest(72)
+    rows = [b'\x00' + bytes(shades[block_row * 9 + x * 9 // width] for x in range(width)) for block_row in range(8)]
+    raw = b''.join(rows[y * 8 // height] for y in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+
+class FixtureServer:
+    """
+    Servidor HTTP local con artículos sintéticos (/articulo/<n>) y sus imágenes (/img/<nombre>.png).
+    Cada artículo tiene og:image, `images_per_article` imágenes propias, una imagen compartida entre
+    todos, un logo y un píxel de seguimiento, para ejercitar las capas 1-3, el prefiltro y las cachés.
+    """
+
+    def __init__(self, images_per_article: int = 6, latency: float = 0.0, host: str = '127.0.0.1'):
+        self.images_per_article = images_per_article
+        self.latency = latency
+        self.counters = Counter()
+        self._images = {}
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                if self.path.startswith('/articulo/'):
+                    body, content_type = server.article_html(self.path.rsplit('/', 1)[1]).encode('utf-8'), 'text/html; charset=utf-8'
+                    server._count('articulos')
+                elif self.path.startswith('/img/') and self.path.endswith('.png'):
+                    body, content_type = server.image_bytes(self.path[len('/img/'):-len('.png')]), 'image/png'
+                    server._count('imagenes')
+                else:
+                    self.send_error(404)
+                    return
+                # Los GET parciales del prefiltro reciben el archivo entero, como con un servidor que ignora Range
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self._httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='fixture-server', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def article_url(self, number: int) -> str:
+        return f"{self.base_url}/articulo/{number}"
+
+    def article_html(self, number: str) -> str:
+        paragraphs = ''.join(
+            f"<p>Párrafo {i} del artículo {number}: texto sintético suficiente para que la Capa 1 elija este contenedor.</p>"
+            f'<figure><img src="/img/a{number}-{i}.png" alt="Imagen {i}"></figure>' if i < self.images_per_article else
+            f"<p>Párrafo {i} del artículo {number} sin imagen.</p>"
+            for i in range(max(ARTICLE_PARAGRAPHS, self.images_per_article))
+        )
+        return (
+            f'<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"><title>Artículo {number}</title>'
+            f'<link rel="canonical" href="{self.article_url(number)}">'
+            f'<meta property="og:image" content="{self.base_url}/img/a{number}-portada.png"></head><body>'
+            f'<header><img src="/img/logo.png" alt="logo"></header>'
+            f'<main><article class="post"><h1>Artículo {number}</h1>{paragraphs}'
+            f'<img src="/img/compartida.png" alt="Imagen compartida"><img src="/img/pixel-{number}.png" alt=""></article></main>'
+            f'</body></html>'
+        )
+
+    def image_bytes(self, name: str) -> bytes:
+        with self._lock:
+            data = self._images.get(name)
+        if data is None:
+            width, height = TRACKING_PIXEL_SIZE if name.startswith('pixel-') else IMAGE_SIZE
+            data = make_png(width, height, name)
+            with self._lock:
+                self._images[name] = data
+        return data
@@ -0,0 +1,140 @@
+# benchmarks/templating.py
+"""
+Compara el renderizado de publish.py anterior (cinco str.replace encadenados sobre la plantilla completa
+y la tarjeta con f-strings) con las plantillas compiladas de src.templating, sobre miles de artículos sintéticos.
+Informa de artículos por segundo y del pico de memoria de cada variante, y falla (código 1) si la salida difiere.
+
+Uso: python -m benchmarks.templating [--articles 5000] [--template templates/plantilla_articulo.html]
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from src.templating import Template
+
+# --- CONFIGURACIÓN ---
+DEFAULT_ARTICLES = 5000
+REPEATS = 3
+ARTICLE_SLOTS = {'TITULO': 'Titulo', 'AUTOR': 'Autor', 'FECHA': 'Fecha', 'IMAGEN_URL': 'ImagenURL', 'CONTENIDOHTML': 'ContenidoHTML'}
+# Plantilla de ejemplo con el tamaño típico de una página del sitio (cabecera, navegación y pie)
+SAMPLE_TEMPLATE = (
+    '<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="UTF-8">\n<title>{{TITULO}} | Runa</title>\n'
+    + '<link rel="stylesheet" href="../css/estilos.css">\n' * 40
+    + '</head>\n<body class="bg-gray-50 text-gray-800">\n'
+    + '<nav class="container mx-auto px-6 py-4"><a href="../index.html" class="text-green-700">Runa</a></nav>\n' * 30
+    + '<article class="container mx-auto px-6 py-12">\n<h1 class="text-4xl font-bold">{{TITULO}}</h1>\n'
+    '<p class="text-gray-500">Por {{AUTOR}} · {{FECHA}}</p>\n<img src="{{IMAGEN_URL}}" alt="{{TITULO}}" class="w-full rounded-lg">\n'
+    '<div class="prose lg:prose-xl">{{CONTENIDOHTML}}</div>\n</article>\n'
+    + '<footer class="bg-gray-800 text-white py-8"><p>Runa · Archivo digital</p></footer>\n' * 30
+    + '</body>\n</html>\n'
+)
+# Misma tarjeta que publish.CARD_TEMPLATE (publish.py importa gspread, que el banco de pruebas no necesita)
+CARD_SOURCE = """
+                <!-- Tarjeta de Artículo -->
+                <div class="bg-white rounded-lg shadow-md overflow-hidden transform hover:-translate-y-2 transition-transform duration-300">
+                    <img src="{{IMAGEN_URL}}" alt="Imagen del artículo" class="w-full h-48 object-cover">
+                    <div class="p-6">
+                        <h2 class="text-xl font-bold mb-2">{{TITULO}}</h2>
+                        <p class="text-gray-600 mb-4">{{RESUMEN}}</p>
+                        <a href="publicaciones/{{SLUG}}.html" class="font-semibold text-green-700 hover:text-green-800 hover:underline">Leer más &rarr;</a>
+                    </div>
+                </div>"""
+CARD_TEMPLATE = Template(CARD_SOURCE)
+
+
+def synthetic_articles(count: int) -> list:
+    paragraph = '<p>' + 'Texto del artículo sobre memoria y territorio. ' * 12 + '</p>\n'
+    return [{
+        'Titulo': f'Artículo número {number}',
+        'Autor': f'Autora {number % 17}',
+        'Fecha': f'2026-{number % 12 + 1:02d}-{number % 28 + 1:02d}',
+        'ImagenURL': f'https://cdn.example.org/imagenes/{number}.jpg',
+        'ContenidoHTML': paragraph * (4 + number % 5),
+        'Resumen': f'Resumen del artículo {number}.',
+    } for number in range(count)]
+
+
+def legacy_render(template_source: str, article: dict) -> str:
+    """Copia de referencia del renderizado anterior de publish.py."""
+    content = template_source.replace('{{TITULO}}', article['Titulo'])
+    content = content.replace('{{AUTOR}}', article['Autor'])
+    content = content.replace('{{FECHA}}', article['Fecha'])
+    content = content.replace('{{IMAGEN_URL}}', article['ImagenURL'])
+    content = content.replace('{{CONTENIDOHTML}}', article['ContenidoHTML'])
+    return content
+
+
+def legacy_card(article: dict, slug: str) -> str:
+    return f"""
+                <!-- Tarjeta de Artículo -->
+                <div class="bg-white rounded-lg shadow-md overflow-hidden transform hover:-translate-y-2 transition-transform duration-300">
+                    <img src="{article['ImagenURL']}" alt="Imagen del artículo" class="w-full h-48 object-cover">
+                    <div class="p-6">
+                        <h2 class="text-xl font-bold mb-2">{article['Titulo']}</h2>
+                        <p class="text-gray-600 mb-4">{article['Resumen']}</p>
+                        <a href="publicaciones/{slug}.html" class="font-semibold text-green-700 hover:text-green-800 hover:underline">Leer más &rarr;</a>
+                    </div>
+                </div>"""
+
+
+def run_legacy(template_source: str, articles: list):
+    for number, article in enumerate(articles):
+        yield legacy_render(template_source, article), legacy_card(article, str(number))
+
+
+def run_compiled(template_source: str, articles: list):
+    template = Template(template_source, raw_slots=('CONTENIDOHTML',))
+    for number, article in enumerate(articles):
+        yield (
+            template.render({slot: article[column] for slot, column in ARTICLE_SLOTS.items()}),
+            CARD_TEMPLATE.render({'IMAGEN_URL': article['ImagenURL'], 'TITULO': article['Titulo'], 'RESUMEN': article['Resumen'], 'SLUG': str(number)}),
+        )
+
+
+def measure(fn, *args) -> tuple[float, float]:
+    """
+    (mejor tiempo en segundos, pico de memoria en KB). Cada página se descarta al renderizarse, como en publish.py
+    (que la escribe y pasa a la siguiente): el pico refleja la memoria temporal del renderizado, no la de los resultados.
+    """
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in fn(*args):
+            pass
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    for _ in fn(*args):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--articles', type=int, default=DEFAULT_ARTICLES)
+    parser.add_argument('--template', help='Plantilla de artículo real (por defecto, una de ejemplo de tamaño similar).')
+    args = parser.parse_args()
+
+    template_source = SAMPLE_TEMPLATE
+    if args.template:
+        with open(args.template, encoding='utf-8') as f:
+            template_source = f.read()
+    articles = synthetic_articles(args.articles)
+    print(f"{len(articles)} artículos, plantilla de {len(template_source) / 1024:.1f} KB")
+
+    legacy_time, legacy_peak = measure(run_legacy, template_source, articles)
+    compiled_time, compiled_peak = measure(run_compiled, template_source, articles)
+    print(f"  str.replace encadenados: {len(articles) / legacy_time:10.0f} artículos/s, pico {legacy_peak:8.1f} KB")
+    print(f"  plantilla compilada:     {len(articles) / compiled_time:10.0f} artículos/s, pico {compiled_peak:8.1f} KB "
+          f"({legacy_time / compiled_time:.1f}x)")
+
+    # Los artículos sintéticos no tienen caracteres especiales: el escapado no cambia la salida
+    same = all(old == new for old, new in zip(run_legacy(template_source, articles), run_compiled(template_source, articles)))
+    print(f"  Salida {'idéntica' if same else 'DIFERENTE'}")
+    return 0 if same else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
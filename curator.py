@@ -7,20 +7,501 @@ env_path = pathlib.Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 import os
+import hashlib
+import mimetypes
+import socket
 import uuid
 import argparse
+import asyncio
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse
 from src.utils import logger
 from src import db_manager, content_processor
+from src.browser_pool import AsyncBrowserPool, BrowserPool, DEFAULT_MAX_PAGES
+from src.page_readiness import DEFAULT_BUDGET_SECONDS, HostStats, PageReadiness
+from src.static_fetcher import TieredFetcher
+from src.image_cache import CachedImage, ImageCache
+from src.vision_cache import VisionCache
+from src.image_prefilter import ImagePrefilter
+from src.image_pipeline import DEFAULT_STAGE_WORKERS, ImagePipeline, parse_stage_workers
+from src.health_server import HealthServer
+from src.http_client import close_shared_http_client
+from src.asset_storage import AssetStorage
+from src.canonical_url import is_credible_canonical
+from src.image_derivatives import DEFAULT_WORKERS as DEFAULT_DERIVATIVE_WORKERS, DerivativeGenerator
+from src.metrics import METRICS_FORMATS, NULL_METRICS, Metrics
 
 IMAGES_OUTPUT_DIR = 'output_images'
+MAX_IMAGES_PER_ARTICLE = 10
+# Máximo de artículos del mismo host procesándose a la vez en modo concurrente
+DEFAULT_PER_HOST_LIMIT = 2
+# Modo daemon: sondeo de respaldo si no llega ningún NOTIFY, latido del event loop y puerto de salud
+DEFAULT_POLL_INTERVAL_SECONDS = 60.0
+HEARTBEAT_SECONDS = 5.0
+DEFAULT_HEALTH_PORT = 8080
+# Fases de la extracción que se exportan a las métricas, con el nivel (estático o navegador) como etiqueta
+EXTRACTION_PHASES = ('lanzamiento', 'navegacion', 'reto', 'scroll', 'parseo')
+
+def record_extraction_metrics(run_metrics: Metrics, timings: dict):
+    """Pasa a las métricas los tiempos por fase y los candidatos por capa que devuelve la extracción."""
+    if not run_metrics.enabled:
+        return
+    tier = timings.get('nivel', 'desconocido')
+    run_metrics.incr('urls_por_nivel', nivel=tier)
+    for phase in EXTRACTION_PHASES:
+        if phase in timings:
+            run_metrics.observe('extraccion_fase', timings[phase], fase=phase, nivel=tier)
+    for phase, seconds in timings.get('fases_parseo', {}).items():
+        run_metrics.observe('parseo_fase', seconds, fase=phase)
+    for kind, count in timings.get('candidatos', {}).items():
+        run_metrics.incr('candidatos_html', count, tipo=kind)
+
+def process_url(supabase, url_item: dict, log, extract, image_cache: ImageCache | None = None, vision_cache: VisionCache | None = None,
+                vision_batch_size: int = content_processor.VISION_BATCH_SIZE, prefilter: ImagePrefilter | None = None,
+                image_pipeline: ImagePipeline | None = None, run_metrics: Metrics = NULL_METRICS,
+                asset_storage: AssetStorage | None = None, local_copies: bool = True, derivatives: DerivativeGenerator | None = None,
+                worker_id: str | None = None):
+    """
+    Cura una URL de la cola: extrae el artículo, analiza sus imágenes y actualiza su estado.
+    `extract` recibe la URL y devuelve los metadatos (o None), con el navegador que corresponda al modo.
+    Con `image_cache`, cada imagen se descarga una sola vez para visión, disco y Storage;
+    con `vision_cache`, las imágenes ya analizadas en ejecuciones anteriores no vuelven al modelo.
+    Con `vision_batch_size` > 1, las imágenes del artículo se clasifican en lotes de ese tamaño.
+    Con `prefilter`, las candidatas pequeñas, desproporcionadas o duplicadas se descartan antes de la Capa 3.
+    `image_pipeline` reparte análisis, descarga y subida de las imágenes en pools de hilos compartidos.
+    `run_metrics` recibe la duración de cada fase y cuántas imágenes sobreviven a cada capa de filtrado.
+    Con `asset_storage`, las imágenes se guardan en Storage por el hash de su contenido (una vez por imagen distinta);
+    con `local_copies=False`, además, no se escriben en output_images/.
+    Con `derivatives` (requiere `asset_storage`), cada imagen descargada pasa por una etapa que genera y sube sus
+    variantes WebP/AVIF en varios anchos; se guardan en la columna 'variantes' de su fila.
+    Con `worker_id`, el resultado solo se guarda si la URL sigue reclamada por este worker.
+    Devuelve True si la URL quedó curada y False si se marcó como error (o su lease pasó a otro worker).
+    """
+    url_id, url = url_item['id'], url_item['url']
+    # Los registros de esta URL (y de las etapas de sus imágenes) llevan url_id, y asset_id una vez creado
+    log_context = logger.bind_log_context(url_id=url_id)
+    log.info("--- Procesando URL ID %s: %s ---", url_id, url)
+    # Todas las escrituras de la URL pasan por el writer: dos RPC en el caso feliz
+    writer = db_manager.CurationWriter(supabase, log, url_id, url, worker_id=worker_id)
+    started = time.perf_counter()
+    outcome = 'error'
+
+    master_asset_id = None
+    try:
+        # Marca 'en_proceso' y, para que la ejecución sea idempotente, borra el activo anterior
+        # de la URL (sus imágenes caen en cascada) antes de crear uno nuevo.
+        with run_metrics.span('fase', fase='bd_inicio'):
+            master_asset_id = writer.start()
+        if master_asset_id is None:
+            outcome = 'lease_perdido'
+            return False
+        logger.bind_log_context(asset_id=master_asset_id)
+
+        with run_metrics.span('fase', fase='extraccion'):
+            metadata = extract(url)
+        if not metadata: raise ValueError("Extracción de metadatos falló.")
+        # Los tiempos por fase van al log y a las métricas, no se guardan en la BD
+        record_extraction_metrics(run_metrics, metadata.pop('tiempos', {}))
+        
+        # Un artículo que llega con otra URL (utm_*, AMP, http...) y declara la canónica de uno ya
+        # encolado se descarta aquí, antes de gastar visión, descargas y subidas
+        canonical_url = metadata.pop('url_canonica', None)
+        if canonical_url and not is_credible_canonical(url, canonical_url):
+            log.info("URL ID %s: se ignora la canónica %s (otro host, portada o sección).", url_id, canonical_url)
+            canonical_url = None
+        if canonical_url and canonical_url != url:
+            original_id = writer.resolve_canonical(canonical_url)
+            if original_id is not None:
+                log.info("URL ID %s es un duplicado de la URL ID %s (canónica: %s). Se omite.", url_id, original_id, canonical_url)
+                outcome = 'duplicado'
+                return True
+
+        image_urls = metadata.pop('urls_imagenes', [])
+        # El HTML ya no se guarda en la BD, se usa y se descarta
+        metadata.pop('contenido_html', None)
+        
+        writer.set_metadata(metadata)
+
+        # Aplicar la restricción de procesar solo las primeras 10 imágenes
+        if prefilter is not None:
+            with run_metrics.span('fase', fase='prefiltro'):
+                image_urls_limitadas = prefilter.filter(image_urls, image_cache=image_cache, limit=MAX_IMAGES_PER_ARTICLE)
+        else:
+            image_urls_limitadas = image_urls[:MAX_IMAGES_PER_ARTICLE]
+        run_metrics.incr('imagenes', len(image_urls), etapa='extraidas')
+        run_metrics.incr('imagenes', len(image_urls_limitadas), etapa='a_capa3')
+        log.info("Se encontraron %s imágenes en el artículo. Procesando las primeras %s según la directiva.", len(image_urls), len(image_urls_limitadas))
+
+        # Importar json para procesar la respuesta de la IA
+        import json
+
+        # CAPA 3 por lotes: una o pocas peticiones al modelo para todas las imágenes del artículo
+        batched_analyses = None
+        vision_stats = content_processor.new_vision_stats()
+        vision_stats_lock = threading.Lock()
+        if vision_batch_size > 1 and image_urls_limitadas:
+            with run_metrics.span('fase', fase='vision_lotes'):
+                batched_analyses, vision_stats = content_processor.classify_images_batch(
+                    image_urls_limitadas, log, image_cache=image_cache, vision_cache=vision_cache, batch_size=vision_batch_size
+                )
+
+        def analyze_stage(i, image_url):
+            # CAPA 3: Analizar primero con la IA para la clasificación final
+            if batched_analyses is not None:
+                vision_analysis_json = batched_analyses[i]
+            else:
+                image_stats = content_processor.new_vision_stats()
+                vision_analysis_json = content_processor.analyze_image_with_vision(image_url, log, image_cache=image_cache, vision_cache=vision_cache, stats=image_stats)
+                # Las imágenes se analizan en hilos distintos: las estadísticas del artículo se suman bajo un lock
+                with vision_stats_lock:
+                    for key, value in image_stats.items():
+                        vision_stats[key] += value
+
+            if not vision_analysis_json:
+                log.warning("El análisis de visión no devolvió nada para %s. Se omite.", image_url)
+                run_metrics.incr('imagenes', etapa='capa3_sin_respuesta')
+                return None
+
+            # Parsear la respuesta JSON del modelo
+            try:
+                vision_data = json.loads(vision_analysis_json)
+            except json.JSONDecodeError as json_err:
+                log.error("Error al parsear JSON de la IA para %s: %s", image_url, json_err)
+                run_metrics.incr('imagenes', etapa='capa3_sin_respuesta')
+                return None
+
+            # Tomar la decisión final basada en la clasificación de la IA
+            if not vision_data.get('es_relevante') or vision_data.get('tipo') in ['logo_o_banner', 'irrelevante']:
+                log.info("Capa 3: Imagen descartada por filtro de IA (tipo: %s, relevante: %s): %s", vision_data.get('tipo'), vision_data.get('es_relevante'), image_url)
+                run_metrics.incr('imagenes', etapa='capa3_descartadas')
+                return None
+
+            # Si pasa el filtro, procedemos a descargar y guardar
+            log.info("Imagen APROBADA por la IA. Procediendo a descargar: %s", image_url)
+            run_metrics.incr('imagenes', etapa='capa3_aprobadas')
+            return image_url, vision_data
+
+        def download_stage(i, approved):
+            image_url, vision_data = approved
+            if not local_copies:
+                # Sin copia en output_images/: los bytes quedan en memoria y van directos a Storage
+                image = content_processor.fetch_image(url, image_url, log, image_cache=image_cache)
+                if image is not None:
+                    run_metrics.incr('imagenes', etapa='descargadas')
+                return image_url, vision_data, None, image, []
+            local_path = content_processor.download_image(
+                base_url=url, 
+                image_url=image_url, 
+                asset_id=master_asset_id, 
+                image_order=i, 
+                output_dir=IMAGES_OUTPUT_DIR, 
+                logger=log,
+                image_cache=image_cache
+            )
+            if local_path:
+                run_metrics.incr('imagenes', etapa='descargadas')
+            return image_url, vision_data, local_path, None, []
+
+        def derivatives_stage(i, downloaded):
+            # La codificación corre en el pool de procesos; este hilo solo espera y sube las variantes.
+            # Los bytes quedan resueltos para la subida del original, que ya no relee la copia local.
+            image_url, vision_data, local_path, image, _ = downloaded
+            if image is None and image_cache is not None:
+                image = image_cache.peek(image_url)
+            if image is None and local_path and os.path.exists(local_path):
+                with open(local_path, 'rb') as f:
+                    data = f.read()
+                image = CachedImage(data, mimetypes.guess_type(local_path)[0] or '', hashlib.sha256(data).hexdigest())
+            variants = derivatives.generate(image.data, image.sha256) if image is not None else []
+            return image_url, vision_data, local_path, image, variants
+
+        def upload_stage(i, downloaded):
+            image_url, vision_data, local_path, image, variants = downloaded
+            storage_url = None
+            if asset_storage is not None:
+                # Con la caché, los bytes se suben desde memoria sin releer la copia local.
+                # Aquí storage_url es la ruta del objeto; las URL públicas se resuelven en lote al final.
+                if image is None and image_cache is not None:
+                    image = image_cache.peek(image_url)
+                if image is not None:
+                    storage_url = asset_storage.store(image.data, image.content_type, sha256=image.sha256, source=image_url)
+                elif local_path:
+                    storage_url = asset_storage.store_file(local_path, source=image_url)
+            elif local_path:
+                storage_url = content_processor.upload_image_to_storage(supabase, local_path, master_asset_id, i, log, image_cache=image_cache, image_url=image_url)
+            if storage_url:
+                run_metrics.incr('imagenes', etapa='subidas')
+
+            # Guardar metadatos usando la información del JSON de la IA
+            return {
+                'asset_id': master_asset_id,
+                'url_original_imagen': image_url,
+                'url_almacenamiento': storage_url,
+                'descripcion_ia': vision_data.get('descripcion_ia'),
+                'tags_visuales_ia': vision_data.get('tipo'), # Usamos el 'tipo' como tag principal
+                'orden_aparicion': i,
+                'variantes': variants,
+            }
+
+        # Las imágenes avanzan en paralelo por las etapas; el índice conserva el orden de aparición
+        stages = [('analisis', analyze_stage), ('descarga', download_stage)]
+        if derivatives is not None and asset_storage is not None and derivatives.enabled:
+            stages.append(('derivados', derivatives_stage))
+        stages.append(('subida', upload_stage))
+        pipeline = image_pipeline or ImagePipeline(log, metrics=run_metrics)
+        with run_metrics.span('fase', fase='imagenes'):
+            image_rows, pipeline_stats = pipeline.run(image_urls_limitadas, stages)
+        if image_pipeline is None:
+            pipeline.close()
+        log.info("Pipeline de imágenes para URL ID %s: %s", url_id, ImagePipeline.format_stats(pipeline_stats))
+
+        if asset_storage is not None:
+            rows = [row for row in image_rows if row is not None]
+            public_urls = asset_storage.public_urls([row['url_almacenamiento'] for row in rows] +
+                                                    [variant['ruta'] for row in rows for variant in row['variantes']])
+            for image_row in rows:
+                image_row['url_almacenamiento'] = public_urls.get(image_row['url_almacenamiento'])
+                image_row['variantes'] = [dict({key: value for key, value in variant.items() if key != 'ruta'}, url=public_urls.get(variant['ruta']))
+                                          for variant in image_row['variantes']]
+
+        for image_row in image_rows:
+            if image_row is not None:
+                writer.add_image(image_row)
+                run_metrics.incr('imagenes', etapa='guardadas')
+
+        vision_mode = f"lotes de {vision_batch_size}" if batched_analyses is not None else "por imagen"
+        log.info(
+            "Visión para URL ID %s (%s): %d peticiones, %d+%d tokens, %.2fs de latencia, %d desde caché, %d reintentos individuales.",
+            url_id, vision_mode, vision_stats['peticiones'], vision_stats['tokens_entrada'], vision_stats['tokens_salida'],
+            vision_stats['latencia'], vision_stats['desde_cache'], vision_stats['reintentos_individuales']
+        )
+        run_metrics.incr('vision_peticiones', vision_stats['peticiones'])
+        run_metrics.incr('vision_tokens', vision_stats['tokens_entrada'], tipo='entrada')
+        run_metrics.incr('vision_tokens', vision_stats['tokens_salida'], tipo='salida')
+        run_metrics.incr('vision_desde_cache', vision_stats['desde_cache'])
+        if vision_stats['peticiones']:
+            run_metrics.observe('vision_latencia_por_url', vision_stats['latencia'])
+        with run_metrics.span('fase', fase='bd_cierre'):
+            if not writer.complete():
+                outcome = 'lease_perdido'
+                return False
+        log.info("URL ID %s curada con éxito.", url_id)
+        outcome = 'curada'
+        return True
+
+    except Exception as e:
+        log.error("Error procesando URL ID %s: %s", url_id, e)
+        writer.fail(str(e))
+        return False
+    finally:
+        log.info("Viajes de ida y vuelta a la BD para URL ID %s: %s.", url_id, writer.round_trips)
+        run_metrics.incr('viajes_bd', writer.round_trips)
+        run_metrics.observe('url', time.perf_counter() - started, resultado=outcome)
+        logger.reset_log_context(log_context)
+
+async def run_concurrent(process, claim, release, first_batch: list, log, readiness: PageReadiness, fetcher: TieredFetcher | None, concurrency: int, per_host_limit: int, browser_max_pages: int,
+                         wait_for_work=None, metrics: Counter | None = None):
+    """
+    Procesa hasta `concurrency` URLs a la vez con Playwright asíncrono.
+    `process(url_item, extract=...)` cura una URL; corre en un hilo por worker (BD e imágenes),
+    mientras la navegación se ejecuta en el event loop.
+    `claim()` reclama el siguiente lote de la cola cuando se agotan las URLs locales, hasta vaciarla.
+    Ante SIGTERM/SIGINT deja de tomar URLs nuevas y espera a que terminen las que están en curso;
+    las reclamadas que no se tomaron se devuelven a 'pendiente' con `release(ids)`.
+    Con `wait_for_work(stop_event)` (modo daemon) la cola vacía no termina la ejecución: los workers
+    esperan a que llegue trabajo nuevo. `metrics` acumula en curso, procesadas y fallidas.
+    """
+    loop = asyncio.get_running_loop()
+    pending = list(first_batch)
+    queue_drained = False
+    metrics = metrics if metrics is not None else Counter()
+    active_per_host = Counter()
+    slot_freed = asyncio.Condition()
+    stop_event = asyncio.Event()
+
+    async def wake_workers():
+        async with slot_freed:
+            slot_freed.notify_all()
+
+    def request_stop():
+        if not stop_event.is_set():
+            log.warning("Señal de parada recibida. Se terminarán las URLs en curso; %s reclamadas se devolverán a 'pendiente'.", len(pending))
+            stop_event.set()
+            loop.create_task(wake_workers())
+
+    installed_signals = []
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, request_stop)
+            installed_signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    async def next_item():
+        """Toma la primera URL pendiente cuyo host no haya alcanzado su límite de concurrencia."""
+        nonlocal queue_drained
+        while not stop_event.is_set():
+            async with slot_freed:
+                while not stop_event.is_set():
+                    # Contrapresión: solo se reclama a la BD cuando un worker está libre y no queda nada local
+                    if not pending and not queue_drained:
+                        batch = await asyncio.to_thread(claim)
+                        metrics['reclamos'] += 1
+                        queue_drained = not batch
+                        pending.extend(batch)
+                    if not pending:
+                        break
+                    for idx, item in enumerate(pending):
+                        host = urlparse(item['url']).hostname or ''
+                        if active_per_host[host] < per_host_limit:
+                            active_per_host[host] += 1
+                            return pending.pop(idx), host
+                    await slot_freed.wait()
+            if wait_for_work is None or stop_event.is_set():
+                break
+            # La espera se hace fuera del lock para no bloquear a los workers que terminan
+            await wait_for_work(stop_event)
+            queue_drained = False
+        return None, None
+
+    async with AsyncBrowserPool(log, max_pages=browser_max_pages) as browser_pool:
+        def extract(url):
+            # Se llama desde el hilo del worker; la navegación se delega al event loop.
+            future = asyncio.run_coroutine_threadsafe(
+                content_processor.extract_article_metadata_async(url, log, browser_pool, readiness, fetcher), loop
+            )
+            return future.result()
+
+        async def worker(executor):
+            while True:
+                url_item, host = await next_item()
+                if url_item is None:
+                    return
+                metrics['en_curso'] += 1
+                try:
+                    curated = await loop.run_in_executor(executor, partial(process, url_item, extract=extract))
+                    metrics['procesadas' if curated else 'fallidas'] += 1
+                except Exception as e:
+                    metrics['fallidas'] += 1
+                    log.error("Error no controlado procesando URL ID %s: %s", url_item['id'], e, exc_info=True)
+                finally:
+                    metrics['en_curso'] -= 1
+                    async with slot_freed:
+                        active_per_host[host] -= 1
+                        slot_freed.notify_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='curator') as executor:
+            await asyncio.gather(*(worker(executor) for _ in range(concurrency)))
+
+    if pending:
+        await asyncio.to_thread(release, [item['id'] for item in pending])
+    for sig in installed_signals:
+        loop.remove_signal_handler(sig)
+
+async def run_daemon(process, claim, release, first_batch: list, log, readiness: PageReadiness, fetcher: TieredFetcher | None, args,
+                     run_metrics: Metrics = NULL_METRICS):
+    """
+    Modo daemon: un solo proceso con la conexión a Supabase y Chromium calientes que no termina al vaciar la cola.
+    Se despierta con el NOTIFY del trigger de la cola (si hay SUPABASE_CONNECTION_STRING) o, como respaldo,
+    cada `args.poll_interval` segundos. SIGTERM/SIGINT lo detienen tras terminar las URLs en curso.
+    Con `run_metrics` activas, /metrics incluye también su resumen acumulado.
+    """
+    loop = asyncio.get_running_loop()
+    work_available = asyncio.Event()
+    metrics = Counter()
+    started = time.monotonic()
+    heartbeat = [started]
+
+    listener = None
+    dsn = os.getenv('SUPABASE_CONNECTION_STRING')
+    if dsn:
+        # psycopg2 solo hace falta en modo daemon
+        from src.queue_listener import QueueListener
+        listener = QueueListener(log, dsn, db_manager.NOTIFY_CHANNEL, on_notify=lambda: loop.call_soon_threadsafe(work_available.set))
+        listener.start()
+    else:
+        log.warning("SUPABASE_CONNECTION_STRING no definido: el daemon solo sondeará la cola cada %.0fs.", args.poll_interval)
+
+    async def wait_for_work(stop_event):
+        waiters = [asyncio.ensure_future(work_available.wait()), asyncio.ensure_future(stop_event.wait())]
+        done, _ = await asyncio.wait(waiters, timeout=args.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+        for waiter in waiters:
+            waiter.cancel()
+        if waiters[0] in done:
+            metrics['despertares_notify'] += 1
+            work_available.clear()
+        elif not done:
+            metrics['despertares_sondeo'] += 1
+
+    async def beat():
+        while True:
+            heartbeat[0] = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_SECONDS)
+
+    def snapshot():
+        # Se llama desde el hilo del servidor HTTP; solo lee contadores
+        now = time.monotonic()
+        extra = {'metricas': run_metrics.summary()} if run_metrics.enabled else {}
+        return {
+            'sano': now - heartbeat[0] < HEARTBEAT_SECONDS * 3,
+            'segundos_activo': round(now - started, 1),
+            'escucha_notify': listener.connected if listener is not None else False,
+            'notificaciones': listener.notifications if listener is not None else 0,
+            **{key: metrics[key] for key in ('en_curso', 'procesadas', 'fallidas', 'reclamos', 'despertares_notify', 'despertares_sondeo')},
+            **extra,
+        }
+
+    health = None
+    if args.health_port:
+        health = HealthServer(log, args.health_port, snapshot)
+        health.start()
+    heartbeat_task = asyncio.create_task(beat())
+    try:
+        await run_concurrent(process, claim, release, first_batch, log, readiness, fetcher, args.concurrency, args.per_host_limit,
+                             args.browser_max_pages, wait_for_work=wait_for_work, metrics=metrics)
+    finally:
+        heartbeat_task.cancel()
+        if health is not None:
+            health.close()
+        if listener is not None:
+            listener.close()
+        log.info("Daemon detenido: %s URLs curadas, %s fallidas.", metrics['procesadas'], metrics['fallidas'])
 
 def main():
     parser = argparse.ArgumentParser(description="Worker para curar activos de Runa.")
     parser.add_argument('--setup-db', action='store_true', help='Ejecuta la configuración inicial del schema de la base de datos.')
+    parser.add_argument('--browser-max-pages', type=int, default=DEFAULT_MAX_PAGES, help='Páginas que sirve un mismo Chromium antes de reciclarlo.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Número de artículos a curar en paralelo (1 = modo secuencial).')
+    parser.add_argument('--readiness-budget', type=float, default=DEFAULT_BUDGET_SECONDS, help='Segundos máximos por URL para esperar retos de seguridad y contenido dinámico.')
+    parser.add_argument('--browser-only', action='store_true', help='Desactiva el nivel de descarga estática (httpx) y usa siempre Chromium.')
+    parser.add_argument('--no-vision-cache', action='store_true', help='Ignora la caché persistente de análisis de visión y llama siempre al modelo.')
+    parser.add_argument('--vision-batch-size', type=int, default=content_processor.VISION_BATCH_SIZE, help='Imágenes por petición al modelo de visión (1 = una petición por imagen).')
+    parser.add_argument('--no-prefilter', action='store_true', help='Desactiva el prefiltro local (tamaño, proporción y duplicados) previo a la Capa 3.')
+    parser.add_argument('--stage-workers', type=parse_stage_workers, default=dict(DEFAULT_STAGE_WORKERS), help="Hilos por etapa del pipeline de imágenes, p. ej. 'analisis=4,descarga=6,subida=4'.")
+    parser.add_argument('--per-host-limit', type=int, default=DEFAULT_PER_HOST_LIMIT, help='Máximo de artículos simultáneos de un mismo host en modo concurrente.')
+    parser.add_argument('--claim-size', type=int, default=None, help='URLs que se reclaman de la cola en cada lote (por defecto, igual a --concurrency).')
+    parser.add_argument('--daemon', action='store_true', help='Mantiene el worker vivo y se despierta con LISTEN/NOTIFY (o sondeo) al llegar URLs nuevas.')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL_SECONDS, help='Modo daemon: segundos entre sondeos de respaldo de la cola.')
+    parser.add_argument('--health-port', type=int, default=DEFAULT_HEALTH_PORT, help='Modo daemon: puerto de /healthz y /metrics (0 lo desactiva).')
+    parser.add_argument('--lease-seconds', type=int, default=db_manager.DEFAULT_LEASE_SECONDS, help='Segundos que una URL reclamada queda reservada a este worker antes de poder reasignarse.')
+    parser.add_argument('--no-local-images', action='store_true', help='No guarda copia de las imágenes en output_images/: se suben a Storage desde memoria.')
+    parser.add_argument('--no-derivatives', action='store_true', help='No genera las variantes WebP/AVIF de las imágenes curadas.')
+    parser.add_argument('--derivative-workers', type=int, default=DEFAULT_DERIVATIVE_WORKERS, help='Procesos que codifican las variantes de las imágenes.')
+    parser.add_argument('--log-mode', choices=logger.LOG_MODES, default=None, help="'cola' escribe el log en segundo plano y en JSON (runa_automation.jsonl); por defecto, RUNA_LOG_MODE o 'sincrono'.")
+    parser.add_argument('--metrics-path', default=None, help='Guarda las métricas de la ejecución (tiempos por fase, imágenes por capa) en este archivo.')
+    parser.add_argument('--metrics-format', choices=METRICS_FORMATS, default='jsonl', help="Formato de --metrics-path: 'jsonl' (se añade) o 'prometheus' (se reemplaza).")
     args = parser.parse_args()
 
-    log = logger.get_logger("curator-worker-v10")
-    log.info(f"--- INICIANDO WORKER DE CURACIÓN v10.0 ---")
+    log = logger.get_logger("curator-worker-v10", mode=args.log_mode)
+    log.info("--- INICIANDO WORKER DE CURACIÓN v10.0 ---")
+    # Sin --metrics-path, todas las llamadas a las métricas vuelven de inmediato
+    run_metrics = Metrics(enabled=bool(args.metrics_path))
+    run_start = time.perf_counter()
 
     supabase = db_manager.get_supabase_client(log)
 
@@ -29,109 +510,88 @@ def main():
         return
 
     try:
-        urls_to_process = supabase.table(db_manager.URLS_TABLE).select('id, url').eq('estado', 'pendiente').execute().data
-        if not urls_to_process:
+        # Cada worker reclama lotes pequeños con lease, así varias instancias pueden drenar la cola a la vez
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        claim = run_metrics.timed(partial(db_manager.claim_urls, supabase, log, worker_id, args.claim_size or args.concurrency, args.lease_seconds),
+                                  'fase', fase='reclamo')
+        release = partial(db_manager.release_urls, supabase, log, worker_id)
+        first_batch = claim()
+        if not first_batch and not args.daemon:
             log.info("No hay URLs pendientes para procesar. Finalizando.")
             return
 
-        log.info(f"Se encontraron {len(urls_to_process)} URLs para procesar.")
-        for url_item in urls_to_process:
-            url_id, url = url_item['id'], url_item['url']
-            log.info(f"--- Procesando URL ID {url_id}: {url} ---")
-            supabase.table(db_manager.URLS_TABLE).update({'estado': 'en_proceso'}).eq('id', url_id).execute()
-            
-            master_asset_id = None
-            try:
-                # --- INICIO DE LIMPIEZA --- 
-                # Para asegurar que la ejecución sea idempotente, borramos cualquier activo existente para esta URL.
-                # La BD está configurada para borrar en cascada las imágenes asociadas.
-                log.info(f"Limpiando registros antiguos para URL ID {url_id} antes de procesar...")
-                supabase.table(db_manager.ASSETS_TABLE).delete().eq('source_url_id', url_id).execute()
-                log.info("Limpieza completada.")
-                # --- FIN DE LIMPIEZA ---
-
-                asset_response = supabase.table(db_manager.ASSETS_TABLE).insert({'source_url_id': url_id, 'url_original': url}, returning="representation").execute()
-                master_asset_id = asset_response.data[0]['id']
-
-                metadata = content_processor.extract_article_metadata(url, log)
-                if not metadata: raise ValueError("Extracción de metadatos falló.")
-                
-                image_urls = metadata.pop('urls_imagenes', [])
-                # El HTML ya no se guarda en la BD, se usa y se descarta
-                article_html = metadata.pop('contenido_html', '')
-                
-                supabase.table(db_manager.ASSETS_TABLE).update(metadata).eq('id', master_asset_id).execute()
-                log.info(f"Metadatos del artículo guardados para Asset ID {master_asset_id}.")
-
-                # Aplicar la restricción de procesar solo las primeras 10 imágenes
-                image_urls_limitadas = image_urls[:10]
-                log.info(f"Se encontraron {len(image_urls)} imágenes en el artículo. Procesando las primeras {len(image_urls_limitadas)} según la directiva.")
-
-                # Importar json para procesar la respuesta de la IA
-                import json
-
-                for i, image_url in enumerate(image_urls_limitadas):
-                    try:
-                        # CAPA 3: Analizar primero con la IA para la clasificación final
-                        vision_analysis_json = content_processor.analyze_image_with_vision(image_url, log)
-                        
-                        if not vision_analysis_json:
-                            log.warning(f"El análisis de visión no devolvió nada para {image_url}. Se omite.")
-                            continue
-
-                        # Parsear la respuesta JSON del modelo
-                        vision_data = json.loads(vision_analysis_json)
-
-                        # Tomar la decisión final basada en la clasificación de la IA
-                        if not vision_data.get('es_relevante') or vision_data.get('tipo') in ['logo_o_banner', 'irrelevante']:
-                            log.info(f"Capa 3: Imagen descartada por filtro de IA (tipo: {vision_data.get('tipo')}, relevante: {vision_data.get('es_relevante')}): {image_url}")
-                            continue
-
-                        # Si pasa el filtro, procedemos a descargar y guardar
-                        log.info(f"Imagen APROBADA por la IA. Procediendo a descargar: {image_url}")
-                        
-                        local_path = content_processor.download_image(
-                            base_url=url, 
-                            image_url=image_url, 
-                            asset_id=master_asset_id, 
-                            image_order=i, 
-                            output_dir=IMAGES_OUTPUT_DIR, 
-                            logger=log
-                        )
-                        
-                        storage_url = None
-                        if local_path:
-                            storage_url = content_processor.upload_image_to_storage(supabase, local_path, master_asset_id, i, log)
-                        
-                        # Guardar metadatos usando la información del JSON de la IA
-                        supabase.table(db_manager.IMAGES_TABLE).insert({
-                            'asset_id': master_asset_id,
-                            'url_original_imagen': image_url,
-                            'url_almacenamiento': storage_url,
-                            'descripcion_ia': vision_data.get('descripcion_ia'),
-                            'tags_visuales_ia': vision_data.get('tipo'), # Usamos el 'tipo' como tag principal
-                            'orden_aparicion': i
-                        }).execute()
-
-                    except json.JSONDecodeError as json_err:
-                        log.error(f"Error al parsear JSON de la IA para {image_url}: {json_err}")
-                    except Exception as img_exc:
-                        log.error(f"Error procesando imagen {image_url}: {img_exc}")
-
-                supabase.table(db_manager.ASSETS_TABLE).update({'estado_curacion': 'completado'}).eq('id', master_asset_id).execute()
-                supabase.table(db_manager.URLS_TABLE).update({'estado': 'completado'}).eq('id', url_id).execute()
-                log.info(f"URL ID {url_id} curada con éxito.")
-
-            except Exception as e:
-                log.error(f"Error procesando URL ID {url_id}: {e}")
-                if master_asset_id: supabase.table(db_manager.ASSETS_TABLE).update({'estado_curacion': 'fallido'}).eq('id', master_asset_id).execute()
-                supabase.table(db_manager.URLS_TABLE).update({'estado': 'error', 'ultimo_error': str(e)}).eq('id', url_id).execute()
+        # Las estadísticas por host persisten entre ejecuciones para saltar esperas en sitios estáticos
+        host_stats = HostStats()
+        readiness = PageReadiness(log, budget_seconds=args.readiness_budget, host_stats=host_stats)
+        fetcher = None if args.browser_only else TieredFetcher(log, host_stats=host_stats)
+        image_cache = ImageCache(log)
+        vision_cache = None if args.no_vision_cache else VisionCache(log, version=content_processor.VISION_CACHE_VERSION)
+        prefilter = None if args.no_prefilter else ImagePrefilter(log)
+        image_pipeline = ImagePipeline(log, stage_workers=args.stage_workers, metrics=run_metrics)
+        asset_storage = AssetStorage(log, supabase)
+        derivatives = None if args.no_derivatives else DerivativeGenerator(log, asset_storage, workers=args.derivative_workers)
+        process = partial(process_url, supabase, log=log, image_cache=image_cache, vision_cache=vision_cache,
+                          vision_batch_size=args.vision_batch_size, prefilter=prefilter, image_pipeline=image_pipeline, run_metrics=run_metrics,
+                          asset_storage=asset_storage, local_copies=not args.no_local_images, derivatives=derivatives, worker_id=worker_id)
+        run_metrics.observe('fase', time.perf_counter() - run_start, fase='inicializacion')
+        # Las URLs reclamadas (en curso o a la espera en el lote) no caducan mientras este proceso viva
+        lease_renewer = db_manager.LeaseRenewer(supabase, log, worker_id, args.lease_seconds)
+        lease_renewer.start()
+        try:
+            if args.daemon:
+                log.info("Modo daemon: %s workers, máximo %s por host.", args.concurrency, args.per_host_limit)
+                asyncio.run(run_daemon(process, claim, release, first_batch, log, readiness, fetcher, args, run_metrics=run_metrics))
+                return
+
+            if args.concurrency > 1:
+                log.info("Modo concurrente: %s workers, máximo %s por host.", args.concurrency, args.per_host_limit)
+                asyncio.run(run_concurrent(process, claim, release, first_batch, log, readiness, fetcher, args.concurrency, args.per_host_limit, args.browser_max_pages))
+                return
+
+            # Un único Chromium para toda la ejecución (se lanza solo si alguna URL lo necesita).
+            with BrowserPool(log, max_pages=args.browser_max_pages) as browser_pool:
+                extract = partial(content_processor.extract_article_metadata, logger=log, browser_pool=browser_pool, readiness=readiness, fetcher=fetcher)
+                batch = first_batch
+                while batch:
+                    for url_item in batch:
+                        process(url_item, extract=extract)
+                    batch = claim()
+        finally:
+            lease_renewer.stop()
+            host_stats.save()
+            image_pipeline.close()
+            if derivatives is not None:
+                derivatives.close()
+                derivatives.log_summary()
+                run_metrics.add_counters('variantes_imagenes', derivatives.counters, 'evento')
+            image_cache.close()
+            run_metrics.add_counters('cache_imagenes', image_cache.counters, 'evento')
+            asset_storage.log_summary()
+            run_metrics.add_counters('storage', asset_storage.counters, 'evento')
+            if prefilter is not None:
+                prefilter.close()
+                run_metrics.add_counters('prefiltro', prefilter.counters, 'evento')
+            if vision_cache is not None:
+                vision_cache.close()
+            if fetcher is not None:
+                fetcher.log_summary()
+                fetcher.close()
+                run_metrics.add_counters('descarga_estatica', fetcher.counters, 'evento')
+            close_shared_http_client(run_metrics)
+            run_metrics.observe('fase', time.perf_counter() - run_start, fase='ejecucion')
+            run_metrics.log_summary(log)
+            if args.metrics_path:
+                try:
+                    run_metrics.write(args.metrics_path, args.metrics_format, run_id=worker_id)
+                    log.info("Métricas de la ejecución guardadas en %s (%s).", args.metrics_path, args.metrics_format)
+                except OSError as e:
+                    log.warning("No se pudieron guardar las métricas en %s: %s", args.metrics_path, e)
 
     except Exception as e:
-        log.error(f"Error fatal en el worker: {e}", exc_info=True)
+        log.error("Error fatal en el worker: %s", e, exc_info=True)
         exit(1)
     finally:
-        log.info(f"--- EJECUCIÓN DEL WORKER FINALIZADA ---")
+        log.info("--- EJECUCIÓN DEL WORKER FINALIZADA ---")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
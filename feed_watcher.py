@@ -5,61 +5,124 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import feedparser
+import httpx
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from src.utils import logger
 from src import db_manager
+from src.http_client import HttpClient, close_shared_http_client, shared_http_client
 
 # --- CONFIGURACIÓN ---
 # Lista de RSS feeds a vigilar. Por ahora, solo Mongabay Latam.
 RSS_FEEDS = [
     "https://es.mongabay.com/feed/"
 ]
+# Feeds que se descargan a la vez
+FEED_FETCH_WORKERS = 8
+FEED_TIMEOUT_SECONDS = 20.0
 
 LOG = logger.get_logger("feed_watcher")
 
-def fetch_and_parse_feeds():
-    """Recorre la lista de RSS_FEEDS, los analiza y devuelve una lista de entradas."""
+def entry_id(entry) -> str | None:
+    """Identificador estable de una entrada: su guid/id o, en su defecto, el enlace."""
+    return entry.get('id') or entry.get('link')
+
+def new_entries_since(entries: list, last_seen_id: str | None) -> list:
+    """
+    Devuelve las entradas anteriores (más recientes) a la última vista en la ejecución previa.
+    Si esa entrada ya no aparece en el feed, se devuelven todas: el INSERT ignora las repetidas.
+    """
+    new_entries = []
+    for entry in entries:
+        if last_seen_id and entry_id(entry) == last_seen_id:
+            break
+        new_entries.append(entry)
+    return new_entries
+
+def fetch_feed(client: httpx.Client, feed_url: str, state: dict) -> tuple[list, dict | None]:
+    """
+    Descarga un feed con un GET condicional (ETag / Last-Modified).
+    Devuelve (entradas nuevas, estado actualizado), o ([], None) si el feed no cambió (304).
+    """
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+
+    response = client.get(feed_url, headers=headers, timeout=FEED_TIMEOUT_SECONDS)
+    if response.status_code == 304:
+        LOG.info(f"Feed {feed_url} sin cambios desde la última revisión (304).")
+        return [], None
+    response.raise_for_status()
+
+    parsed_feed = feedparser.parse(response.content, response_headers={k.lower(): v for k, v in response.headers.items()})
+    if parsed_feed.bozo:
+        # Bozo es 1 si el feed tiene errores de formato
+        LOG.warning(f"El feed {feed_url} podría estar mal formado. Error: {parsed_feed.bozo_exception}")
+
+    new_entries = new_entries_since(parsed_feed.entries, state.get('ultimo_id_entrada'))
+    LOG.info(f"Feed '{parsed_feed.feed.get('title', feed_url)}' analizado: {len(parsed_feed.entries)} entradas, {len(new_entries)} nuevas.")
+    new_state = {
+        'feed_url': feed_url,
+        'etag': response.headers.get('etag'),
+        'last_modified': response.headers.get('last-modified'),
+        'ultimo_id_entrada': entry_id(parsed_feed.entries[0]) if parsed_feed.entries else state.get('ultimo_id_entrada'),
+        'revisado_en': datetime.now(timezone.utc).isoformat(),
+    }
+    return new_entries, new_state
+
+def fetch_and_parse_feeds(feed_states: dict, client: httpx.Client | HttpClient | None = None) -> tuple[list, list]:
+    """
+    Revisa todos los RSS_FEEDS en paralelo con un cliente HTTP compartido (por defecto, el del proceso).
+    Devuelve (entradas nuevas de todos los feeds, estados de los feeds que cambiaron).
+    """
     LOG.info(f"Iniciando la revisión de {len(RSS_FEEDS)} feed(s)...")
-    all_entries = []
-    for feed_url in RSS_FEEDS:
+    client = client or shared_http_client(LOG)
+
+    def check(feed_url):
         try:
-            parsed_feed = feedparser.parse(feed_url)
-            if parsed_feed.bozo:
-                # Bozo es 1 si el feed tiene errores de formato
-                LOG.warning(f"El feed {feed_url} podría estar mal formado. Error: {parsed_feed.bozo_exception}")
-            
-            LOG.info(f"Feed '{parsed_feed.feed.title}' analizado. Se encontraron {len(parsed_feed.entries)} entradas.")
-            all_entries.extend(parsed_feed.entries)
+            return fetch_feed(client, feed_url, feed_states.get(feed_url, {}))
         except Exception as e:
             LOG.error(f"No se pudo obtener o analizar el feed {feed_url}: {e}", exc_info=True)
-            
-    return all_entries
+            return [], None
+
+    all_entries, updated_states = [], []
+    with ThreadPoolExecutor(max_workers=max(1, min(FEED_FETCH_WORKERS, len(RSS_FEEDS)))) as executor:
+        for entries, new_state in executor.map(check, RSS_FEEDS):
+            all_entries.extend(entries)
+            if new_state is not None:
+                updated_states.append(new_state)
+    return all_entries, updated_states
 
 def main():
     """Punto de entrada principal del vigilante de feeds."""
     LOG.info("--- INICIANDO FEED WATCHER ---")
-    
-    entries = fetch_and_parse_feeds()
-    
-    if not entries:
-        LOG.info("No se encontraron nuevas entradas en los feeds.")
-        return
+    start_time = time.perf_counter()
 
     try:
-        LOG.info("Conectando a la base de datos para guardar las nuevas entradas...")
+        LOG.info("Conectando a la base de datos para leer el estado de los feeds...")
         supabase = db_manager.get_supabase_client(LOG)
-        
-        # Usamos un set para contar las URLs únicas que intentamos añadir
-        urls_to_process = {entry.link for entry in entries}
-        
-        for url in urls_to_process:
-            db_manager.add_url_if_not_exists(supabase, LOG, url)
-            
-        LOG.info(f"{len(urls_to_process)} URLs de feeds procesadas y añadidas a la base de datos si no existían.")
-        LOG.info("Ejecución de Feed Watcher completada con éxito.")
+        feed_states = db_manager.get_feed_states(supabase, RSS_FEEDS)
+
+        entries, updated_states = fetch_and_parse_feeds(feed_states)
+
+        # Orden de aparición, sin duplicados entre feeds
+        urls_to_process = list(dict.fromkeys(entry.link for entry in entries if entry.get('link')))
+        if urls_to_process:
+            db_manager.add_urls_if_not_exist(supabase, LOG, urls_to_process)
+        else:
+            LOG.info("No se encontraron nuevas entradas en los feeds.")
+
+        # El estado solo avanza después de encolar, para no perder entradas si el INSERT falla
+        db_manager.save_feed_states(supabase, updated_states)
+        LOG.info(f"Ejecución de Feed Watcher completada con éxito en {time.perf_counter() - start_time:.2f}s.")
 
     except Exception as e:
         LOG.error(f"Ocurrió un error durante la conexión o el guardado en la base de datos: {e}", exc_info=True)
+    finally:
+        close_shared_http_client()
 
 
 if __name__ == "__main__":
@@ -3,6 +3,11 @@ import json
 import gspread
 import re
 from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
+
+from src.site_builder import (PublishManifest, build_search_index, content_hash, fold_accents, page_filename,
+                               paginate, search_terms, write_if_changed)
+from src.templating import ENGINE_VERSION, Template
 
 # --- CONFIGURACIÓN ---
 # Nombre de la hoja de cálculo de Google Sheets
@@ -13,6 +18,48 @@ TEMPLATE_PATH = 'templates/plantilla_articulo.html'
 PUBLICACIONES_PAGE_PATH = 'publicaciones.html'
 # Directorio donde se guardarán los artículos generados
 OUTPUT_DIR = 'publicaciones'
+# Listados por etiqueta: etiqueta-<slug>.html (y etiqueta-<slug>-2.html...), junto a publicaciones.html
+TAG_PAGE_PREFIX = 'etiqueta-'
+# Índice de búsqueda (JSON) que el sitio consulta en el navegador
+SEARCH_INDEX_PATH = 'indice_busqueda.json'
+# Tarjetas por página de listado
+CARDS_PER_PAGE = 24
+# Hashes de lo ya publicado (por slug), para regenerar solo lo que cambió
+MANIFEST_PATH = '.publish_manifest.json'
+# Estados de la hoja cuyas filas aparecen en el sitio
+PUBLISHABLE_STATES = ('Publicado', 'Listo para Publicar')
+# Columnas que determinan la página de un artículo y su tarjeta en el listado
+PAGE_FIELDS = ('Titulo', 'Autor', 'Fecha', 'ImagenURL', 'ContenidoHTML')
+CARD_FIELDS = ('Titulo', 'Resumen', 'ImagenURL', 'Etiquetas')
+# Columna opcional de la hoja con las etiquetas del artículo, separadas por comas
+TAGS_COLUMN = 'Etiquetas'
+# Hueco de la plantilla -> columna de la hoja. CONTENIDOHTML ya es HTML y no se escapa
+ARTICLE_SLOTS = {'TITULO': 'Titulo', 'AUTOR': 'Autor', 'FECHA': 'Fecha', 'IMAGEN_URL': 'ImagenURL', 'CONTENIDOHTML': 'ContenidoHTML'}
+ARTICLE_RAW_SLOTS = ('CONTENIDOHTML',)
+# Parcial de la tarjeta de cada artículo en la página de publicaciones
+CARD_TEMPLATE = Template("""
+                <!-- Tarjeta de Artículo -->
+                <div class="bg-white rounded-lg shadow-md overflow-hidden transform hover:-translate-y-2 transition-transform duration-300">
+                    <img src="{{IMAGEN_URL}}" alt="Imagen del artículo" class="w-full h-48 object-cover">
+                    <div class="p-6">
+                        <h2 class="text-xl font-bold mb-2">{{TITULO}}</h2>
+                        <p class="text-gray-600 mb-4">{{RESUMEN}}</p>
+                        <a href="publicaciones/{{SLUG}}.html" class="font-semibold text-green-700 hover:text-green-800 hover:underline">Leer más &rarr;</a>
+                    </div>
+                </div>""")
+# Regiones de publicaciones.html que se rellenan en cada página de listado. Si la plantilla no tiene la región
+# de paginación, la navegación se añade al final del grid
+GRID_RE = re.compile(r'(<!-- Grid de Publicaciones -->)(.*?)(<!-- Fin Grid de Publicaciones -->)', re.DOTALL)
+PAGINATION_RE = re.compile(r'(<!-- Paginacion -->)(.*?)(<!-- Fin Paginacion -->)', re.DOTALL)
+LISTING_HEADING_TEMPLATE = Template("""
+                <h2 class="col-span-full text-2xl font-bold mb-4">Etiqueta: {{ETIQUETA}}</h2>""")
+PAGINATION_TEMPLATE = Template("""
+                <nav class="col-span-full flex justify-between items-center mt-8" aria-label="Paginación">
+                    <span>{{ANTERIOR|raw}}</span>
+                    <span class="text-gray-600">Página {{PAGINA}}</span>
+                    <span>{{SIGUIENTE|raw}}</span>
+                </nav>""")
+PAGE_LINK_TEMPLATE = Template('<a href="{{HREF}}" class="font-semibold text-green-700 hover:underline">{{TEXTO}}</a>')
 
 # --- FUNCIONES AUXILIARES ---
 def slugify(text):
@@ -34,6 +81,67 @@ def get_gspread_client():
     client = gspread.authorize(creds)
     return client
 
+def render_article(article_template, article):
+    """Rellena la plantilla de artículo (ya compilada) con los campos de la fila."""
+    return article_template.render({slot: article[column] for slot, column in ARTICLE_SLOTS.items()})
+
+def render_card(article, slug):
+    """Tarjeta del artículo para la página de publicaciones."""
+    return CARD_TEMPLATE.render({'IMAGEN_URL': article['ImagenURL'], 'TITULO': article['Titulo'], 'RESUMEN': article['Resumen'], 'SLUG': slug})
+
+def parse_tags(article):
+    """Etiquetas de la fila como (slug, nombre), sin repetidas y en el orden de la hoja.
+    El slug se calcula sin tildes: slugify borra las letras no ASCII, y 'Río' quedaría en 'ro'."""
+    tags = {}
+    for name in str(article.get(TAGS_COLUMN) or '').split(','):
+        name = name.strip()
+        slug = slugify(fold_accents(name))
+        if slug:
+            tags.setdefault(slug, name)
+    return list(tags.items())
+
+def render_pagination(base_path, number, has_next):
+    """Navegación anterior/siguiente. No muestra el total de páginas: así, al añadir artículos al final,
+    solo cambian la última página y la nueva, y no todas."""
+    def link(target, text):
+        return PAGE_LINK_TEMPLATE.render({'HREF': os.path.basename(page_filename(base_path, target)), 'TEXTO': text})
+    return PAGINATION_TEMPLATE.render({
+        'ANTERIOR': link(number - 1, '← Anteriores') if number > 1 else '',
+        'PAGINA': number,
+        'SIGUIENTE': link(number + 1, 'Siguientes →') if has_next else '',
+    })
+
+def render_listing_page(shell, cards_html, pagination_html):
+    """Rellena el grid (y la paginación) de publicaciones.html. Las sustituciones son funciones
+    para que las barras invertidas del HTML no se interpreten como referencias del regex."""
+    if PAGINATION_RE.search(shell):
+        shell = PAGINATION_RE.sub(lambda match: f"{match.group(1)}{pagination_html}\n{match.group(3)}", shell)
+    else:
+        cards_html += pagination_html
+    return GRID_RE.sub(lambda match: f"{match.group(1)}\n{cards_html}\n{match.group(3)}", shell)
+
+def write_listing(manifest, shell, shell_hash, base_path, cards, heading_html=''):
+    """
+    Escribe las páginas de un listado (`cards` son pares (hash, html) de tarjeta). Cada página se renderiza
+    solo si cambiaron sus tarjetas, sus enlaces o la plantilla; devuelve cuántos archivos cambiaron.
+    """
+    pages = paginate(cards, CARDS_PER_PAGE)
+    written = 0
+    for number, page in enumerate(pages, start=1):
+        path = page_filename(base_path, number)
+        has_next = number < len(pages)
+        page_hash = content_hash(shell_hash, heading_html, [card_hash for card_hash, _ in page], number, has_next)
+        if not manifest.output_changed(path, page_hash):
+            continue
+        cards_html = heading_html + '\n'.join(card_html for _, card_html in page)
+        if write_if_changed(path, render_listing_page(shell, cards_html, render_pagination(base_path, number, has_next))):
+            written += 1
+    return written
+
+def mark_as_published(sheet, rows, estado_column):
+    """Marca las filas como 'Publicado' con una sola petición a la API de Sheets."""
+    sheet.batch_update([{'range': rowcol_to_a1(row, estado_column), 'values': [['Publicado']]} for row in rows])
+
 # --- LÓGICA PRINCIPAL ---
 def main():
     print("Iniciando el script de publicación...")
@@ -44,74 +152,92 @@ def main():
         articles = sheet.get_all_records()
         print(f"Se encontraron {len(articles)} artículos en total.")
 
-        # Cargar la plantilla de artículo
-        with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
-            article_template = f.read()
+        # Cargar la plantilla de artículo y compilarla una sola vez para todos los artículos
+        article_template = Template.from_file(TEMPLATE_PATH, raw_slots=ARTICLE_RAW_SLOTS)
 
         # Crear directorio de salida si no existe
         os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+        manifest = PublishManifest(MANIFEST_PATH)
+        # Si la plantilla (o la forma de renderizarla) cambió, todas las páginas y tarjetas se vuelven a renderizar
+        template_changed = manifest.changed('plantilla_articulo', content_hash(ENGINE_VERSION, article_template.source))
+        card_template_changed = manifest.changed('plantilla_tarjeta', content_hash(ENGINE_VERSION, CARD_TEMPLATE.source))
+
         all_published_cards = []
-        new_articles_published = False
+        cards_by_tag = {}
+        tag_names = {}
+        search_docs = []
+        rows_to_mark = []
+        pages_written = 0
 
         # Procesar cada artículo de la hoja
         for index, article in enumerate(articles, start=2): # start=2 porque gspread es 1-indexado y hay una fila de cabecera
-            if article.get('Estado') == 'Listo para Publicar':
+            if article.get('Estado') not in PUBLISHABLE_STATES:
+                continue
+            slug = slugify(article['Titulo'])
+            entry = manifest.entry(slug)
+            if article['Estado'] == 'Listo para Publicar':
                 print(f"Procesando nuevo artículo: '{article['Titulo']}'")
-                new_articles_published = True
-
-                # Rellenar plantilla
-                content = article_template.replace('{{TITULO}}', article['Titulo'])
-                content = content.replace('{{AUTOR}}', article['Autor'])
-                content = content.replace('{{FECHA}}', article['Fecha'])
-                content = content.replace('{{IMAGEN_URL}}', article['ImagenURL'])
-                content = content.replace('{{CONTENIDOHTML}}', article['ContenidoHTML'])
-
-                # Guardar nuevo archivo HTML
-                slug = slugify(article['Titulo'])
-                output_path = os.path.join(OUTPUT_DIR, f"{slug}.html")
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                print(f"Artículo guardado en: {output_path}")
-
-                # Actualizar estado en Google Sheet
-                sheet.update_cell(index, list(article.keys()).index('Estado') + 1, 'Publicado')
-                print(f"Estado actualizado a 'Publicado' en Google Sheets.")
-
-            # Generar tarjeta para la página de publicaciones (para todos los ya publicados)
-            if article.get('Estado') in ['Publicado', 'Listo para Publicar']:
-                slug = slugify(article['Titulo'])
-                card_html = f"""
-                <!-- Tarjeta de Artículo -->
-                <div class="bg-white rounded-lg shadow-md overflow-hidden transform hover:-translate-y-2 transition-transform duration-300">
-                    <img src="{article['ImagenURL']}" alt="Imagen del artículo" class="w-full h-48 object-cover">
-                    <div class="p-6">
-                        <h2 class="text-xl font-bold mb-2">{article['Titulo']}</h2>
-                        <p class="text-gray-600 mb-4">{article['Resumen']}</p>
-                        <a href="publicaciones/{slug}.html" class="font-semibold text-green-700 hover:text-green-800 hover:underline">Leer más &rarr;</a>
-                    </div>
-                </div>"""
-                all_published_cards.append(card_html)
-
-        # Actualizar la página de publicaciones si hubo cambios
-        if new_articles_published:
-            print("Actualizando la página de listado de publicaciones...")
-            with open(PUBLICACIONES_PAGE_PATH, 'r', encoding='utf-8') as f:
-                publicaciones_content = f.read()
-            
-            cards_grid = '\n'.join(all_published_cards)
-            # Reemplazar el grid existente con el nuevo
-            # Se asume que el grid está entre estos dos comentarios
-            publicaciones_content = re.sub(r'(<!-- Grid de Publicaciones -->)(.*?)(<!-- Fin Grid de Publicaciones -->)', 
-                                         f'\g<1>\n{cards_grid}\n\g<3>', 
-                                         publicaciones_content, flags=re.DOTALL)
-
-            with open(PUBLICACIONES_PAGE_PATH, 'w', encoding='utf-8') as f:
-                f.write(publicaciones_content)
-            print("Página de publicaciones actualizada.")
+                rows_to_mark.append(index)
+
+            # Solo se renderizan las páginas nuevas, editadas en la hoja o con la plantilla cambiada
+            output_path = os.path.join(OUTPUT_DIR, f"{slug}.html")
+            page_hash = content_hash([article.get(field) for field in PAGE_FIELDS])
+            if template_changed or entry.get('pagina') != page_hash or not os.path.exists(output_path):
+                if write_if_changed(output_path, render_article(article_template, article)):
+                    pages_written += 1
+                    print(f"Artículo guardado en: {output_path}")
+                entry['pagina'] = page_hash
+
+            # Generar tarjeta para la página de publicaciones (reutilizada si no cambió)
+            # y sus términos de búsqueda, que dependen de los mismos campos
+            card_hash = content_hash(slug, [article.get(field) for field in CARD_FIELDS])
+            tags = parse_tags(article)
+            if card_template_changed or entry.get('tarjeta') != card_hash or 'terminos' not in entry:
+                entry['tarjeta_html'] = render_card(article, slug)
+                entry['terminos'] = search_terms(article['Titulo'], article['Resumen'], *(name for _, name in tags))
+                entry['tarjeta'] = card_hash
+            card = (card_hash, entry['tarjeta_html'])
+            all_published_cards.append(card)
+            for tag_slug, tag_name in tags:
+                cards_by_tag.setdefault(tag_slug, []).append(card)
+                tag_names.setdefault(tag_slug, tag_name)
+            search_docs.append({'slug': slug, 'titulo': article['Titulo'], 'resumen': article['Resumen'],
+                                'etiquetas': [name for _, name in tags], 'terminos': entry['terminos']})
+
+        # Páginas de listado (general y por etiqueta): solo se reescriben las que cambiaron
+        with open(PUBLICACIONES_PAGE_PATH, 'r', encoding='utf-8') as f:
+            shell = f.read()
+        shell_hash = content_hash(ENGINE_VERSION, CARD_TEMPLATE.source, PAGINATION_TEMPLATE.source,
+                                  PAGINATION_RE.sub('', GRID_RE.sub('', shell)))
+        listings_written = write_listing(manifest, shell, shell_hash, PUBLICACIONES_PAGE_PATH, all_published_cards)
+        for tag_slug, cards in cards_by_tag.items():
+            heading_html = LISTING_HEADING_TEMPLATE.render({'ETIQUETA': tag_names[tag_slug]})
+            tag_path = os.path.join(os.path.dirname(PUBLICACIONES_PAGE_PATH), f"{TAG_PAGE_PREFIX}{tag_slug}.html")
+            listings_written += write_listing(manifest, shell, shell_hash, tag_path, cards, heading_html)
+
+        # Índice de búsqueda: se regenera si cambió alguna tarjeta o el orden
+        if manifest.output_changed(SEARCH_INDEX_PATH, content_hash([card_hash for card_hash, _ in all_published_cards])):
+            write_if_changed(SEARCH_INDEX_PATH, build_search_index(search_docs))
+            print(f"Índice de búsqueda actualizado: {SEARCH_INDEX_PATH}")
+
+        # Páginas de listado que ya no corresponden a nada (etiquetas sin artículos, páginas sobrantes)
+        for stale_path in manifest.stale_outputs():
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+                print(f"Eliminado listado obsoleto: {stale_path}")
+        print(f"{pages_written} páginas de artículo y {listings_written} páginas de listado escritas; el resto no cambió.")
+
+        # Actualizar estado en Google Sheet
+        if rows_to_mark:
+            mark_as_published(sheet, rows_to_mark, list(articles[0].keys()).index('Estado') + 1)
+            print(f"Estado actualizado a 'Publicado' en Google Sheets para {len(rows_to_mark)} artículos.")
         else:
             print("No hay nuevos artículos para publicar.")
 
+        # El manifiesto se guarda al final: si algo falla, la siguiente ejecución repite el trabajo pendiente
+        manifest.save()
+
     except Exception as e:
         print(f"Ha ocurrido un error: {e}")
         exit(1)
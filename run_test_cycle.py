@@ -47,7 +47,9 @@ def cleanup_and_reset():
         log.info("Reseteando estados en la tabla 'urls_para_procesar'...")
         response_urls = supabase.table(db_manager.URLS_TABLE).update({
             'estado': 'pendiente',
-            'ultimo_error': None
+            'ultimo_error': None,
+            'worker_id': None,
+            'lease_expira': None
         }).neq('estado', 'pendiente').execute()
         log.info(f"{len(response_urls.data)} URLs actualizadas a 'pendiente'.")
 
@@ -0,0 +1,154 @@
+# src/asset_storage.py
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+from src.utils.bounded import KeyedLocks, LruDict
+
+# --- CONFIGURACIÓN ---
+BUCKET_NAME = "runa-asset-images"
+# Los objetos se nombran por el SHA-256 de sus bytes: sha256/ab/abcdef....jpg
+OBJECT_PREFIX = 'sha256'
+# El contenido de un objeto direccionado por hash no cambia nunca: se puede cachear un año
+OBJECT_CACHE_CONTROL = '31536000'
+CONTENT_TYPE_EXTENSIONS = {'image/jpeg': '.jpg', 'image/png': '.png', 'image/gif': '.gif', 'image/webp': '.webp', 'image/avif': '.avif'}
+# statusCode del error que devuelve Storage al subir sin upsert un objeto que ya existe
+DUPLICATE_STATUS_CODE = '409'
+# statusCode al descargar un objeto que no existe (no se registra como error)
+NOT_FOUND_STATUS_CODE = '404'
+# Rutas recordadas (existentes y URLs públicas); en modo daemon acota la memoria de ambos mapas
+MAX_REMEMBERED_PATHS = 100_000
+
+
+def object_extension(content_type: str, source: str = '') -> str:
+    """Extensión del objeto según su content-type; si no se reconoce, la de `source` (URL o ruta) o '.jpg'."""
+    extension = CONTENT_TYPE_EXTENSIONS.get(content_type.split(';')[0].strip().lower())
+    if extension:
+        return extension
+    return os.path.splitext(urlparse(source).path)[1].lower() or '.jpg'
+
+
+def storage_status_code(error: Exception) -> str | None:
+    """
+    statusCode de un error de Storage: el atributo `status` de StorageApiError (storage3 reciente) o el campo
+    'statusCode' del dict con el que lo construyen las versiones anteriores. No se busca en el texto del mensaje,
+    que puede repetir la ruta del objeto (y un hash hexadecimal puede contener '409').
+    """
+    status = getattr(error, 'status', None)
+    if status is None and error.args and isinstance(error.args[0], dict):
+        status = error.args[0].get('statusCode')
+    return None if status is None else str(status)
+
+
+def object_path(sha256: str, extension: str) -> str:
+    return f"{OBJECT_PREFIX}/{sha256[:2]}/{sha256}{extension}"
+
+
+def derivative_path(sha256: str, name: str) -> str:
+    """Ruta de una variante (p. ej. 'v1-w640.webp') bajo el prefijo de su imagen original."""
+    return f"{OBJECT_PREFIX}/{sha256[:2]}/{sha256}/{name}"
+
+
+class AssetStorage:
+    """
+    Capa de Storage para las imágenes curadas, direccionada por contenido.
+    Cada imagen se guarda una sola vez bajo el hash de sus bytes, la comparta uno o varios activos:
+    re-curar un artículo o encontrar la misma foto en otro no vuelve a escribirla.
+    Las subidas se hacen sin upsert; si el objeto ya existía, Storage lo rechaza y se reutiliza.
+    """
+
+    def __init__(self, logger, supabase_client, bucket: str = BUCKET_NAME):
+        self.logger = logger
+        self._bucket = supabase_client.storage.from_(bucket)
+        self._lock = threading.Lock()
+        # Rutas que ya se sabe que existen en el bucket (subidas o encontradas en esta ejecución)
+        self._known = LruDict(MAX_REMEMBERED_PATHS)
+        # Un lock por ruta evita subir dos veces a la vez la misma imagen desde hilos distintos
+        self._path_locks = KeyedLocks()
+        self._public_urls = LruDict(MAX_REMEMBERED_PATHS)
+        self.counters = Counter()
+
+    def store(self, data: bytes, content_type: str, sha256: str | None = None, source: str = '') -> str | None:
+        """Sube los bytes si el bucket no los tiene ya y devuelve la ruta del objeto (None si la subida falló)."""
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        return self._store_object(object_path(sha256, object_extension(content_type, source)), data, content_type)
+
+    def store_derivative(self, sha256: str, name: str, data: bytes, content_type: str) -> str | None:
+        """Sube una variante de la imagen `sha256` (ver derivative_path) y devuelve su ruta (None si falló)."""
+        return self._store_object(derivative_path(sha256, name), data, content_type)
+
+    def _store_object(self, path: str, data: bytes, content_type: str) -> str | None:
+        with self._path_locks.hold(path):
+            with self._lock:
+                if self._known.get(path):
+                    self.counters['reutilizadas'] += 1
+                    return path
+            try:
+                self._bucket.upload(path=path, file=data, file_options={
+                    "content-type": content_type or 'application/octet-stream',
+                    "cache-control": OBJECT_CACHE_CONTROL,
+                    "upsert": "false",
+                })
+                outcome = 'subidas'
+            except Exception as e:
+                if storage_status_code(e) != DUPLICATE_STATUS_CODE:
+                    self.logger.error(f"Error al subir {path} a Supabase Storage: {e}", exc_info=True)
+                    with self._lock:
+                        self.counters['errores'] += 1
+                    return None
+                outcome = 'ya_existentes'
+            with self._lock:
+                self._known[path] = True
+                self.counters[outcome] += 1
+                if outcome == 'subidas':
+                    self.counters['bytes_subidos'] += len(data)
+        self.logger.info(f"Objeto en Storage ({outcome}): {path}")
+        return path
+
+    def fetch_derivative(self, sha256: str, name: str) -> bytes | None:
+        """Bytes de una variante ya subida en esta u otra ejecución; None si no existe o no se pudo descargar."""
+        path = derivative_path(sha256, name)
+        try:
+            return self._bucket.download(path)
+        except Exception as e:
+            if storage_status_code(e) != NOT_FOUND_STATUS_CODE:
+                self.logger.warning(f"No se pudo descargar {path} de Supabase Storage: {e}")
+            return None
+
+    def store_file(self, local_path: str, source: str = '') -> str | None:
+        """Sube una copia local; se usa solo cuando los bytes ya no están en memoria."""
+        if not local_path or not os.path.exists(local_path):
+            self.logger.warning("La subida se omitió porque la ruta local no es válida o no existe.")
+            return None
+        with open(local_path, 'rb') as f:
+            data = f.read()
+        content_type = mimetypes.guess_type(local_path)[0] or ''
+        return self.store(data, content_type, source=source or local_path)
+
+    def public_urls(self, paths: list) -> dict:
+        """
+        URLs públicas de un lote de rutas, resueltas una sola vez por ruta.
+        supabase-py las construye en local, así que no hay viaje de red que agrupar: se evita repetir el trabajo
+        para las imágenes que comparten objeto.
+        """
+        with self._lock:
+            missing = [path for path in dict.fromkeys(paths) if path and path not in self._public_urls]
+        resolved = {path: self._bucket.get_public_url(path) for path in missing}
+        with self._lock:
+            for path, public_url in resolved.items():
+                self._public_urls[path] = public_url
+            return {path: resolved.get(path) or self._public_urls.get(path) for path in paths if path}
+
+    def log_summary(self):
+        with self._lock:
+            uploaded = self.counters['subidas']
+            existing = self.counters['ya_existentes'] + self.counters['reutilizadas']
+            errors = self.counters['errores']
+            uploaded_mb = self.counters['bytes_subidos'] / (1024 * 1024)
+        self.logger.info(
+            f"Storage: {uploaded} objetos subidos ({uploaded_mb:.1f} MB, originales y variantes), "
+            f"{existing} ya estaban en el bucket, {errors} errores."
+        )
@@ -0,0 +1,204 @@
+# src/browser_pool.py
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from playwright.async_api import async_playwright
+from playwright.sync_api import sync_playwright, Error as PlaywrightError
+
+# Número de páginas que sirve un mismo Chromium antes de reciclarlo (evita fugas de memoria).
+DEFAULT_MAX_PAGES = 50
+
+
+class BrowserPool:
+    """
+    Mantiene un único Chromium headless vivo durante toda la ejecución del worker.
+    Cada URL recibe un contexto aislado (cookies y caché propias) con una página nueva.
+    El navegador se recicla tras `max_pages` páginas o si se cae a mitad de una navegación.
+    """
+
+    def __init__(self, logger, max_pages: int = DEFAULT_MAX_PAGES, headless: bool = True):
+        self.logger = logger
+        self.max_pages = max_pages
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        # Métricas de la ejecución
+        self.launch_count = 0
+        self.last_launch_seconds = 0.0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        if self._playwright is None:
+            self._playwright = sync_playwright().start()
+
+    def close(self):
+        self._discard_browser()
+        if self._playwright is not None:
+            self._playwright.stop()
+            self._playwright = None
+        self.logger.info(f"Pool de navegador cerrado. Lanzamientos de Chromium en la ejecución: {self.launch_count}.")
+
+    def _discard_browser(self):
+        if self._browser is None:
+            return
+        try:
+            if self._browser.is_connected():
+                self._browser.close()
+        except PlaywrightError as e:
+            self.logger.warning(f"No se pudo cerrar limpiamente el navegador: {e}")
+        self._browser = None
+        self._pages_served = 0
+
+    def _ensure_browser(self) -> float:
+        """Devuelve los segundos invertidos en lanzar Chromium (0 si se reutilizó el existente)."""
+        self.start()
+        if self._browser is not None and not self._browser.is_connected():
+            self.logger.warning("El navegador del pool se desconectó. Se lanzará uno nuevo.")
+            self._browser = None
+            self._pages_served = 0
+        if self._browser is not None and self._pages_served >= self.max_pages:
+            self.logger.info(f"Reciclando navegador tras {self._pages_served} páginas servidas.")
+            self._discard_browser()
+        if self._browser is not None:
+            return 0.0
+
+        start = time.perf_counter()
+        self._browser = self._playwright.chromium.launch(headless=self.headless)
+        self.launch_count += 1
+        return time.perf_counter() - start
+
+    @contextmanager
+    def page(self):
+        """Entrega una página nueva en un contexto aislado y la libera al terminar."""
+        self.last_launch_seconds = self._ensure_browser()
+        context = self._browser.new_context()
+        self._pages_served += 1
+        try:
+            yield context.new_page()
+        except PlaywrightError:
+            # Si el fallo vino de un navegador caído, se descarta para que la próxima URL lance otro.
+            if self._browser is not None and not self._browser.is_connected():
+                self.logger.warning("El navegador se cayó durante la navegación. Se reciclará.")
+                self._browser = None
+                self._pages_served = 0
+            raise
+        finally:
+            try:
+                context.close()
+            except PlaywrightError:
+                pass
+
+
+class AsyncBrowserPool:
+    """
+    Variante asíncrona de BrowserPool para el modo concurrente del worker.
+    Varias páginas pueden estar abiertas a la vez sobre el mismo Chromium; al reciclarlo,
+    el navegador viejo se cierra solo cuando terminan las páginas que aún lo usan.
+    """
+
+    def __init__(self, logger, max_pages: int = DEFAULT_MAX_PAGES, headless: bool = True):
+        self.logger = logger
+        self.max_pages = max_pages
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._pages_served = 0
+        self._active_pages = {}
+        self._lock = None
+        self.launch_count = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        if self._playwright is None:
+            self._lock = asyncio.Lock()
+            self._playwright = await async_playwright().start()
+
+    async def close(self):
+        for browser in list(self._active_pages):
+            await self._close_browser(browser)
+        self._active_pages.clear()
+        self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        self.logger.info(f"Pool asíncrono de navegador cerrado. Lanzamientos de Chromium en la ejecución: {self.launch_count}.")
+
+    async def _close_browser(self, browser):
+        try:
+            if browser.is_connected():
+                await browser.close()
+        except PlaywrightError as e:
+            self.logger.warning(f"No se pudo cerrar limpiamente el navegador: {e}")
+
+    def _retire_current(self):
+        """Saca el navegador actual de servicio; se cierra cuando no le queden páginas activas."""
+        self._browser = None
+        self._pages_served = 0
+
+    async def _acquire_browser(self):
+        """Devuelve (navegador, segundos de lanzamiento) reservando un hueco de página en él."""
+        async with self._lock:
+            if self._browser is not None and not self._browser.is_connected():
+                self.logger.warning("El navegador del pool se desconectó. Se lanzará uno nuevo.")
+                self._retire_current()
+            if self._browser is not None and self._pages_served >= self.max_pages:
+                self.logger.info(f"Reciclando navegador tras {self._pages_served} páginas servidas.")
+                retired = self._browser
+                self._retire_current()
+                if self._active_pages.get(retired, 0) == 0:
+                    self._active_pages.pop(retired, None)
+                    await self._close_browser(retired)
+
+            launch_seconds = 0.0
+            if self._browser is None:
+                start = time.perf_counter()
+                self._browser = await self._playwright.chromium.launch(headless=self.headless)
+                launch_seconds = time.perf_counter() - start
+                self.launch_count += 1
+                self._active_pages[self._browser] = 0
+
+            self._pages_served += 1
+            self._active_pages[self._browser] += 1
+            return self._browser, launch_seconds
+
+    async def _release_browser(self, browser):
+        async with self._lock:
+            self._active_pages[browser] -= 1
+            if browser is not self._browser and self._active_pages[browser] == 0:
+                self._active_pages.pop(browser)
+                await self._close_browser(browser)
+
+    @asynccontextmanager
+    async def page(self):
+        """Entrega (página, segundos de lanzamiento) en un contexto aislado y lo libera al terminar."""
+        browser, launch_seconds = await self._acquire_browser()
+        context = None
+        try:
+            context = await browser.new_context()
+            yield await context.new_page(), launch_seconds
+        except PlaywrightError:
+            if not browser.is_connected() and browser is self._browser:
+                self.logger.warning("El navegador se cayó durante la navegación. Se reciclará.")
+                self._retire_current()
+            raise
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except PlaywrightError:
+                    pass
+            await self._release_browser(browser)
@@ -0,0 +1,47 @@
+# src/canonical_url.py
+import re
+
+# --- CONFIGURACIÓN ---
+# Misma regla que public.canonicalizar_url (db_manager.SCHEMA_SQL y la migración canonical_url_dedup):
+# si cambia una, hay que cambiar la otra. La BD calcula las claves; esta copia permite probar la regla
+# y decidir en el curador si un <link rel=canonical> es creíble sin un viaje a la BD.
+SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://')
+AUTHORITY_RE = re.compile(r'^[^/?]*')
+HOST_PREFIX_RE = re.compile(r'^(www|amp)\.')
+DEFAULT_PORT_RE = re.compile(r':(80|443)$')
+AMP_SUFFIX_RE = re.compile(r'/amp/?$')
+TRAILING_SLASHES_RE = re.compile(r'/+$')
+TRACKING_PARAM_RE = re.compile(r'^(utm_.*|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|_ga|ref|ref_src|amp|outputtype)$')
+
+
+def canonical_parts(url: str) -> tuple[str, str, str]:
+    """(host, ruta, query) de la clave canónica de `url`; la query sin '?' y con los parámetros ordenados."""
+    rest = SCHEME_RE.sub('', url.strip(' '), count=1).split('#', 1)[0]
+    authority = AUTHORITY_RE.match(rest).group()
+    host = DEFAULT_PORT_RE.sub('', HOST_PREFIX_RE.sub('', authority.lower(), count=1), count=1)
+    path, _, query = rest[len(authority):].partition('?')
+    path = TRAILING_SLASHES_RE.sub('', AMP_SUFFIX_RE.sub('', path, count=1), count=1)
+    # Orden por punto de código, como la intercalación "C": con otra, la BD podría ordenar de otro modo
+    # parámetros que solo difieren en mayúsculas o signos
+    params = sorted(param for param in query.split('&') if param and not TRACKING_PARAM_RE.match(param.split('=', 1)[0].lower()))
+    return host, path, '&'.join(params)
+
+
+def canonicalize_url(url: str) -> str:
+    """Clave canónica de una URL: sin esquema, 'www.'/'amp.', puerto por defecto, fragmento, barra final,
+    sufijo /amp ni parámetros de seguimiento; el resto de parámetros, ordenados."""
+    host, path, query = canonical_parts(url)
+    return host + path + (f'?{query}' if query else '')
+
+
+def is_credible_canonical(url: str, canonical_url: str) -> bool:
+    """
+    False para un <link rel=canonical> que no puede identificar al artículo: en otro host, la portada
+    o una sección que contiene a la URL (/noticias para /noticias/2024/rio). Algunos sitios apuntan la
+    canónica de todos sus artículos a una de ellas, y adoptarla marcaría como duplicados a todos menos el primero.
+    """
+    host, path, _ = canonical_parts(url)
+    canonical_host, canonical_path, _ = canonical_parts(canonical_url)
+    if canonical_host != host or not canonical_path:
+        return False
+    return not path.startswith(canonical_path + '/')
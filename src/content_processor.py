@@ -1,17 +1,24 @@
 # src/content_processor.py (v3.9 - Humanization Attempt)
 import os
+import asyncio
+import hashlib
 import json
-import re
 import time
 from typing import Union
 from urllib.parse import urljoin, urlparse
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-import httpx
 from supabase import Client as SupabaseClient
 import google.generativeai as genai
 
+from src.asset_storage import BUCKET_NAME
+from src.browser_pool import AsyncBrowserPool, BrowserPool
+from src.html_extraction import make_soup, scan_document, script_image_urls, select_main_container
+from src.http_client import shared_http_client
+from src.image_cache import CachedImage, ImageCache
+from src.page_readiness import PageReadiness
+from src.static_fetcher import TieredFetcher
+from src.vision_cache import VisionCache
+
 # --- CONFIGURACIÓN DE IA ---
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
@@ -21,38 +28,153 @@ else:
 
 TEXT_MODEL = 'gemini-1.5-pro' 
 VISION_MODEL = 'gemini-1.5-pro' 
-BUCKET_NAME = "runa-asset-images"
+
+VISION_SYSTEM_PROMPT = "Eres un experto analista de contenido visual para un medio periodístico. Tu tarea es analizar una imagen y clasificar su propósito dentro de un artículo. Responde únicamente con un objeto JSON válido sin formato adicional."
+VISION_USER_PROMPT = '''Analiza la imagen. Clasifícala según uno de los siguientes tipos: "fotografia_principal", "grafico_o_diagrama", "captura_de_pantalla", "logo_o_banner", "irrelevante". Determina si es relevante para el contenido principal. La descripción debe ser concisa (máximo 15 palabras).\n\nFormato de respuesta JSON requerido:\n{\n  "tipo": "uno de los tipos válidos",\n  "es_relevante": true/false,\n  "descripcion_ia": "Una descripción concisa de la imagen."
+}'''
+# Variante del prompt para clasificar varias imágenes en una sola petición ({n} = imágenes del lote)
+VISION_BATCH_USER_PROMPT = '''Analiza las {n} imágenes adjuntas, numeradas desde 0 en el orden en que aparecen. Clasifica cada una según uno de los siguientes tipos: "fotografia_principal", "grafico_o_diagrama", "captura_de_pantalla", "logo_o_banner", "irrelevante". Determina si es relevante para el contenido principal. Cada descripción debe ser concisa (máximo 15 palabras).\n\nFormato de respuesta requerido: un array JSON con exactamente {n} objetos, uno por imagen y en el mismo orden:\n[\n  {"indice": 0, "tipo": "uno de los tipos válidos", "es_relevante": true/false, "descripcion_ia": "Una descripción concisa de la imagen."}\n]'''
+VISION_BATCH_SIZE = 5
+# Tiempos máximos de las descargas de imágenes sin caché (con el cliente HTTP compartido del proceso)
+IMAGE_TIMEOUT_SECONDS = 30.0
+DOWNLOAD_TIMEOUT_SECONDS = 20.0
+# Constructor del árbol HTML: 'html.parser' (biblioteca estándar) o 'lxml' si está instalado, bastante más rápido
+HTML_PARSER = os.getenv('RUNA_HTML_PARSER', 'html.parser')
+# Cambia al modificar el modelo o los prompts e invalida la caché persistente de análisis de visión
+VISION_CACHE_VERSION = hashlib.sha256(
+    f"{VISION_MODEL}\n{VISION_SYSTEM_PROMPT}\n{VISION_USER_PROMPT}\n{VISION_BATCH_USER_PROMPT}".encode('utf-8')
+).hexdigest()[:16]
 
 # --- LÓGICA DE PROCESAMIENTO ---
 
-def extract_article_metadata(url: str, logger) -> dict | None:
-    logger.info(f"Iniciando extracción con Playwright para: {url}")
-    html_content = ''
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            # Usar networkidle y una espera más larga para intentar superar retos de seguridad
-            page.goto(url, wait_until='networkidle', timeout=90000)
-            logger.info("Página cargada. Esperando 15s a posible reto de seguridad (Cloudflare)...")
-            page.wait_for_timeout(15000)
-            
-            logger.info("Iniciando desplazamiento para forzar carga de contenido dinámico...")
-            scroll_height = page.evaluate("document.body.scrollHeight")
-            for i in range(0, scroll_height, 500):
-                page.evaluate(f"window.scrollTo(0, {i})")
-                time.sleep(0.2)
-            page.wait_for_timeout(5000)
-
-            html_content = page.content()
-            browser.close()
-        logger.info("Navegación y extracción de HTML completadas.")
-    except Exception as e:
-        logger.error(f"Error durante la navegación con Playwright: {e}", exc_info=True)
+def fetch_rendered_html(url: str, logger, browser_pool: BrowserPool, readiness: PageReadiness, timings: dict) -> str:
+    """Navega a la URL con una página del pool y devuelve el HTML renderizado."""
+    with browser_pool.page() as page:
+        timings['lanzamiento'] = browser_pool.last_launch_seconds
+        nav_start = time.perf_counter()
+        # Usar networkidle y una espera más larga para intentar superar retos de seguridad
+        page.goto(url, wait_until='networkidle', timeout=90000)
+        logger.info("Página cargada. Comprobando retos de seguridad y contenido dinámico...")
+        readiness.wait(page, url, timings)
+
+        html_content = page.content()
+        timings['navegacion'] = time.perf_counter() - nav_start
+    return html_content
+
+def _parse_with_timings(html_content: str, base_url: str, logger, timings: dict) -> dict | None:
+    """Parsea el HTML, registra los tiempos de la URL (con el desglose del parseo) y los adjunta a los metadatos."""
+    parse_start = time.perf_counter()
+    profile = {}
+    metadata = parse_article_html(html_content, base_url, logger, profile=profile)
+    timings['parseo'] = time.perf_counter() - parse_start
+    if metadata is None:
         return None
+    timings['fases_parseo'] = profile.get('tiempos', {})
+    timings['candidatos'] = profile.get('candidatos', {})
+
+    logger.info(
+        "Tiempos para %s (nivel %s): lanzamiento %.2fs, navegación %.2fs (reto %.2fs, scroll %.2fs), parseo %.2fs.",
+        base_url, timings['nivel'], timings['lanzamiento'], timings['navegacion'],
+        timings.get('reto', 0.0), timings.get('scroll', 0.0), timings['parseo']
+    )
+    metadata['tiempos'] = timings
+    return metadata
+
+def _fetch_static(url: str, logger, fetcher: TieredFetcher | None, timings: dict) -> tuple[str, str] | None:
+    """Intenta el nivel estático (httpx) si hay un fetcher; devuelve (html, url_final) o None."""
+    if fetcher is None:
+        return None
+    nav_start = time.perf_counter()
+    static_result = fetcher.fetch(url)
+    timings['navegacion'] = time.perf_counter() - nav_start
+    if static_result is not None:
+        timings['nivel'] = 'estatico'
+        logger.info("HTML obtenido sin navegador para: %s", url)
+    return static_result
+
+def extract_article_metadata(url: str, logger, browser_pool: BrowserPool | None = None, readiness: PageReadiness | None = None, fetcher: TieredFetcher | None = None) -> dict | None:
+    """
+    Extrae metadatos y candidatas de imagen de un artículo.
+    Con un `fetcher`, se prueba primero una descarga estática y solo se usa Chromium si no basta.
+    Si no se recibe un `browser_pool`, se lanza un navegador solo para esta URL.
+    El diccionario devuelto incluye 'tiempos' (nivel usado; segundos de lanzamiento, navegación, reto, scroll y parseo;
+    desglose del parseo por fase en 'fases_parseo' y elementos examinados por capa en 'candidatos').
+    """
+    timings = {'nivel': 'navegador', 'lanzamiento': 0.0, 'navegacion': 0.0, 'parseo': 0.0}
+    static_result = _fetch_static(url, logger, fetcher, timings)
+    if static_result is not None:
+        html_content, base_url = static_result
+    else:
+        logger.info("Iniciando extracción con Playwright para: %s", url)
+        readiness = readiness or PageReadiness(logger)
+        base_url = url
+        try:
+            if browser_pool is not None:
+                html_content = fetch_rendered_html(url, logger, browser_pool, readiness, timings)
+            else:
+                with BrowserPool(logger, max_pages=1) as one_off_pool:
+                    html_content = fetch_rendered_html(url, logger, one_off_pool, readiness, timings)
+            logger.info("Navegación y extracción de HTML completadas.")
+        except Exception as e:
+            logger.error("Error durante la navegación con Playwright: %s", e, exc_info=True)
+            return None
+
+    if fetcher is not None:
+        fetcher.record_served(timings['nivel'])
+    return _parse_with_timings(html_content, base_url, logger, timings)
+
+async def fetch_rendered_html_async(url: str, logger, browser_pool: AsyncBrowserPool, readiness: PageReadiness, timings: dict) -> str:
+    """Versión asíncrona de fetch_rendered_html para el modo concurrente."""
+    async with browser_pool.page() as (page, launch_seconds):
+        timings['lanzamiento'] = launch_seconds
+        nav_start = time.perf_counter()
+        await page.goto(url, wait_until='networkidle', timeout=90000)
+        logger.info("Página cargada. Comprobando retos de seguridad y contenido dinámico...")
+        await readiness.wait_async(page, url, timings)
+
+        html_content = await page.content()
+        timings['navegacion'] = time.perf_counter() - nav_start
+    return html_content
+
+async def extract_article_metadata_async(url: str, logger, browser_pool: AsyncBrowserPool, readiness: PageReadiness | None = None, fetcher: TieredFetcher | None = None) -> dict | None:
+    """Versión asíncrona de extract_article_metadata; la descarga estática y el parseo corren en hilos aparte."""
+    timings = {'nivel': 'navegador', 'lanzamiento': 0.0, 'navegacion': 0.0, 'parseo': 0.0}
+    static_result = await asyncio.to_thread(_fetch_static, url, logger, fetcher, timings)
+    if static_result is not None:
+        html_content, base_url = static_result
+    else:
+        logger.info("Iniciando extracción con Playwright (modo concurrente) para: %s", url)
+        readiness = readiness or PageReadiness(logger)
+        base_url = url
+        try:
+            html_content = await fetch_rendered_html_async(url, logger, browser_pool, readiness, timings)
+            logger.info("Navegación y extracción de HTML completadas.")
+        except Exception as e:
+            logger.error("Error durante la navegación con Playwright: %s", e, exc_info=True)
+            return None
+
+    if fetcher is not None:
+        fetcher.record_served(timings['nivel'])
+    return await asyncio.to_thread(_parse_with_timings, html_content, base_url, logger, timings)
+
+def parse_article_html(html_content: str, url: str, logger, parser: str = HTML_PARSER, profile: dict | None = None) -> dict | None:
+    """
+    Aplica las capas de extracción de imágenes sobre el HTML ya renderizado.
+    Con `profile` (un dict), anota en profile['tiempos'] la duración de cada fase y en
+    profile['candidatos'] cuántos elementos examinó cada una (lo usa benchmarks/extraction.py).
+    """
+    phase_start = time.perf_counter()
+
+    def lap(phase: str):
+        nonlocal phase_start
+        now = time.perf_counter()
+        if profile is not None:
+            profile.setdefault('tiempos', {})[phase] = now - phase_start
+        phase_start = now
 
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content, parser)
+        lap('arbol')
         final_image_candidates = []
 
         # Fase A: Captura Prioritaria (og:image)
@@ -60,37 +182,34 @@ def extract_article_metadata(url: str, logger) -> dict | None:
         og_tag = soup.find('meta', property='og:image')
         if og_tag and og_tag.get('content'):
             og_image_url = og_tag['content']
-            logger.info(f"Imagen prioritaria encontrada: {og_image_url}")
+            logger.info("Imagen prioritaria encontrada: %s", og_image_url)
             final_image_candidates.append(og_image_url)
         else:
             logger.info("No se encontró imagen prioritaria (og:image).")
+        lap('og_image')
 
         # Fase B: Captura de Contenido Extensiva
         logger.info("Fase B: Iniciando escaneo de imágenes en el cuerpo del contenido...")
         
         # Capa 1: Filtrado Estructural Inteligente
         logger.info("Capa 1: Iniciando filtrado estructural inteligente...")
-        best_container = None
-        max_text_len = 0
-        candidate_selectors = ['article', 'main', 'div[class*="post"]', 'div[class*="content"]', 'div[class*="body"]', 'div[id*="post"]', 'div[id*="content"]', 'div[id*="body"]']
-        for selector in candidate_selectors:
-            for container in soup.select(selector):
-                text_len = len(container.get_text(strip=True))
-                if text_len > max_text_len:
-                    max_text_len = text_len
-                    best_container = container
+        # Un solo recorrido del árbol: longitudes de texto memoizadas por subárbol y <script> de la Capa 2.2
+        candidates, scripts = scan_document(soup)
+        best_container, max_text_len = select_main_container(candidates)
         
         article_body = best_container or soup.body
+        lap('contenedor')
 
         content_images = []
         # Capa 2: Filtrado Heurístico de <img>
         image_tags = article_body.find_all('img')
-        logger.info(f"Capa 2: Encontradas {len(image_tags)} etiquetas <img>.")
+        logger.info("Capa 2: Encontradas %s etiquetas <img>.", len(image_tags))
         for img in image_tags:
             src = img.get('data-src') or img.get('src')
             if not src or src.startswith('data:') or '.svg' in src: continue
             if any(keyword in src.lower() for keyword in ['logo', 'icon', 'avatar', 'banner', 'badge']): continue
             content_images.append(src)
+        lap('img')
         
         # Capa 2.1: Búsqueda en CSS (background-image)
         logger.info("Capa 2.1: Buscando imágenes en atributos 'style'...")
@@ -104,17 +223,18 @@ def extract_article_metadata(url: str, logger) -> dict | None:
                     content_images.append(bg_img_url)
             except IndexError:
                 continue
+        lap('fondos')
 
         # Capa 2.2: Búsqueda en JSON
         logger.info("Capa 2.2: Buscando imágenes en bloques de datos JSON...")
-        scripts = soup.find_all('script')
         for script in scripts:
             if script.string:
                 try:
-                    found_urls = re.findall(r'https?://\S+\.(?:jpg|jpeg|png|gif|webp)', script.string)
+                    found_urls = script_image_urls(script.string)
                     if found_urls:
                         content_images.extend(found_urls)
                 except Exception: continue
+        lap('scripts')
 
         # Fase C: Combinación y Deduplicación
         logger.info("Fase C: Combinando y depurando listas de imágenes...")
@@ -131,89 +251,243 @@ def extract_article_metadata(url: str, logger) -> dict | None:
                     seen_image_paths.add(url_path)
                     unique_images.append(img_url)
             except Exception as e:
-                logger.warning(f"No se pudo parsear la URL '{img_url}'. Error: {e}. Se omite.")
+                logger.warning("No se pudo parsear la URL '%s'. Error: %s. Se omite.", img_url, e)
+        lap('dedup')
         
         # Fase D: Absolutización de URLs
         unique_image_urls = [urljoin(url, img_url) for img_url in unique_images]
-        logger.info(f"Proceso de extracción finalizado. Se encontraron {len(unique_image_urls)} candidatas de imagen únicas.")
+        lap('urljoin')
+        logger.info("Proceso de extracción finalizado. Se encontraron %s candidatas de imagen únicas.", len(unique_image_urls))
 
         metadata = {"titulo": "Ejemplo", "resumen": "Ejemplo", "tags": "Ejemplo"}
         metadata['contenido_html'] = html_content
         metadata['urls_imagenes'] = unique_image_urls
+
+        # URL canónica declarada por el sitio: el curador la usa para descartar duplicados antes de la Capa 3
+        canonical_tag = soup.find('link', rel='canonical')
+        if canonical_tag and canonical_tag.get('href'):
+            metadata['url_canonica'] = urljoin(url, canonical_tag['href'].strip())
+
+        if profile is not None:
+            profile['candidatos'] = {
+                'contenedores': len(candidates),
+                'img': len(image_tags),
+                'fondos': len(background_tags),
+                'scripts': len(scripts),
+                'imagenes_contenido': len(content_images),
+                'imagenes_unicas': len(unique_image_urls),
+            }
         
         return metadata
 
     except Exception as e:
-        logger.error(f"Error procesando el HTML extraído: {e}", exc_info=True)
+        logger.error("Error procesando el HTML extraído: %s", e, exc_info=True)
         return None
 
-def analyze_image_with_vision(image_url: str, logger) -> str | None:
-    logger.info(f"Capa 3: Analizando imagen con IA de visión: {image_url}")
+def _load_image_bytes(image_url: str, image_cache: ImageCache | None, logger) -> tuple[bytes, str]:
+    """Devuelve (bytes, content-type) de la imagen, desde la caché si se proporciona o con el cliente HTTP del proceso."""
+    if image_cache is not None:
+        cached = image_cache.get(image_url)
+        return cached.data, cached.content_type
+    response = shared_http_client(logger).get(image_url, timeout=IMAGE_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return response.content, response.headers.get('content-type', '')
+
+def new_vision_stats() -> dict:
+    return {'peticiones': 0, 'tokens_entrada': 0, 'tokens_salida': 0, 'latencia': 0.0, 'desde_cache': 0, 'reintentos_individuales': 0}
+
+def _call_vision_model(prompt_parts: list, stats: dict | None) -> str:
+    """Llama al modelo de visión, acumula peticiones/tokens/latencia en `stats` y devuelve el texto sin vallas de código."""
+    model = genai.GenerativeModel(VISION_MODEL)
+    start = time.perf_counter()
+    response = model.generate_content(prompt_parts)
+    if stats is not None:
+        stats['peticiones'] += 1
+        stats['latencia'] += time.perf_counter() - start
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            stats['tokens_entrada'] += getattr(usage, 'prompt_token_count', 0) or 0
+            stats['tokens_salida'] += getattr(usage, 'candidates_token_count', 0) or 0
+    return response.text.strip().replace('```json', '').replace('```', '')
+
+def analyze_image_with_vision(image_url: str, logger, image_cache: ImageCache | None = None, vision_cache: VisionCache | None = None,
+                              stats: dict | None = None) -> str | None:
+    """
+    Clasifica una imagen con el modelo de visión y devuelve el JSON de la respuesta.
+    Con `vision_cache`, las imágenes cuyos bytes ya se analizaron con el mismo modelo y prompt no llaman al modelo.
+    """
+    logger.info("Capa 3: Analizando imagen con IA de visión: %s", image_url)
     try:
         if not image_url.startswith(('http://', 'https://')):
-             logger.warning(f"URL de imagen inválida, se omite: {image_url}")
+             logger.warning("URL de imagen inválida, se omite: %s", image_url)
              return None
 
-        model = genai.GenerativeModel(VISION_MODEL)
-        system_prompt = "Eres un experto analista de contenido visual para un medio periodístico. Tu tarea es analizar una imagen y clasificar su propósito dentro de un artículo. Responde únicamente con un objeto JSON válido sin formato adicional."
-        user_prompt = f'''Analiza la imagen. Clasifícala según uno de los siguientes tipos: "fotografia_principal", "grafico_o_diagrama", "captura_de_pantalla", "logo_o_banner", "irrelevante". Determina si es relevante para el contenido principal. La descripción debe ser concisa (máximo 15 palabras).\n\nFormato de respuesta JSON requerido:\n{{\n  "tipo": "uno de los tipos válidos",\n  "es_relevante": true/false,\n  "descripcion_ia": "Una descripción concisa de la imagen."
-}}'''
+        image_bytes, content_type = _load_image_bytes(image_url, image_cache, logger)
+        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+        if vision_cache is not None:
+            cached_analysis = vision_cache.get(image_sha256)
+            if cached_analysis is not None:
+                logger.info("Capa 3: Análisis recuperado de la caché de visión para %s", image_url)
+                if stats is not None:
+                    stats['desde_cache'] += 1
+                return cached_analysis
 
-        with httpx.Client(follow_redirects=True) as client:
-            response = client.get(image_url, timeout=30.0)
-            response.raise_for_status()
-            image_bytes = response.content
-        
-        image_part = { "mime_type": response.headers['content-type'], "data": image_bytes }
-        final_prompt = [system_prompt, user_prompt, image_part]
-        response = model.generate_content(final_prompt)
-        json_response_text = response.text.strip().replace('```json', '').replace('```', '')
+        image_part = { "mime_type": content_type, "data": image_bytes }
+        json_response_text = _call_vision_model([VISION_SYSTEM_PROMPT, VISION_USER_PROMPT, image_part], stats)
         json.loads(json_response_text)
+        if vision_cache is not None:
+            vision_cache.put(image_sha256, json_response_text)
         return json_response_text
 
     except Exception as e:
-        logger.error(f"Capa 3: Error en el análisis de visión para {image_url}: {e}", exc_info=True)
+        logger.error("Capa 3: Error en el análisis de visión para %s: %s", image_url, e, exc_info=True)
         return None
 
-def download_image(base_url: str, image_url: str, asset_id: int, image_order: int, output_dir: str, logger) -> Union[str, None]:
+def _parse_batch_verdicts(json_text: str, expected: int) -> list[dict] | None:
+    """
+    Valida la respuesta por lotes: un array con un veredicto por imagen, alineado por 'indice'.
+    Sin un 'indice' entero en cada veredicto no se puede saber a qué imagen corresponde (el modelo puede
+    reordenar u omitir), así que la respuesta se descarta en vez de asignarlo por posición.
+    """
+    try:
+        verdicts = json.loads(json_text)
+    except ValueError:
+        return None
+    if not isinstance(verdicts, list) or len(verdicts) != expected:
+        return None
+    aligned = [None] * expected
+    for verdict in verdicts:
+        if not isinstance(verdict, dict) or not all(key in verdict for key in ('tipo', 'es_relevante', 'descripcion_ia')):
+            return None
+        index = verdict.get('indice')
+        if type(index) is not int or not 0 <= index < expected or aligned[index] is not None:
+            return None
+        aligned[index] = {key: verdict[key] for key in ('tipo', 'es_relevante', 'descripcion_ia')}
+    return aligned
+
+def classify_images_batch(image_urls: list, logger, image_cache: ImageCache | None = None, vision_cache: VisionCache | None = None,
+                          batch_size: int = VISION_BATCH_SIZE) -> tuple[list, dict]:
+    """
+    Clasifica todas las imágenes de un artículo en una o pocas peticiones al modelo de visión.
+    Devuelve (lista de JSON por imagen o None, alineada con `image_urls`; estadísticas de la llamada).
+    Si la respuesta de un lote no es un array válido, ese lote se reintenta imagen por imagen.
+    """
+    stats = new_vision_stats()
+    results = [None] * len(image_urls)
+    pending = []
+    for index, image_url in enumerate(image_urls):
+        if not image_url.startswith(('http://', 'https://')):
+            logger.warning("URL de imagen inválida, se omite: %s", image_url)
+            continue
+        try:
+            image_bytes, content_type = _load_image_bytes(image_url, image_cache, logger)
+        except Exception as e:
+            logger.error("Capa 3: No se pudo descargar %s para el análisis por lotes: %s", image_url, e)
+            continue
+        image_sha256 = hashlib.sha256(image_bytes).hexdigest()
+        cached_analysis = vision_cache.get(image_sha256) if vision_cache is not None else None
+        if cached_analysis is not None:
+            stats['desde_cache'] += 1
+            results[index] = cached_analysis
+        else:
+            pending.append((index, image_url, image_sha256, {"mime_type": content_type, "data": image_bytes}))
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        logger.info("Capa 3: Analizando un lote de %s imágenes con IA de visión...", len(batch))
+        prompt_parts = [VISION_SYSTEM_PROMPT, VISION_BATCH_USER_PROMPT.replace('{n}', str(len(batch)))]
+        for batch_index, (_, _, _, image_part) in enumerate(batch):
+            prompt_parts.extend([f"Imagen {batch_index}:", image_part])
+        verdicts = None
+        try:
+            verdicts = _parse_batch_verdicts(_call_vision_model(prompt_parts, stats), len(batch))
+        except Exception as e:
+            logger.error("Capa 3: Error en el análisis por lotes: %s", e, exc_info=True)
+
+        if verdicts is None:
+            logger.warning("Capa 3: Respuesta por lotes inválida. Se analiza cada imagen por separado.")
+            for index, image_url, _, _ in batch:
+                stats['reintentos_individuales'] += 1
+                results[index] = analyze_image_with_vision(image_url, logger, image_cache=image_cache, vision_cache=vision_cache, stats=stats)
+            continue
+
+        for (index, _, image_sha256, _), verdict in zip(batch, verdicts):
+            results[index] = json.dumps(verdict, ensure_ascii=False)
+            if vision_cache is not None:
+                vision_cache.put(image_sha256, results[index])
+
+    return results, stats
+
+def _image_extension(image_url: str, content_type: str) -> str:
+    ext = os.path.splitext(urlparse(image_url).path)[1] or '.jpg'
+    if 'png' in content_type: ext = '.png'
+    elif 'gif' in content_type: ext = '.gif'
+    elif 'webp' in content_type: ext = '.webp'
+    return ext
+
+def fetch_image(base_url: str, image_url: str, logger, image_cache: ImageCache | None = None) -> CachedImage | None:
+    """Trae la imagen a memoria (de la caché si la hay) sin escribirla en disco; None si la descarga falla."""
     if not image_url: return None
     absolute_image_url = urljoin(base_url, image_url)
     try:
-        with httpx.stream("GET", absolute_image_url, timeout=20, follow_redirects=True) as response:
+        if image_cache is not None:
+            return image_cache.get(absolute_image_url)
+        data, content_type = _load_image_bytes(absolute_image_url, None, logger)
+        return CachedImage(data, content_type, hashlib.sha256(data).hexdigest())
+    except Exception as e:
+        logger.error("Fallo la descarga de %s: %s", absolute_image_url, e)
+        return None
+
+def download_image(base_url: str, image_url: str, asset_id: int, image_order: int, output_dir: str, logger, image_cache: ImageCache | None = None) -> Union[str, None]:
+    if not image_url: return None
+    absolute_image_url = urljoin(base_url, image_url)
+    try:
+        if image_cache is not None:
+            # Normalmente ya está en caché porque el análisis de visión la descargó antes
+            cached = image_cache.get(absolute_image_url)
+            os.makedirs(output_dir, exist_ok=True)
+            local_path = os.path.join(output_dir, f"{asset_id}_{image_order}{_image_extension(absolute_image_url, cached.content_type)}")
+            with open(local_path, 'wb') as f:
+                f.write(cached.data)
+            logger.info("¡ÉXITO! Imagen guardada en: %s", local_path)
+            return local_path
+
+        with shared_http_client(logger).stream("GET", absolute_image_url, timeout=DOWNLOAD_TIMEOUT_SECONDS) as response:
             response.raise_for_status()
             content_type = response.headers.get('content-type', '')
-            ext = os.path.splitext(urlparse(absolute_image_url).path)[1] or '.jpg'
-            if 'png' in content_type: ext = '.png'
-            elif 'gif' in content_type: ext = '.gif'
-            elif 'webp' in content_type: ext = '.webp'
-            filename = f"{asset_id}_{image_order}{ext}"
+            filename = f"{asset_id}_{image_order}{_image_extension(absolute_image_url, content_type)}"
             os.makedirs(output_dir, exist_ok=True)
             local_path = os.path.join(output_dir, filename)
             with open(local_path, 'wb') as f:
                 for chunk in response.iter_bytes():
                     f.write(chunk)
-            logger.info(f"¡ÉXITO! Imagen guardada en: {local_path}")
+            logger.info("¡ÉXITO! Imagen guardada en: %s", local_path)
             return local_path
     except Exception as e:
-        logger.error(f"Fallo la descarga de {absolute_image_url}: {e}")
+        logger.error("Fallo la descarga de %s: %s", absolute_image_url, e)
         return None
 
-def upload_image_to_storage(supabase_client: SupabaseClient, local_path: str, asset_id: int, image_order: int, logger) -> str | None:
-    logger.info(f"Iniciando intento de subida a Supabase Storage para: {local_path}")
+def upload_image_to_storage(supabase_client: SupabaseClient, local_path: str, asset_id: int, image_order: int, logger,
+                            image_cache: ImageCache | None = None, image_url: str | None = None) -> str | None:
+    """Sube la imagen a Storage. Si sus bytes siguen en la caché, se suben desde memoria sin releer el archivo."""
+    logger.info("Iniciando intento de subida a Supabase Storage para: %s", local_path)
     if not local_path or not os.path.exists(local_path):
         logger.warning("La subida se omitió porque la ruta local no es válida o no existe.")
         return None
     try:
         file_ext = os.path.splitext(local_path)[1]
         remote_path = f"asset_{asset_id}/{asset_id}_{image_order}{file_ext}"
-        with open(local_path, 'rb') as f:
-            supabase_client.storage.from_(BUCKET_NAME).upload(
-                path=remote_path, file=f, file_options={"cache-control": "3600", "upsert": "true"}
-            )
-        logger.info(f"Subida a Supabase Storage completada para la ruta remota: {remote_path}")
+        file_options = {"cache-control": "3600", "upsert": "true"}
+        cached = image_cache.peek(image_url) if image_cache is not None and image_url else None
+        if cached is not None:
+            supabase_client.storage.from_(BUCKET_NAME).upload(path=remote_path, file=cached.data, file_options=file_options)
+        else:
+            with open(local_path, 'rb') as f:
+                supabase_client.storage.from_(BUCKET_NAME).upload(path=remote_path, file=f, file_options=file_options)
+        logger.info("Subida a Supabase Storage completada para la ruta remota: %s", remote_path)
         response = supabase_client.storage.from_(BUCKET_NAME).get_public_url(remote_path)
-        logger.info(f"URL pública de Supabase obtenida: {response}")
+        logger.info("URL pública de Supabase obtenida: %s", response)
         return response
     except Exception as e:
-        logger.error(f"Error al subir a Supabase Storage: {e}", exc_info=True)
+        logger.error("Error al subir a Supabase Storage: %s", e, exc_info=True)
         return None
\ No newline at end of file
@@ -1,6 +1,7 @@
 # src/db_manager.py (v10.0 - Final Optimized Schema)
 import os
 import psycopg2
+import threading
 import time
 from supabase import create_client, Client
 
@@ -8,6 +9,14 @@ from supabase import create_client, Client
 URLS_TABLE = 'urls_para_procesar'
 ASSETS_TABLE = 'activos'
 IMAGES_TABLE = 'imagenes'
+FEEDS_TABLE = 'estado_feeds'
+
+# Segundos que una URL reclamada queda reservada para un worker antes de poder ser reclamada por otro
+DEFAULT_LEASE_SECONDS = 900
+# Renovaciones del lease por periodo: un worker vivo lo alarga antes de que caduque aunque una página tarde
+LEASE_RENEWALS_PER_PERIOD = 3
+# Canal de NOTIFY por el que el trigger de la cola despierta al curador en modo daemon
+NOTIFY_CHANNEL = 'urls_pendientes'
 
 # --- INFRAESTRUCTURA COMO CÓDIGO (IaC) v10.0 ---
 SCHEMA_SQL = f"""
@@ -20,6 +29,7 @@ DROP TABLE IF EXISTS public.activos_curados CASCADE;
 DROP TABLE IF EXISTS public.imagenes CASCADE;
 DROP TABLE IF EXISTS public.activos CASCADE;
 DROP TABLE IF EXISTS public.urls_para_procesar CASCADE;
+DROP TABLE IF EXISTS public.estado_feeds CASCADE;
 
 -- Crear la estructura de tablas final y optimizada
 CREATE TABLE IF NOT EXISTS public.{URLS_TABLE} (
@@ -27,9 +37,106 @@ CREATE TABLE IF NOT EXISTS public.{URLS_TABLE} (
     created_at timestamptz DEFAULT now() NOT NULL,
     url text NOT NULL UNIQUE,
     estado text DEFAULT 'pendiente' NOT NULL,
-    ultimo_error text
+    ultimo_error text,
+    worker_id text,
+    lease_expira timestamptz,
+    url_canonica text
+);
+
+-- Clave canónica de una URL para detectar duplicados: sin esquema, 'www.'/'amp.', puerto por defecto,
+-- fragmento, barra final, sufijo /amp ni parámetros de seguimiento; el resto de parámetros, ordenados.
+-- La aplican el trigger de inserción (panel, submit-url, feed_watcher) y el curador al resolver
+-- <link rel=canonical>. src/canonical_url.py la replica en Python para probarla: cambiar ambas a la vez.
+CREATE OR REPLACE FUNCTION public.canonicalizar_url(p_url text)
+RETURNS text
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    v_rest text;
+    v_host text;
+    v_path text;
+    v_query text;
+BEGIN
+    v_rest := regexp_replace(btrim(p_url), '^[a-zA-Z][a-zA-Z0-9+.-]*://', '');
+    v_rest := split_part(v_rest, '#', 1);
+    v_host := lower(substring(v_rest from '^[^/?]*'));
+    v_host := regexp_replace(regexp_replace(v_host, '^(www|amp)\\.', ''), ':(80|443)$', '');
+    v_path := COALESCE(substring(v_rest from '^[^/?]*([^?]*)'), '');
+    v_path := regexp_replace(regexp_replace(v_path, '/amp/?$', ''), '/+$', '');
+    SELECT string_agg(param, '&' ORDER BY param) INTO v_query
+    FROM unnest(string_to_array(substring(v_rest from '\\?(.*)$'), '&')) AS param
+    WHERE param <> ''
+      AND lower(split_part(param, '=', 1)) !~ '^(utm_.*|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|_ga|ref|ref_src|amp|outputtype)$';
+    RETURN v_host || v_path || COALESCE('?' || v_query, '');
+END;
+$$;
+
+-- La clave la calcula siempre la BD, de modo que ningún cliente puede saltarse la deduplicación
+CREATE OR REPLACE FUNCTION public.asignar_url_canonica()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.url_canonica := public.canonicalizar_url(NEW.url);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_{URLS_TABLE}_canonica ON public.{URLS_TABLE};
+CREATE TRIGGER trg_{URLS_TABLE}_canonica
+    BEFORE INSERT ON public.{URLS_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION public.asignar_url_canonica();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_{URLS_TABLE}_canonica ON public.{URLS_TABLE} (url_canonica);
+
+-- Encolado en lote (feed_watcher). ON CONFLICT sin objetivo ignora tanto la clave canónica repetida como
+-- la URL literal ya encolada, cuya clave puede haber cambiado al resolver su rel=canonical: un duplicado
+-- no tumba el lote. Devuelve cuántas URLs eran nuevas.
+CREATE OR REPLACE FUNCTION public.encolar_urls(p_urls text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH nuevas AS (
+        INSERT INTO public.{URLS_TABLE} (url)
+        SELECT u.url FROM unnest(p_urls) WITH ORDINALITY AS u(url, posicion)
+        ORDER BY u.posicion
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM nuevas;
+$$;
+
+-- Índice parcial para que la reclamación de la cola no recorra las URLs ya terminadas
+CREATE INDEX IF NOT EXISTS idx_{URLS_TABLE}_cola ON public.{URLS_TABLE} (created_at, id) WHERE estado IN ('pendiente', 'en_proceso');
+
+-- Estado incremental del vigilante de feeds: validadores HTTP y última entrada vista por feed
+CREATE TABLE IF NOT EXISTS public.{FEEDS_TABLE} (
+    feed_url text PRIMARY KEY,
+    etag text,
+    last_modified text,
+    ultimo_id_entrada text,
+    revisado_en timestamptz DEFAULT now() NOT NULL
 );
 
+-- Aviso al daemon del curador cuando una URL entra (o vuelve) a 'pendiente'.
+-- La carga vacía hace que Postgres agrupe en una sola las notificaciones de una misma transacción.
+CREATE OR REPLACE FUNCTION public.notificar_url_pendiente()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('{NOTIFY_CHANNEL}', '');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_{URLS_TABLE}_notificar ON public.{URLS_TABLE};
+CREATE TRIGGER trg_{URLS_TABLE}_notificar
+    AFTER INSERT OR UPDATE OF estado ON public.{URLS_TABLE}
+    FOR EACH ROW WHEN (NEW.estado = 'pendiente')
+    EXECUTE FUNCTION public.notificar_url_pendiente();
+
 CREATE TABLE IF NOT EXISTS public.{ASSETS_TABLE} (
     id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
     source_url_id bigint UNIQUE REFERENCES public.{URLS_TABLE}(id) ON DELETE SET NULL,
@@ -48,8 +155,172 @@ CREATE TABLE IF NOT EXISTS public.{IMAGES_TABLE} (
     url_almacenamiento text,
     descripcion_ia text,
     tags_visuales_ia text,
-    orden_aparicion smallint
+    orden_aparicion smallint,
+    -- Variantes responsive: [{{"formato": "webp", "ancho": 640, "alto": 427, "bytes": 31012, "url": "..."}}, ...]
+    variantes jsonb DEFAULT '[]'::jsonb NOT NULL
 );
+
+-- Cola de trabajo: cada worker reclama un lote de URLs de forma atómica con un lease.
+-- SKIP LOCKED evita que dos workers se bloqueen o tomen la misma fila; las filas 'en_proceso'
+-- cuyo lease caducó (worker caído) o que no tienen lease vuelven a ser reclamables.
+CREATE OR REPLACE FUNCTION public.reclamar_urls(p_worker_id text, p_limite integer, p_lease_segundos integer DEFAULT 900)
+RETURNS SETOF public.{URLS_TABLE}
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.{URLS_TABLE} AS u
+    SET estado = 'en_proceso',
+        worker_id = p_worker_id,
+        lease_expira = now() + make_interval(secs => p_lease_segundos)
+    WHERE u.id IN (
+        SELECT c.id FROM public.{URLS_TABLE} AS c
+        WHERE c.estado = 'pendiente' OR (c.estado = 'en_proceso' AND COALESCE(c.lease_expira, '-infinity') < now())
+        ORDER BY c.created_at, c.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING u.*;
+END;
+$$;
+
+-- Devuelve a 'pendiente' las URLs reclamadas que un worker no llegó a procesar (p. ej. al recibir SIGTERM)
+CREATE OR REPLACE FUNCTION public.liberar_urls(p_worker_id text, p_ids bigint[])
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE public.{URLS_TABLE}
+    SET estado = 'pendiente', worker_id = NULL, lease_expira = NULL
+    WHERE id = ANY(p_ids) AND worker_id = p_worker_id AND estado = 'en_proceso';
+$$;
+
+-- Un worker activo alarga el lease de todas las URLs que tiene reclamadas, en curso o esperando turno
+CREATE OR REPLACE FUNCTION public.renovar_leases(p_worker_id text, p_lease_segundos integer DEFAULT 900)
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH renovadas AS (
+        UPDATE public.{URLS_TABLE}
+        SET lease_expira = now() + make_interval(secs => p_lease_segundos)
+        WHERE worker_id = p_worker_id AND estado = 'en_proceso'
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM renovadas;
+$$;
+
+-- Tras la extracción, adopta como clave la URL de <link rel=canonical>. Si otra fila ya la tiene,
+-- esta URL se marca 'duplicado', se borra su activo recién creado y se devuelve el id de la original.
+-- Con p_worker_id, no hace nada (y devuelve NULL) si la URL ya no está reclamada por ese worker.
+DROP FUNCTION IF EXISTS public.resolver_url_canonica(bigint, text);
+CREATE OR REPLACE FUNCTION public.resolver_url_canonica(p_url_id bigint, p_url_canonica text, p_worker_id text DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_clave text := public.canonicalizar_url(p_url_canonica);
+    v_original bigint;
+BEGIN
+    PERFORM 1 FROM public.{URLS_TABLE}
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT id INTO v_original FROM public.{URLS_TABLE} WHERE url_canonica = v_clave AND id <> p_url_id;
+    IF v_original IS NULL THEN
+        BEGIN
+            UPDATE public.{URLS_TABLE} SET url_canonica = v_clave WHERE id = p_url_id;
+            RETURN NULL;
+        EXCEPTION WHEN unique_violation THEN
+            -- Otro worker resolvió la misma clave a la vez
+            SELECT id INTO v_original FROM public.{URLS_TABLE} WHERE url_canonica = v_clave AND id <> p_url_id;
+        END;
+    END IF;
+    DELETE FROM public.{ASSETS_TABLE} WHERE source_url_id = p_url_id;
+    UPDATE public.{URLS_TABLE}
+    SET estado = 'duplicado', ultimo_error = 'Duplicado de la URL ID ' || v_original, lease_expira = NULL
+    WHERE id = p_url_id;
+    RETURN v_original;
+END;
+$$;
+
+-- Transiciones de curación agrupadas: una llamada RPC (una transacción) por fase.
+-- Con p_worker_id, iniciar_curacion no toca el activo de la URL (y devuelve NULL) si su lease pasó a otro worker.
+DROP FUNCTION IF EXISTS public.iniciar_curacion(bigint, text);
+CREATE OR REPLACE FUNCTION public.iniciar_curacion(p_url_id bigint, p_url text, p_worker_id text DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_asset_id bigint;
+BEGIN
+    UPDATE public.{URLS_TABLE} SET estado = 'en_proceso'
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id);
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    -- Idempotencia: se borra el activo anterior de la URL (las imágenes caen en cascada)
+    DELETE FROM public.{ASSETS_TABLE} WHERE source_url_id = p_url_id;
+    INSERT INTO public.{ASSETS_TABLE} (source_url_id, url_original) VALUES (p_url_id, p_url) RETURNING id INTO v_asset_id;
+    RETURN v_asset_id;
+END;
+$$;
+
+-- Con p_worker_id, las escrituras finales solo se aplican si la URL sigue reclamada por ese worker:
+-- uno cuyo lease caducó y fue reasignado no pisa el resultado del nuevo dueño. Devuelven si se aplicaron.
+-- Las versiones sin p_worker_id se borran: con ellas, PostgREST no sabría qué sobrecarga llamar
+DROP FUNCTION IF EXISTS public.finalizar_curacion(bigint, bigint, jsonb, jsonb);
+DROP FUNCTION IF EXISTS public.fallar_curacion(bigint, bigint, text);
+CREATE OR REPLACE FUNCTION public.finalizar_curacion(p_url_id bigint, p_asset_id bigint, p_metadatos jsonb, p_imagenes jsonb, p_worker_id text DEFAULT NULL)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1 FROM public.{URLS_TABLE}
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    UPDATE public.{ASSETS_TABLE}
+    SET titulo = p_metadatos->>'titulo',
+        resumen = p_metadatos->>'resumen',
+        tags = p_metadatos->>'tags',
+        estado_curacion = 'completado'
+    WHERE id = p_asset_id;
+
+    INSERT INTO public.{IMAGES_TABLE} (asset_id, url_original_imagen, url_almacenamiento, descripcion_ia, tags_visuales_ia, orden_aparicion, variantes)
+    SELECT p_asset_id, i.url_original_imagen, i.url_almacenamiento, i.descripcion_ia, i.tags_visuales_ia, i.orden_aparicion,
+           COALESCE(i.variantes, '[]'::jsonb)
+    FROM jsonb_to_recordset(COALESCE(p_imagenes, '[]'::jsonb))
+        AS i(url_original_imagen text, url_almacenamiento text, descripcion_ia text, tags_visuales_ia text, orden_aparicion smallint, variantes jsonb);
+
+    UPDATE public.{URLS_TABLE} SET estado = 'completado', ultimo_error = NULL, lease_expira = NULL WHERE id = p_url_id;
+    RETURN true;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.fallar_curacion(p_url_id bigint, p_asset_id bigint, p_error text, p_worker_id text DEFAULT NULL)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1 FROM public.{URLS_TABLE}
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    IF p_asset_id IS NOT NULL THEN
+        UPDATE public.{ASSETS_TABLE} SET estado_curacion = 'fallido' WHERE id = p_asset_id;
+    END IF;
+    UPDATE public.{URLS_TABLE} SET estado = 'error', ultimo_error = p_error, lease_expira = NULL WHERE id = p_url_id;
+    RETURN true;
+END;
+$$;
 """
 
 def get_supabase_client(logger):
@@ -69,3 +340,156 @@ def setup_database_schema(supabase: Client, logger):
     except Exception as e:
         logger.error(f"Error al configurar el schema de la BD: {e}", exc_info=True)
         raise
+
+def claim_urls(supabase: Client, logger, worker_id: str, limit: int, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> list:
+    """Reclama atómicamente hasta `limit` URLs pendientes (o con lease caducado) para este worker."""
+    response = supabase.rpc('reclamar_urls', {'p_worker_id': worker_id, 'p_limite': limit, 'p_lease_segundos': lease_seconds}).execute()
+    claimed = response.data or []
+    if claimed:
+        logger.info(f"Worker {worker_id} reclamó {len(claimed)} URLs (lease de {lease_seconds}s).")
+    return claimed
+
+def release_urls(supabase: Client, logger, worker_id: str, url_ids: list):
+    """Devuelve a 'pendiente' las URLs reclamadas por este worker que no se llegaron a procesar."""
+    if not url_ids:
+        return
+    supabase.rpc('liberar_urls', {'p_worker_id': worker_id, 'p_ids': url_ids}).execute()
+    logger.info(f"Worker {worker_id} liberó {len(url_ids)} URLs sin procesar de vuelta a 'pendiente'.")
+
+def renew_leases(supabase: Client, logger, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> int:
+    """Alarga el lease de todas las URLs que este worker tiene reclamadas. Devuelve cuántas renovó."""
+    response = supabase.rpc('renovar_leases', {'p_worker_id': worker_id, 'p_lease_segundos': lease_seconds}).execute()
+    return response.data or 0
+
+
+class LeaseRenewer:
+    """
+    Hilo que renueva cada `lease_seconds / LEASE_RENEWALS_PER_PERIOD` segundos los leases del worker, de modo que
+    las URLs que esperan turno o cuya curación se alarga (retos, muchas imágenes) no caduquen y otro worker las
+    reclame mientras este sigue con ellas. Si el proceso muere, deja de renovar y los leases caducan como siempre.
+    """
+
+    def __init__(self, supabase: Client, logger, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS):
+        self.supabase = supabase
+        self.logger = logger
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = lease_seconds / LEASE_RENEWALS_PER_PERIOD
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='renovacion-leases', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                renewed = renew_leases(self.supabase, self.logger, self.worker_id, self.lease_seconds)
+                self.logger.info(f"Worker {self.worker_id} renovó el lease de {renewed} URLs.")
+            except Exception as e:
+                self.logger.warning(f"No se pudieron renovar los leases del worker {self.worker_id}: {e}")
+
+
+def add_urls_if_not_exist(supabase: Client, logger, urls: list) -> int:
+    """
+    Encola las URLs con la RPC encolar_urls (un único INSERT ... ON CONFLICT DO NOTHING). Devuelve cuántas eran nuevas.
+    La clave canónica la calcula el trigger de la tabla, así que las variantes de una URL ya encolada se ignoran,
+    igual que la propia URL aunque su clave haya cambiado al resolver su rel=canonical.
+    """
+    if not urls:
+        return 0
+    unique_urls = list(dict.fromkeys(urls))
+    response = supabase.rpc('encolar_urls', {'p_urls': unique_urls}).execute()
+    inserted = response.data or 0
+    logger.info(f"{inserted} de {len(unique_urls)} URLs encoladas como nuevas (el resto ya existía).")
+    return inserted
+
+def get_feed_states(supabase: Client, feed_urls: list) -> dict:
+    """Devuelve {feed_url: estado} con los validadores HTTP y la última entrada vista de cada feed."""
+    if not feed_urls:
+        return {}
+    response = supabase.table(FEEDS_TABLE).select('*').in_('feed_url', feed_urls).execute()
+    return {row['feed_url']: row for row in response.data or []}
+
+def save_feed_states(supabase: Client, states: list):
+    """Guarda en un solo upsert el estado de los feeds que cambiaron en esta ejecución."""
+    if states:
+        supabase.table(FEEDS_TABLE).upsert(states, on_conflict='feed_url').execute()
+
+
+class CurationWriter:
+    """
+    Agrupa las escrituras de una URL en la BD: un RPC para iniciar la curación, las filas de
+    imágenes en memoria y un único RPC final (una transacción) con metadatos, imágenes y estados.
+    Lleva la cuenta de viajes de ida y vuelta a PostgREST para poder medir la reducción.
+    """
+
+    def __init__(self, supabase: Client, logger, url_id: int, url: str, worker_id: str | None = None):
+        self.supabase = supabase
+        self.logger = logger
+        self.url_id = url_id
+        self.url = url
+        # Con worker_id, las escrituras finales se descartan si el lease de la URL pasó a otro worker
+        self.worker_id = worker_id
+        self.asset_id = None
+        self.round_trips = 0
+        self._metadata = {}
+        self._image_rows = []
+
+    def _rpc(self, function_name: str, params: dict):
+        self.round_trips += 1
+        return self.supabase.rpc(function_name, params).execute()
+
+    def start(self) -> int | None:
+        """
+        Marca la URL 'en_proceso', borra el activo anterior y crea uno nuevo. Devuelve su id,
+        o None (sin tocar nada) si la URL ya no está reclamada por este worker.
+        """
+        response = self._rpc('iniciar_curacion', {'p_url_id': self.url_id, 'p_url': self.url, 'p_worker_id': self.worker_id})
+        self.asset_id = response.data
+        if self.asset_id is None:
+            self.logger.warning(f"URL ID {self.url_id}: el lease pasó a otro worker antes de empezar; se omite.")
+        return self.asset_id
+
+    def resolve_canonical(self, canonical_url: str) -> int | None:
+        """
+        Registra la URL canónica del artículo. Devuelve el id de la URL original si esta es un duplicado.
+        Si la URL ya no está reclamada por este worker no cambia nada; complete() lo detectará después.
+        """
+        response = self._rpc('resolver_url_canonica', {'p_url_id': self.url_id, 'p_url_canonica': canonical_url,
+                                                        'p_worker_id': self.worker_id})
+        return response.data
+
+    def set_metadata(self, metadata: dict):
+        self._metadata = {key: metadata.get(key) for key in ('titulo', 'resumen', 'tags')}
+
+    def add_image(self, image_row: dict):
+        self._image_rows.append({key: value for key, value in image_row.items() if key != 'asset_id'})
+
+    def complete(self) -> bool:
+        """
+        Guarda metadatos e imágenes y marca activo y URL como 'completado' en una sola transacción.
+        Devuelve False (sin escribir nada) si la URL ya no está reclamada por este worker.
+        """
+        response = self._rpc('finalizar_curacion', {
+            'p_url_id': self.url_id,
+            'p_asset_id': self.asset_id,
+            'p_metadatos': self._metadata,
+            'p_imagenes': self._image_rows,
+            'p_worker_id': self.worker_id,
+        })
+        if response.data is False:
+            self.logger.warning(f"URL ID {self.url_id}: el lease pasó a otro worker; se descarta el resultado.")
+            return False
+        self.logger.info(f"{len(self._image_rows)} imágenes y metadatos guardados para Asset ID {self.asset_id} en una sola escritura.")
+        return True
+
+    def fail(self, error: str):
+        """Marca el activo (si existe) como 'fallido' y la URL como 'error', si sigue reclamada por este worker."""
+        self._rpc('fallar_curacion', {'p_url_id': self.url_id, 'p_asset_id': self.asset_id, 'p_error': error, 'p_worker_id': self.worker_id})
@@ -0,0 +1,47 @@
+# src/health_server.py
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class HealthServer:
+    """
+    Servidor HTTP mínimo para procesos de larga duración.
+    GET /healthz responde 200 o 503 según la clave 'sano' de `snapshot()`;
+    GET /metrics devuelve el `snapshot()` completo en JSON.
+    """
+
+    def __init__(self, logger, port: int, snapshot, host: str = '0.0.0.0'):
+        self.logger = logger
+        self.snapshot = snapshot
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/healthz', '/metrics'):
+                    self.send_error(404)
+                    return
+                data = server.snapshot()
+                status = 200 if self.path == '/metrics' or data.get('sano') else 503
+                body = json.dumps(data if self.path == '/metrics' else {'sano': bool(data.get('sano'))}).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                server.logger.debug(f"Salud HTTP: {format % args}")
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self.port = self._httpd.server_address[1]
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='health-server', daemon=True)
+        self._thread.start()
+        self.logger.info(f"Endpoint de salud escuchando en el puerto {self.port} (/healthz, /metrics).")
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
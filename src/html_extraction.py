@@ -0,0 +1,107 @@
+# src/html_extraction.py
+import importlib.util
+import re
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+# --- CONFIGURACIÓN ---
+# Selectores de la Capa 1 en orden de prioridad: ante empate de longitud gana el primero que coincida
+CANDIDATE_SELECTORS = ['article', 'main', 'div[class*="post"]', 'div[class*="content"]', 'div[class*="body"]', 'div[id*="post"]', 'div[id*="content"]', 'div[id*="body"]']
+# Equivalente de CANDIDATE_SELECTORS[2:] como (atributo, subcadena) sobre los <div>
+DIV_ATTRIBUTE_SELECTORS = [('class', 'post'), ('class', 'content'), ('class', 'body'), ('id', 'post'), ('id', 'content'), ('id', 'body')]
+# Tipos de cadena que cuenta get_text() en un <div>/<article>/<main>: excluye comentarios y el contenido de <script>/<style>/<template>
+TEXT_STRING_TYPES = (NavigableString, CData)
+
+SCRIPT_IMAGE_URL_RE = re.compile(r'https?://\S+\.(?:jpg|jpeg|png|gif|webp)')
+# El regex exige una de estas subcadenas literales; si no aparece, el script no puede coincidir
+SCRIPT_IMAGE_MARKERS = ('.jp', '.png', '.gif', '.webp')
+
+PARSER_BACKENDS = {'html.parser': None, 'lxml': 'lxml'}
+
+
+def available_parser(parser: str) -> str:
+    """Devuelve `parser` si su dependencia está instalada; si no, el html.parser de la biblioteca estándar."""
+    module = PARSER_BACKENDS.get(parser)
+    if parser not in PARSER_BACKENDS or (module and importlib.util.find_spec(module) is None):
+        return 'html.parser'
+    return parser
+
+
+def make_soup(html_content: str, parser: str = 'html.parser') -> BeautifulSoup:
+    return BeautifulSoup(html_content, available_parser(parser))
+
+
+def _candidate_rank(tag: Tag) -> int | None:
+    """Índice del primer selector de CANDIDATE_SELECTORS que coincide con el tag, o None."""
+    if tag.name == 'article':
+        return 0
+    if tag.name == 'main':
+        return 1
+    if tag.name != 'div':
+        return None
+    for rank, (attribute, needle) in enumerate(DIV_ATTRIBUTE_SELECTORS, start=2):
+        value = tag.get(attribute)
+        # Los atributos multivalor (class) se comparan unidos por espacios, como en los selectores CSS
+        if isinstance(value, list):
+            value = ' '.join(value)
+        if value and needle in value:
+            return rank
+    return None
+
+
+def scan_document(soup: BeautifulSoup) -> tuple[list, list]:
+    """
+    Recorre el árbol una sola vez en orden de documento y calcula, de abajo arriba, la longitud de
+    get_text(strip=True) de cada contenedor candidato reutilizando la de sus hijos.
+    Devuelve ([(rango, orden, longitud, tag)] de los candidatos, [<script>] en orden de documento).
+    """
+    candidates = []
+    scripts = []
+    # Pila de (tag, iterador de hijos, índice en candidates o None); totals acumula la longitud de cada nivel
+    stack = [(soup, iter(soup.contents), None)]
+    totals = [0]
+    order = 0
+    while stack:
+        tag, children, candidate_index = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            total = totals.pop()
+            if candidate_index is not None:
+                rank, position, _, candidate = candidates[candidate_index]
+                candidates[candidate_index] = (rank, position, total, candidate)
+            if totals:
+                totals[-1] += total
+        elif isinstance(child, Tag):
+            if child.name == 'script':
+                scripts.append(child)
+            rank = _candidate_rank(child)
+            index = None
+            if rank is not None:
+                index = len(candidates)
+                candidates.append((rank, order, 0, child))
+            order += 1
+            stack.append((child, iter(child.contents), index))
+            totals.append(0)
+        elif type(child) in TEXT_STRING_TYPES:
+            totals[-1] += len(child.strip())
+    return candidates, scripts
+
+
+def select_main_container(candidates: list) -> tuple[Tag | None, int]:
+    """
+    Elige el contenedor con más texto. Reproduce el recorrido selector a selector de la Capa 1:
+    ante empate gana el de menor selector y, dentro de él, el primero en el documento.
+    """
+    best = None
+    for rank, position, text_len, tag in candidates:
+        if text_len > 0 and (best is None or (-text_len, rank, position) < (-best[2], best[0], best[1])):
+            best = (rank, position, text_len, tag)
+    return (best[3], best[2]) if best else (None, 0)
+
+
+def script_image_urls(script_text: str) -> list:
+    """URLs de imagen dentro del texto de un <script> (Capa 2.2)."""
+    if 'http' not in script_text or not any(marker in script_text for marker in SCRIPT_IMAGE_MARKERS):
+        return []
+    return SCRIPT_IMAGE_URL_RE.findall(script_text)
@@ -0,0 +1,167 @@
+# src/http_client.py
+import contextlib
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:  # sin h2, httpx habla solo HTTP/1.1
+    HTTP2_AVAILABLE = False
+
+# --- CONFIGURACIÓN ---
+CONNECT_TIMEOUT_SECONDS = 5.0
+DEFAULT_TIMEOUT_SECONDS = 30.0
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+KEEPALIVE_EXPIRY_SECONDS = 30.0
+# Peticiones simultáneas a un mismo host (con HTTP/2, flujos de una misma conexión)
+PER_HOST_LIMIT = 6
+# Reintentos ante errores transitorios (red, 429 y 5xx de pasarela) con espera exponencial y jitter completo
+MAX_RETRIES = 2
+RETRY_BASE_DELAY_SECONDS = 0.5
+RETRY_MAX_DELAY_SECONDS = 8.0
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+
+class HttpClient:
+    """
+    Cliente HTTP compartido por todo el proceso: un único pool de conexiones (keep-alive y, si está h2, HTTP/2),
+    un límite de peticiones simultáneas por host y reintentos con jitter para los errores transitorios.
+    Así las 10 imágenes de un artículo servidas por el mismo CDN pagan un solo handshake TCP/TLS.
+    Expone la misma interfaz que httpx.Client para get() y stream(), de modo que los módulos aceptan uno u otro.
+    `counters` distingue conexiones nuevas de reutilizadas con los eventos de traza de httpcore.
+    """
+
+    def __init__(self, logger, http2: bool | None = None, per_host_limit: int = PER_HOST_LIMIT, max_retries: int = MAX_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT_SECONDS, transport: httpx.BaseTransport | None = None):
+        self.logger = logger
+        self.http2 = HTTP2_AVAILABLE if http2 is None else http2 and HTTP2_AVAILABLE
+        self.per_host_limit = per_host_limit
+        self.max_retries = max_retries
+        self._client = httpx.Client(
+            http2=self.http2,
+            follow_redirects=True,
+            timeout=httpx.Timeout(timeout, connect=CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                                keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS),
+            transport=transport,
+        )
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self.counters = Counter()
+
+    def close(self):
+        self._client.close()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        parsed = urlparse(str(url))
+        host = f"{parsed.hostname}:{parsed.port or parsed.scheme}"
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        value = response.headers.get('retry-after', '')
+        return min(float(value), RETRY_MAX_DELAY_SECONDS) if value.isdigit() else None
+
+    def _send(self, method: str, url: str, stream: bool, **kwargs) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            events = set()
+            request = self._client.build_request(method, url, extensions={'trace': lambda name, info: events.add(name)}, **kwargs)
+            try:
+                response = self._client.send(request, stream=stream)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    self._count('errores')
+                    raise
+                delay = self._backoff(attempt)
+                self.logger.warning("HTTP: %s en %s; reintento %d en %.2fs.", type(e).__name__, url, attempt + 1, delay)
+                self._count(f'reintentos:{type(e).__name__}')
+                time.sleep(delay)
+                continue
+
+            with self._lock:
+                self.counters['peticiones'] += 1
+                if 'connection.connect_tcp.complete' in events:
+                    self.counters['conexiones_nuevas'] += 1
+                    self.counters['handshakes_tls'] += 'connection.start_tls.complete' in events
+                else:
+                    self.counters['conexiones_reutilizadas'] += 1
+                self.counters['respuestas_http2'] += response.http_version == 'HTTP/2'
+
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                delay = self._retry_after(response) or self._backoff(attempt)
+                self.logger.warning("HTTP: %d en %s; reintento %d en %.2fs.", response.status_code, url, attempt + 1, delay)
+                self._count(f'reintentos:http_{response.status_code}')
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        """GET con reintentos. Acepta los argumentos de httpx.Client.get (headers, params, timeout...)."""
+        with self._host_slot(url):
+            return self._send('GET', url, stream=False, **kwargs)
+
+    @contextlib.contextmanager
+    def stream(self, method: str, url: str, **kwargs):
+        """Como httpx.Client.stream: solo se reintenta hasta recibir la respuesta, no durante la lectura del cuerpo."""
+        with self._host_slot(url):
+            response = self._send(method, url, stream=True, **kwargs)
+            try:
+                yield response
+            finally:
+                response.close()
+
+    def log_summary(self):
+        with self._lock:
+            counters = dict(self.counters)
+        retries = sum(value for key, value in counters.items() if key.startswith('reintentos:'))
+        self.logger.info(
+            "HTTP (%s): %d peticiones, %d conexiones nuevas (%d TLS), %d reutilizadas, %d por HTTP/2, %d reintentos, %d errores.",
+            'HTTP/2' if self.http2 else 'HTTP/1.1', counters.get('peticiones', 0), counters.get('conexiones_nuevas', 0),
+            counters.get('handshakes_tls', 0), counters.get('conexiones_reutilizadas', 0), counters.get('respuestas_http2', 0),
+            retries, counters.get('errores', 0)
+        )
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def shared_http_client(logger) -> HttpClient:
+    """Cliente del proceso; se crea en la primera llamada (con el logger de quien llama primero)."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient(logger)
+        return _shared_client
+
+
+def close_shared_http_client(metrics=None):
+    """Cierra el cliente del proceso (si se llegó a crear) tras dejar su resumen en el log y en `metrics`."""
+    global _shared_client
+    with _shared_lock:
+        client, _shared_client = _shared_client, None
+    if client is not None:
+        client.log_summary()
+        if metrics is not None:
+            metrics.add_counters('http', client.counters, 'evento')
+        client.close()
@@ -0,0 +1,159 @@
+# src/image_cache.py
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+
+import httpx
+
+from src.http_client import HttpClient, shared_http_client
+from src.page_readiness import CACHE_DIR
+from src.utils.bounded import KeyedLocks, LruDict
+
+# --- CONFIGURACIÓN ---
+DEFAULT_MAX_MEMORY_BYTES = 64 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+IMAGE_TIMEOUT_SECONDS = 30.0
+# URLs recordadas en el índice; en modo daemon acota la memoria del índice (los bytes ya lo están)
+MAX_INDEX_ENTRIES = 100_000
+
+
+class CachedImage:
+    """Bytes de una imagen descargada junto con su tipo de contenido y su hash SHA-256."""
+
+    __slots__ = ('data', 'content_type', 'sha256')
+
+    def __init__(self, data: bytes, content_type: str, sha256: str):
+        self.data = data
+        self.content_type = content_type
+        self.sha256 = sha256
+
+
+class ImageCache:
+    """
+    Caché de imágenes por ejecución, direccionada por contenido.
+    Cada URL absoluta apunta al SHA-256 de sus bytes; los bytes se guardan una sola vez
+    en memoria (LRU acotada) y se desbordan a un directorio temporal (también acotado).
+    Así el análisis de visión, la descarga y la subida comparten una sola petición de red.
+    Sin `client`, descarga con el cliente HTTP compartido del proceso.
+    """
+
+    def __init__(self, logger, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES, max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+                 client: httpx.Client | HttpClient | None = None):
+        self.logger = logger
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._client = client or shared_http_client(logger)
+        self._lock = threading.Lock()
+        self._url_locks = KeyedLocks()
+        # url -> (sha256, content_type), las menos usadas se olvidan primero
+        self._index = LruDict(MAX_INDEX_ENTRIES)
+        # sha256 -> bytes, en orden de uso (el primero es el menos reciente)
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        # sha256 -> tamaño en disco, en orden de uso
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        self._disk_dir = tempfile.mkdtemp(prefix='imagenes_', dir=CACHE_DIR)
+        self.counters = Counter()
+
+    def close(self):
+        shutil.rmtree(self._disk_dir, ignore_errors=True)
+        self.log_summary()
+
+    def _disk_path(self, sha256: str) -> str:
+        return os.path.join(self._disk_dir, sha256)
+
+    def _load(self, url: str) -> CachedImage | None:
+        """Busca la URL en memoria y luego en disco. Debe llamarse con self._lock tomado."""
+        entry = self._index.get(url)
+        if entry is None:
+            return None
+        sha256, content_type = entry
+        data = self._memory.get(sha256)
+        if data is not None:
+            self._memory.move_to_end(sha256)
+            self.counters['aciertos_memoria'] += 1
+        elif sha256 in self._disk:
+            with open(self._disk_path(sha256), 'rb') as f:
+                data = f.read()
+            self._disk.move_to_end(sha256)
+            self.counters['aciertos_disco'] += 1
+            self._store_in_memory(sha256, data)
+        else:
+            # Los bytes se expulsaron de ambos niveles: hay que volver a descargar
+            del self._index[url]
+            return None
+        self.counters['bytes_ahorrados'] += len(data)
+        return CachedImage(data, content_type, sha256)
+
+    def _store_in_memory(self, sha256: str, data: bytes):
+        if sha256 in self._memory or len(data) > self.max_memory_bytes:
+            return
+        self._memory[sha256] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            evicted_sha, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._spill_to_disk(evicted_sha, evicted)
+
+    def _spill_to_disk(self, sha256: str, data: bytes):
+        if sha256 in self._disk or len(data) > self.max_disk_bytes:
+            return
+        with open(self._disk_path(sha256), 'wb') as f:
+            f.write(data)
+        self._disk[sha256] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.max_disk_bytes:
+            evicted_sha, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._disk_path(evicted_sha))
+            except OSError:
+                pass
+
+    def peek(self, url: str) -> CachedImage | None:
+        """Devuelve la imagen si ya está en caché, sin tocar la red."""
+        with self._lock:
+            return self._load(url)
+
+    def get(self, url: str) -> CachedImage:
+        """Devuelve la imagen de la caché o la descarga una sola vez. Propaga los errores HTTP."""
+        cached = self.peek(url)
+        if cached is not None:
+            return cached
+
+        # Un lock por URL evita que dos hilos descarguen la misma imagen a la vez
+        with self._url_locks.hold(url):
+            cached = self.peek(url)
+            if cached is not None:
+                return cached
+            response = self._client.get(url, timeout=IMAGE_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            return self.put(url, response.content, response.headers.get('content-type', ''))
+
+    def put(self, url: str, data: bytes, content_type: str) -> CachedImage:
+        """Registra los bytes completos de una imagen que otro módulo ya descargó (p. ej. el prefiltro)."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self.counters['fallos'] += 1
+            self.counters['bytes_descargados'] += len(data)
+            self._index[url] = (sha256, content_type)
+            self._store_in_memory(sha256, data)
+            if sha256 not in self._memory:
+                self._spill_to_disk(sha256, data)
+        return CachedImage(data, content_type, sha256)
+
+    def log_summary(self):
+        with self._lock:
+            hits = self.counters['aciertos_memoria'] + self.counters['aciertos_disco']
+            misses = self.counters['fallos']
+            saved_mb = self.counters['bytes_ahorrados'] / (1024 * 1024)
+            downloaded_mb = self.counters['bytes_descargados'] / (1024 * 1024)
+        self.logger.info(
+            f"Caché de imágenes: {hits} aciertos, {misses} fallos, "
+            f"{downloaded_mb:.1f} MB descargados, {saved_mb:.1f} MB de red ahorrados."
+        )
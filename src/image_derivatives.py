@@ -0,0 +1,213 @@
+# src/image_derivatives.py
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow es opcional: sin él no se generan variantes
+    Image = None
+
+from src.asset_storage import AssetStorage
+from src.utils.bounded import LruDict
+
+# --- CONFIGURACIÓN ---
+# Anchos de las variantes; los que superan el ancho original se omiten (no se amplía)
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+# Formato -> (calidad inicial, calidad mínima). Si una variante supera su tope de bytes se baja la calidad por pasos
+DERIVATIVE_FORMATS = {'avif': (60, 35), 'webp': (80, 50)}
+QUALITY_STEP = 10
+# Tope de bytes de una variante por píxel de ancho: 40 KB a 320 px, 160 KB a 1280 px
+MAX_BYTES_PER_WIDTH_PIXEL = 125
+# Cambia si cambian anchos, formatos o calidades: las variantes nuevas no pisan a las ya subidas
+DERIVATIVES_VERSION = 1
+# La codificación es CPU pura; se deja un núcleo libre para el event loop y los hilos de red
+DEFAULT_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+# Imágenes cuyas variantes se recuerdan en memoria; en modo daemon acota el mapa
+MAX_REMEMBERED_IMAGES = 10_000
+
+
+def available_formats() -> dict:
+    """Formatos de DERIVATIVE_FORMATS que el Pillow instalado sabe codificar (AVIF requiere Pillow >= 11.2)."""
+    if Image is None:
+        return {}
+    return {fmt: qualities for fmt, qualities in DERIVATIVE_FORMATS.items() if features.check(fmt)}
+
+
+def variant_name(fmt: str, width: int) -> str:
+    return f"v{DERIVATIVES_VERSION}-w{width}.{fmt}"
+
+
+def manifest_name() -> str:
+    """Objeto con la lista de variantes de una imagen; se sube el último, así que su presencia indica que están todas."""
+    return f"v{DERIVATIVES_VERSION}.json"
+
+
+def _encode(image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def encode_derivatives(data: bytes, widths: tuple, formats: dict) -> list:
+    """
+    Decodifica la imagen una vez y la codifica en cada ancho y formato. Se ejecuta en un proceso del pool,
+    así que solo recibe y devuelve datos serializables: [{'formato', 'ancho', 'alto', 'calidad', 'data'}].
+    Los GIF animados se omiten (una variante estática perdería la animación).
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        if getattr(source, 'is_animated', False):
+            return []
+        has_alpha = 'A' in source.getbands() or 'transparency' in source.info
+        image = ImageOps.exif_transpose(source).convert('RGBA' if has_alpha else 'RGB')
+
+    variants = []
+    for width in [width for width in widths if width < image.width] or [image.width]:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        max_bytes = width * MAX_BYTES_PER_WIDTH_PIXEL
+        for fmt, (quality, min_quality) in formats.items():
+            encoded = _encode(resized, fmt, quality)
+            while len(encoded) > max_bytes and quality - QUALITY_STEP >= min_quality:
+                quality -= QUALITY_STEP
+                encoded = _encode(resized, fmt, quality)
+            variants.append({'formato': fmt, 'ancho': width, 'alto': height, 'calidad': quality, 'data': encoded})
+    return variants
+
+
+class DerivativeGenerator:
+    """
+    Variantes responsive (varios anchos en WebP/AVIF) de las imágenes curadas.
+    La codificación corre en un pool de procesos compartido por toda la ejecución; el hilo que llama a generate()
+    solo espera el resultado y sube las variantes, de modo que la CPU de la codificación no frena a los hilos de red.
+    Las variantes se guardan junto al original en Storage (sha256/ab/<hash>/v1-w640.webp) y, como dependen solo
+    de sus bytes, una imagen se codifica una sola vez: en la ejecución se recuerdan en memoria y, entre ejecuciones,
+    el manifiesto v1.json de la imagen en Storage evita volver a codificarla y subirla.
+    """
+
+    def __init__(self, logger, asset_storage: AssetStorage, workers: int = DEFAULT_WORKERS, widths: tuple = DERIVATIVE_WIDTHS):
+        self.logger = logger
+        self.asset_storage = asset_storage
+        self.workers = workers
+        self.widths = widths
+        self.formats = available_formats()
+        self._executor = None
+        self._lock = threading.Lock()
+        self._done = LruDict(MAX_REMEMBERED_IMAGES)
+        # sha256 -> Future de la codificación en curso, para que dos hilos con la misma imagen no la codifiquen ambos
+        self._inflight = {}
+        self.counters = Counter()
+        if Image is None:
+            self.logger.warning("Pillow no está instalado: no se generarán variantes WebP/AVIF de las imágenes.")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.formats)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 'spawn': el worker ya tiene hilos en marcha y un fork podría heredar locks tomados
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def generate(self, data: bytes, sha256: str) -> list:
+        """
+        Codifica y sube las variantes de la imagen. Devuelve [{'formato', 'ancho', 'alto', 'bytes', 'ruta'}]
+        con las que se subieron; una lista vacía si no hay formatos disponibles o la imagen no se pudo decodificar.
+        Si otro hilo ya está codificando la misma imagen, espera su resultado en vez de codificarla otra vez.
+        """
+        if not self.enabled:
+            return []
+        with self._lock:
+            done = self._done.get(sha256)
+            if done is not None:
+                self.counters['reutilizadas'] += 1
+                return [dict(record) for record in done]
+            inflight = self._inflight.get(sha256)
+            if inflight is None:
+                self._inflight[sha256] = Future()
+        if inflight is not None:
+            records = inflight.result()
+            with self._lock:
+                self.counters['reutilizadas'] += 1
+            return [dict(record) for record in records]
+
+        records = None
+        try:
+            records = self._produce(data, sha256)
+            return records
+        finally:
+            with self._lock:
+                future = self._inflight.pop(sha256)
+                if records is not None:
+                    self._done[sha256] = [dict(record) for record in records]
+            future.set_result([dict(record) for record in records or []])
+
+    def _produce(self, data: bytes, sha256: str) -> list | None:
+        """Variantes de la imagen: las de una ejecución anterior si su manifiesto está en Storage, si no las codifica y sube. None si falló."""
+        manifest = self._load_manifest(sha256)
+        if manifest is not None:
+            with self._lock:
+                self.counters['desde_storage'] += 1
+            return manifest
+        try:
+            variants = self._pool().submit(encode_derivatives, data, self.widths, self.formats).result()
+        except Exception as e:
+            self.logger.warning(f"No se pudieron generar las variantes de {sha256[:12]}: {e}")
+            with self._lock:
+                self.counters['errores'] += 1
+            return None
+
+        records = []
+        for variant in variants:
+            path = self.asset_storage.store_derivative(
+                sha256, variant_name(variant['formato'], variant['ancho']), variant['data'], f"image/{variant['formato']}"
+            )
+            if path:
+                records.append({'formato': variant['formato'], 'ancho': variant['ancho'], 'alto': variant['alto'],
+                                'bytes': len(variant['data']), 'ruta': path})
+        # El manifiesto solo se escribe si se subieron todas: si faltara alguna, la próxima ejecución la reintenta
+        if len(records) == len(variants):
+            self.asset_storage.store_derivative(sha256, manifest_name(), json.dumps(records).encode(), 'application/json')
+        with self._lock:
+            self.counters['imagenes'] += 1
+            self.counters['variantes'] += len(records)
+            self.counters['bytes_originales'] += len(data)
+            self.counters['bytes_variantes'] += sum(record['bytes'] for record in records)
+        return records
+
+    def _load_manifest(self, sha256: str) -> list | None:
+        """Registros de las variantes subidas en una ejecución anterior con esta versión; None si no hay manifiesto válido."""
+        raw = self.asset_storage.fetch_derivative(sha256, manifest_name())
+        if raw is None:
+            return None
+        try:
+            records = json.loads(raw)
+        except ValueError as e:
+            self.logger.warning(f"Manifiesto de variantes ilegible para {sha256[:12]}; se vuelven a generar: {e}")
+            return None
+        return records if isinstance(records, list) else None
+
+    def log_summary(self):
+        with self._lock:
+            images, variants = self.counters['imagenes'], self.counters['variantes']
+            original_mb = self.counters['bytes_originales'] / (1024 * 1024)
+            variants_mb = self.counters['bytes_variantes'] / (1024 * 1024)
+            errors = self.counters['errores']
+            from_storage = self.counters['desde_storage']
+        self.logger.info(
+            f"Variantes: {variants} generadas para {images} imágenes ({original_mb:.1f} MB de originales, "
+            f"{variants_mb:.1f} MB de variantes), {from_storage} imágenes ya tenían variantes en Storage, "
+            f"{errors} errores. Formatos: {', '.join(self.formats) or 'ninguno'}."
+        )
@@ -0,0 +1,139 @@
+# src/image_pipeline.py
+import argparse
+import contextvars
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from src.metrics import NULL_METRICS, Metrics
+from src.utils.logger import bind_log_context
+
+# --- CONFIGURACIÓN ---
+# Hilos por etapa; casi todas son de red (Gemini, descarga y Storage), así que el límite lo marca la cortesía con
+# los servidores. Los hilos de 'derivados' esperan al pool de procesos que codifica las variantes y las suben
+DEFAULT_STAGE_WORKERS = {'analisis': 4, 'descarga': 4, 'derivados': 4, 'subida': 4}
+DEFAULT_WORKERS = 4
+
+
+def parse_stage_workers(spec: str) -> dict:
+    """
+    Convierte 'analisis=4,descarga=6' en {'analisis': 4, 'descarga': 6} sobre los valores por defecto.
+    Se usa como `type` de argparse: una etapa desconocida o una concurrencia inválida es un error de la línea de comandos.
+    """
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_STAGE_WORKERS:
+            raise argparse.ArgumentTypeError(f"Etapa desconocida '{name}'; las etapas son: {', '.join(DEFAULT_STAGE_WORKERS)}")
+        if not value.isdigit() or int(value) < 1:
+            raise argparse.ArgumentTypeError(f"Concurrencia inválida para la etapa '{name}': '{value}'")
+        workers[name] = int(value)
+    return workers
+
+
+class ImagePipeline:
+    """
+    Ejecutor por etapas para las imágenes de un artículo (análisis → descarga → [derivados →] subida).
+    Cada etapa tiene su propio pool de hilos acotado y compartido por todos los artículos de la
+    ejecución, de modo que un artículo tarda lo que su imagen más lenta y no la suma de todas.
+    Una etapa que devuelve None o lanza una excepción descarta solo esa imagen.
+    Con `metrics`, cada ejecución de una etapa se registra en la serie 'imagen_etapa'.
+    Las etapas heredan el contexto de log del artículo (url_id, asset_id) y añaden el índice de la imagen.
+    """
+
+    def __init__(self, logger, stage_workers: dict | None = None, metrics: Metrics = NULL_METRICS):
+        self.logger = logger
+        self.stage_workers = stage_workers or dict(DEFAULT_STAGE_WORKERS)
+        self.metrics = metrics
+        self._executors = {}
+        self._lock = threading.Lock()
+        # Tareas enviadas a cada etapa que aún no han empezado a ejecutarse
+        self._queued = Counter()
+
+    def close(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self._executors.clear()
+
+    def _executor(self, stage_name: str) -> ThreadPoolExecutor:
+        with self._lock:
+            if stage_name not in self._executors:
+                workers = self.stage_workers.get(stage_name, DEFAULT_WORKERS)
+                self._executors[stage_name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'imagen-{stage_name}')
+            return self._executors[stage_name]
+
+    def run(self, items: list, stages: list) -> tuple[list, dict]:
+        """
+        Pasa cada elemento por `stages` ([(nombre, fn(indice, valor))...]) y espera a que terminen todos.
+        Devuelve (resultados alineados con `items`, con None para los descartados; estadísticas por etapa).
+        """
+        results = [None] * len(items)
+        stats = {name: {'procesadas': 0, 'fallidas': 0, 'latencia_total': 0.0, 'latencia_max': 0.0, 'cola_max': 0} for name, _ in stages}
+        if not items:
+            return results, stats
+
+        state_lock = threading.Lock()
+        all_done = threading.Event()
+        remaining = [len(items)]
+
+        def finish(index, value):
+            results[index] = value
+            with state_lock:
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    all_done.set()
+
+        def submit(stage_index, index, value):
+            stage_name = stages[stage_index][0]
+            with self._lock:
+                self._queued[stage_name] += 1
+                depth = self._queued[stage_name]
+            with state_lock:
+                stats[stage_name]['cola_max'] = max(stats[stage_name]['cola_max'], depth)
+            # Cada tarea corre en una copia del contexto del hilo que la envía (correlación de logs)
+            self._executor(stage_name).submit(contextvars.copy_context().run, execute, stage_index, index, value)
+
+        def execute(stage_index, index, value):
+            stage_name, stage_fn = stages[stage_index]
+            with self._lock:
+                self._queued[stage_name] -= 1
+            bind_log_context(imagen=index)
+            start = time.perf_counter()
+            failed = False
+            try:
+                output = stage_fn(index, value)
+            except Exception as e:
+                self.logger.error("Error en la etapa '%s' para la imagen %s: %s", stage_name, index, e)
+                output, failed = None, True
+            elapsed = time.perf_counter() - start
+            self.metrics.observe('imagen_etapa', elapsed, etapa=stage_name, resultado='error' if failed else 'ok')
+            with state_lock:
+                stage_stats = stats[stage_name]
+                stage_stats['procesadas'] += 1
+                stage_stats['fallidas'] += failed
+                stage_stats['latencia_total'] += elapsed
+                stage_stats['latencia_max'] = max(stage_stats['latencia_max'], elapsed)
+
+            if output is None or stage_index + 1 == len(stages):
+                finish(index, output)
+            else:
+                submit(stage_index + 1, index, output)
+
+        for index, item in enumerate(items):
+            submit(0, index, item)
+        all_done.wait()
+        return results, stats
+
+    @staticmethod
+    def format_stats(stats: dict) -> str:
+        parts = []
+        for name, stage_stats in stats.items():
+            processed = stage_stats['procesadas']
+            average = stage_stats['latencia_total'] / processed if processed else 0.0
+            parts.append(
+                f"{name}: {processed} procesadas ({stage_stats['fallidas']} fallidas), cola máx {stage_stats['cola_max']}, "
+                f"latencia media {average:.2f}s (máx {stage_stats['latencia_max']:.2f}s)"
+            )
+        return '; '.join(parts)
@@ -0,0 +1,225 @@
+# src/image_prefilter.py
+import io
+import re
+import struct
+import threading
+from collections import Counter
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+import httpx
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él solo se deduplica por URL
+    Image = None
+
+from src.http_client import HttpClient, shared_http_client
+from src.image_cache import ImageCache
+
+# --- CONFIGURACIÓN ---
+# Bytes iniciales que se piden con un GET parcial; cubren la cabecera de PNG/GIF/WebP y casi todos los EXIF de JPEG
+HEADER_BYTES = 64 * 1024
+HEADER_TIMEOUT_SECONDS = 10.0
+MIN_WIDTH = 200
+MIN_HEIGHT = 150
+# Relación ancho/alto máxima (y su inversa): descarta banners y separadores
+MAX_ASPECT_RATIO = 4.0
+# Distancia de Hamming máxima entre dHash de 64 bits para considerar dos imágenes la misma
+DHASH_MAX_DISTANCE = 6
+
+# Sufijos de tamaño que añaden los CMS a las versiones redimensionadas (p. ej. foto-1024x683.jpg)
+RESIZE_SUFFIX_RE = re.compile(r'-\d{2,5}x\d{2,5}(?=\.[a-z0-9]+$)', re.IGNORECASE)
+RESIZE_QUERY_PARAMS = {'w', 'h', 'width', 'height', 'resize', 'fit', 'crop', 'quality', 'q', 'strip', 'ssl'}
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def read_image_size(header: bytes) -> tuple[int, int] | None:
+    """Lee (ancho, alto) de los primeros bytes de un PNG, GIF, JPEG o WebP sin decodificar la imagen."""
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and len(header) >= 24:
+        return struct.unpack('>II', header[16:24])
+    if header[:6] in (b'GIF87a', b'GIF89a') and len(header) >= 10:
+        return struct.unpack('<HH', header[6:10])
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP' and len(header) >= 30:
+        chunk = header[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', header[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(header[21:25], 'little')
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(header[24:27], 'little') + 1, int.from_bytes(header[27:30], 'little') + 1
+        return None
+    if header[:2] == b'\xff\xd8':
+        offset = 2
+        while offset + 9 <= len(header):
+            if header[offset] != 0xFF:
+                return None
+            marker = header[offset + 1]
+            if marker == 0xFF:
+                offset += 1
+                continue
+            segment_length = struct.unpack('>H', header[offset + 2:offset + 4])[0]
+            if marker in JPEG_SOF_MARKERS:
+                height, width = struct.unpack('>HH', header[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + segment_length
+    return None
+
+
+def resize_variant_key(image_url: str) -> str:
+    """Clave común para las variantes redimensionadas de una misma imagen según su URL."""
+    parsed = urlparse(image_url)
+    path = RESIZE_SUFFIX_RE.sub('', parsed.path)
+    query = urlencode([(k, v) for k, v in parse_qsl(parsed.query) if k.lower() not in RESIZE_QUERY_PARAMS])
+    return urlunparse(('', parsed.netloc.lower(), path, '', query, ''))
+
+
+def dhash(image_bytes: bytes) -> int | None:
+    """Hash perceptual por diferencias (64 bits). Requiere Pillow; devuelve None si no está o falla."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            pixels = list(img.convert('L').resize((9, 8)).getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return bits
+
+
+def _is_whole_body(response: httpx.Response, length: int) -> bool:
+    """True si una respuesta al GET parcial, leída hasta el final, contiene la imagen completa."""
+    if response.status_code != 206:
+        return True
+    # Content-Range: bytes 0-1023/1024
+    total = response.headers.get('content-range', '').rpartition('/')[2]
+    return total.isdigit() and int(total) == length
+
+
+class ImagePrefilter:
+    """
+    Filtro local previo a la Capa 3: descarta píxeles de seguimiento, miniaturas, proporciones
+    extremas y duplicados redimensionados antes de pagar por una llamada al modelo de visión.
+    Con Pillow y caché de imágenes, cada candidata se descarga entera una sola vez por la caché: de esos bytes
+    salen las dimensiones y el dHash, y la Capa 3 los reutiliza. Sin ellos, las dimensiones se leen con un
+    GET parcial (Range) y, si la respuesta ya trae la imagen completa, se guarda en la caché.
+    """
+
+    def __init__(self, logger, client: httpx.Client | HttpClient | None = None, min_width: int = MIN_WIDTH, min_height: int = MIN_HEIGHT,
+                 max_aspect_ratio: float = MAX_ASPECT_RATIO):
+        self.logger = logger
+        self.min_width = min_width
+        self.min_height = min_height
+        self.max_aspect_ratio = max_aspect_ratio
+        self._client = client or shared_http_client(logger)
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def close(self):
+        self.log_summary()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def _read_header(self, image_url: str, image_cache: ImageCache | None) -> tuple[bytes, bytes | None]:
+        """(cabecera, bytes completos de la imagen o None si solo se leyó la cabecera)."""
+        if image_cache is not None:
+            cached = image_cache.peek(image_url)
+            if cached is None and Image is not None:
+                # El dHash necesita la imagen entera: un GET parcial previo sería una segunda petición
+                cached = image_cache.get(image_url)
+            if cached is not None:
+                return cached.data[:HEADER_BYTES], cached.data
+        header = b''
+        complete = False
+        # Si el servidor ignora Range, se corta la lectura igualmente al llegar a HEADER_BYTES
+        with self._client.stream('GET', image_url, headers={'Range': f'bytes=0-{HEADER_BYTES - 1}'}, timeout=HEADER_TIMEOUT_SECONDS) as response:
+            response.raise_for_status()
+            for chunk in response.iter_bytes():
+                header += chunk
+                if len(header) >= HEADER_BYTES:
+                    break
+            else:
+                complete = _is_whole_body(response, len(header))
+            content_type = response.headers.get('content-type', '')
+        if not complete:
+            return header, None
+        if image_cache is not None:
+            image_cache.put(image_url, header, content_type)
+        return header, header
+
+    def _rejection_reason(self, size: tuple[int, int] | None) -> str | None:
+        if size is None:
+            return None
+        width, height = size
+        if width < self.min_width or height < self.min_height:
+            return 'muy_pequena'
+        if max(width / height, height / width) > self.max_aspect_ratio:
+            return 'proporcion_extrema'
+        return None
+
+    def filter(self, image_urls: list, image_cache: ImageCache | None = None, limit: int | None = None) -> list:
+        """
+        Devuelve las URLs que superan el filtro, en su orden original, hasta `limit` supervivientes.
+        Entre duplicados se conserva la variante de mayor resolución en la posición de la primera.
+        """
+        kept = []  # [url, área, clave_url, dhash]
+        for image_url in image_urls:
+            if limit is not None and len(kept) >= limit:
+                break
+            self._count('evaluadas')
+            data = None
+            try:
+                header, data = self._read_header(image_url, image_cache)
+                size = read_image_size(header)
+            except Exception as e:
+                self.logger.warning("Prefiltro: no se pudo leer la cabecera de %s: %s", image_url, e)
+                self._count('sin_cabecera')
+                size = None
+            if size is None:
+                self._count('sin_dimensiones')
+
+            reason = self._rejection_reason(size)
+            if reason:
+                self.logger.info("Prefiltro: imagen descartada (%s, %dx%d): %s", reason, size[0], size[1], image_url)
+                self._count(f'rechazo:{reason}')
+                continue
+
+            area = size[0] * size[1] if size else 0
+            variant_key = resize_variant_key(image_url)
+            image_hash = dhash(data) if data is not None else None
+
+            duplicate_of, reason = None, None
+            for entry in kept:
+                if entry[2] == variant_key:
+                    duplicate_of, reason = entry, 'duplicado_url'
+                    break
+                if image_hash is not None and entry[3] is not None and bin(image_hash ^ entry[3]).count('1') <= DHASH_MAX_DISTANCE:
+                    duplicate_of, reason = entry, 'duplicado_perceptual'
+                    break
+            if duplicate_of is not None:
+                self.logger.info("Prefiltro: imagen descartada (%s): %s", reason, image_url)
+                self._count(f'rechazo:{reason}')
+                if area > duplicate_of[1]:
+                    duplicate_of[0], duplicate_of[1], duplicate_of[3] = image_url, area, image_hash
+                continue
+            kept.append([image_url, area, variant_key, image_hash])
+
+        with self._lock:
+            self.counters['aprobadas'] += len(kept)
+        return [entry[0] for entry in kept]
+
+    def log_summary(self):
+        with self._lock:
+            evaluated = self.counters['evaluadas']
+            rejections = {k.split(':', 1)[1]: v for k, v in self.counters.items() if k.startswith('rechazo:')}
+        total_rejected = sum(rejections.values())
+        self.logger.info(
+            "Prefiltro de imágenes: %d evaluadas, %d descartadas antes de la Capa 3 (llamadas al modelo evitadas). Motivos: %s.",
+            evaluated, total_rejected, rejections or 'ninguno'
+        )
@@ -0,0 +1,185 @@
+# src/metrics.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+# --- CONFIGURACIÓN ---
+METRICS_FORMATS = ('jsonl', 'prometheus')
+PROMETHEUS_PREFIX = 'runa_'
+# Series que se listan en el resumen del log (el archivo de métricas las incluye todas)
+SUMMARY_TOP_DURATIONS = 12
+
+# Un único contexto vacío reutilizable: con las métricas desactivadas, span() no crea objetos
+_NULL_SPAN = nullcontext()
+
+
+def _label_key(labels: dict) -> tuple:
+    # Los valores se guardan como texto: así las series se pueden ordenar y exportar sin conversiones
+    return tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prometheus_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """
+    Métricas estructuradas de una ejecución: duraciones (spans) y contadores, ambos con etiquetas.
+    Cada serie se agrega en memoria (n, suma y máximo para las duraciones) y al final se vuelca
+    en JSON lines o en el formato de texto de Prometheus.
+    Desactivadas (`enabled=False`), todas las llamadas vuelven de inmediato sin medir ni tomar el lock.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._durations = {}
+
+    def incr(self, name: str, value: int = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            entry = self._durations.get(key)
+            if entry is None:
+                self._durations[key] = [1, seconds, seconds]
+            else:
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def span(self, name: str, **labels):
+        """Context manager que registra la duración del bloque en la serie `name`."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, labels)
+
+    @contextmanager
+    def _span(self, name: str, labels: dict):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, fn, name: str, **labels):
+        """Envuelve `fn` en un span; desactivadas, devuelve `fn` tal cual."""
+        if not self.enabled:
+            return fn
+
+        def wrapper(*args, **kwargs):
+            with self._span(name, labels):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def add_counters(self, name: str, counters: dict, label: str):
+        """Vuelca un Counter existente (p. ej. los del prefiltro o la caché) como la serie `name`."""
+        if not self.enabled:
+            return
+        for key, value in list(counters.items()):
+            self.incr(name, value, **{label: key})
+
+    def summary(self) -> dict:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            durations = sorted(self._durations.items())
+        return {
+            'inicio': datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec='seconds'),
+            'segundos': round(time.time() - self.started_at, 3),
+            'contadores': [{'nombre': name, 'etiquetas': dict(labels), 'valor': value} for (name, labels), value in counters],
+            'duraciones': [
+                {'nombre': name, 'etiquetas': dict(labels), 'n': n, 'suma': round(total, 6), 'max': round(peak, 6)}
+                for (name, labels), (n, total, peak) in durations
+            ],
+        }
+
+    def to_json_lines(self, run_id: str) -> str:
+        """Una línea por serie y una última de tipo 'resumen'; se añaden al archivo, una ejecución tras otra."""
+        summary = self.summary()
+        lines = []
+        for record in summary['contadores']:
+            lines.append({'ejecucion': run_id, 'tipo': 'contador', **record})
+        for record in summary['duraciones']:
+            lines.append({'ejecucion': run_id, 'tipo': 'duracion', **record})
+        lines.append({'ejecucion': run_id, 'tipo': 'resumen', 'inicio': summary['inicio'], 'segundos': summary['segundos'],
+                      'series': len(summary['contadores']) + len(summary['duraciones'])})
+        return ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines)
+
+    def to_prometheus(self) -> str:
+        """Formato de texto de Prometheus: contadores `_total` y duraciones como summary con `_max` aparte."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            durations = sorted(self._durations.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{PROMETHEUS_PREFIX}{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {value}")
+        for (name, labels), (n, total, _) in durations:
+            metric = f"{PROMETHEUS_PREFIX}{name}_segundos"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} summary")
+            lines.append(f"{metric}_sum{_prometheus_labels(labels)} {total:.6f}")
+            lines.append(f"{metric}_count{_prometheus_labels(labels)} {n}")
+        for (name, labels), (_, _, peak) in durations:
+            metric = f"{PROMETHEUS_PREFIX}{name}_segundos_max"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{_prometheus_labels(labels)} {peak:.6f}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}ejecucion_inicio_timestamp gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}ejecucion_inicio_timestamp {self.started_at:.0f}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, fmt: str, run_id: str):
+        """JSON lines se añade al archivo; Prometheus lo reemplaza de forma atómica (textfile collector)."""
+        if not self.enabled:
+            return
+        if fmt == 'prometheus':
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.to_json_lines(run_id))
+
+    def log_summary(self, logger):
+        if not self.enabled:
+            return
+        summary = self.summary()
+        durations = sorted(summary['duraciones'], key=lambda record: record['suma'], reverse=True)[:SUMMARY_TOP_DURATIONS]
+        parts = []
+        for record in durations:
+            labels = ','.join(f"{key}={value}" for key, value in record['etiquetas'].items())
+            parts.append(f"{record['nombre']}[{labels}] {record['suma']:.2f}s (n={record['n']}, máx {record['max']:.2f}s)")
+        logger.info(f"Métricas de la ejecución ({summary['segundos']:.1f}s), tiempo por serie: {'; '.join(parts) or 'sin datos'}")
+        images = {record['etiquetas'].get('etapa'): record['valor'] for record in summary['contadores'] if record['nombre'] == 'imagenes'}
+        if images:
+            logger.info(f"Métricas de la ejecución, imágenes por capa: {images}")
+
+
+# Instancia desactivada por defecto para los parámetros opcionales
+NULL_METRICS = Metrics(enabled=False)
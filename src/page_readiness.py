@@ -0,0 +1,238 @@
+# src/page_readiness.py
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# --- CONFIGURACIÓN ---
+# Presupuesto total (segundos) para esperar retos de seguridad y cargar contenido dinámico
+DEFAULT_BUDGET_SECONDS = 20.0
+POLL_INTERVAL_MS = 500
+SCROLL_STEP_PX = 800
+SCROLL_SETTLE_MS = 250
+# Pasos de scroll consecutivos sin nuevas <img>/data-src para dar la página por estable
+STABLE_ROUNDS = 3
+# Visitas sin reto ni contenido dinámico para considerar un host como estático
+STATIC_AFTER_VISITS = 3
+# Cada cuántas visitas se vuelve a sondear un host estático por si cambió
+RECHECK_EVERY = 20
+# Un proceso largo (daemon) guarda lo aprendido cada tanto, no solo al salir
+STATS_SAVE_INTERVAL_SECONDS = 300
+CACHE_DIR = '.runa_cache'
+DEFAULT_STATS_PATH = os.path.join(CACHE_DIR, 'host_stats.json')
+
+# Detecta retos de Cloudflare y similares por título o por elementos característicos
+CHALLENGE_JS = """() => {
+    const title = (document.title || '').toLowerCase();
+    if (/just a moment|attention required|checking your browser|un momento/.test(title)) return true;
+    return !!document.querySelector(
+        '#challenge-form, #challenge-running, #cf-challenge-running, .cf-browser-verification, iframe[src*="challenges.cloudflare.com"]'
+    );
+}"""
+
+# Toma el estado del DOM (tras el paso anterior) y avanza otro paso, en una sola ida y vuelta
+SCROLL_AND_SNAPSHOT_JS = """(step) => {
+    const snapshot = {
+        imgs: document.images.length,
+        lazy: document.querySelectorAll('[data-src]').length,
+        bottom: window.scrollY + window.innerHeight >= document.body.scrollHeight - 2,
+    };
+    window.scrollBy(0, step);
+    return snapshot;
+}"""
+
+
+class HostStats:
+    """
+    Estadísticas por host de lo que hizo falta esperar en visitas anteriores.
+    Permite saltarse el reto y el scroll en hosts que siempre sirven páginas estáticas.
+    Se guardan al terminar (save) y, en procesos largos, cada `save_interval` segundos al registrar una visita.
+    """
+
+    def __init__(self, path: str | None = DEFAULT_STATS_PATH, save_interval: float = STATS_SAVE_INTERVAL_SECONDS):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._last_save = time.monotonic()
+        self._hosts = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._hosts = json.load(f)
+            except (OSError, ValueError):
+                self._hosts = {}
+
+    def is_static(self, host: str) -> bool:
+        with self._lock:
+            entry = self._hosts.get(host)
+            if not entry or entry['visitas'] < STATIC_AFTER_VISITS:
+                return False
+            if entry['con_reto'] or entry['con_dinamico']:
+                return False
+            # Sondeo periódico completo para detectar hosts que dejaron de ser estáticos
+            return entry['visitas'] % RECHECK_EVERY != 0
+
+    def record(self, host: str, saw_challenge: bool, grew: bool, probed: bool):
+        with self._lock:
+            entry = self._hosts.setdefault(host, {'visitas': 0, 'con_reto': 0, 'con_dinamico': 0})
+            entry['visitas'] += 1
+            # Las visitas que se saltaron las fases dinámicas no aportan evidencia nueva
+            if probed and saw_challenge:
+                entry['con_reto'] += 1
+            if probed and grew:
+                entry['con_dinamico'] += 1
+        self._save_if_due()
+
+    def preferred_tier(self, host: str) -> str:
+        """Nivel de descarga recordado para el host: 'estatico' (por defecto) o 'navegador'."""
+        with self._lock:
+            entry = self._hosts.get(host) or {}
+            if entry.get('nivel') != 'navegador':
+                return 'estatico'
+            # Cada RECHECK_EVERY visitas con navegador se vuelve a probar la descarga estática
+            entry['visitas_navegador'] = entry.get('visitas_navegador', 0) + 1
+            if entry['visitas_navegador'] % RECHECK_EVERY == 0:
+                return 'estatico'
+            return 'navegador'
+
+    def set_tier(self, host: str, tier: str):
+        with self._lock:
+            entry = self._hosts.setdefault(host, {'visitas': 0, 'con_reto': 0, 'con_dinamico': 0})
+            if entry.get('nivel') != tier:
+                entry['visitas_navegador'] = 0
+            entry['nivel'] = tier
+        self._save_if_due()
+
+    def _save_if_due(self):
+        if self.path and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            self._last_save = time.monotonic()
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._hosts, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class _ScrollTracker:
+    """Decide si hay que seguir desplazando según el crecimiento de <img> y data-src."""
+
+    def __init__(self):
+        self.max_imgs = -1
+        self.max_lazy = -1
+        self.stable_rounds = 0
+        self.steps = 0
+        self.grew = False
+
+    def update(self, snapshot: dict) -> bool:
+        """Registra un snapshot y devuelve True si conviene seguir desplazando."""
+        self.steps += 1
+        gained = snapshot['imgs'] > self.max_imgs or snapshot['lazy'] > self.max_lazy
+        if gained and self.steps > 1:
+            self.grew = True
+        self.max_imgs = max(self.max_imgs, snapshot['imgs'])
+        self.max_lazy = max(self.max_lazy, snapshot['lazy'])
+        self.stable_rounds = 0 if gained else self.stable_rounds + 1
+        if snapshot['bottom'] and not gained:
+            return False
+        return self.stable_rounds < STABLE_ROUNDS
+
+
+class PageReadiness:
+    """
+    Motor de espera adaptativa: sustituye las esperas fijas de 15 s + scroll + 5 s.
+    Espera solo mientras haya un reto de seguridad visible y desplaza la página solo
+    mientras el DOM siga ganando imágenes, todo dentro de un presupuesto total.
+    """
+
+    def __init__(self, logger, budget_seconds: float = DEFAULT_BUDGET_SECONDS, host_stats: HostStats | None = None):
+        self.logger = logger
+        self.budget_seconds = budget_seconds
+        self.host_stats = host_stats if host_stats is not None else HostStats(path=None)
+
+    def _start(self, url: str, timings: dict):
+        host = urlparse(url).hostname or ''
+        timings['reto'] = 0.0
+        timings['scroll'] = 0.0
+        if self.host_stats.is_static(host):
+            self.logger.info(f"Host {host} conocido como estático: se omiten las fases dinámicas.")
+            self.host_stats.record(host, saw_challenge=False, grew=False, probed=False)
+            return host, None
+        return host, time.monotonic() + self.budget_seconds
+
+    def _finish(self, host: str, saw_challenge: bool, tracker: _ScrollTracker, timings: dict):
+        self.host_stats.record(host, saw_challenge=saw_challenge, grew=tracker.grew, probed=True)
+        self.logger.info(
+            f"Página lista: reto {timings['reto']:.1f}s, scroll {timings['scroll']:.1f}s "
+            f"({tracker.steps} pasos, {tracker.max_imgs} <img>, {tracker.max_lazy} data-src)."
+        )
+
+    def wait(self, page, url: str, timings: dict):
+        """Espera a que la página (sync API) esté lista y anota los tiempos en `timings`."""
+        host, deadline = self._start(url, timings)
+        if deadline is None:
+            return
+
+        phase_start = time.monotonic()
+        saw_challenge = False
+        while time.monotonic() < deadline and page.evaluate(CHALLENGE_JS):
+            if not saw_challenge:
+                self.logger.info("Reto de seguridad detectado. Esperando a que se resuelva...")
+            saw_challenge = True
+            page.wait_for_timeout(POLL_INTERVAL_MS)
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        # Con timeout=0 Playwright esperaría sin límite: si el reto agotó el presupuesto no se espera más
+        if saw_challenge and remaining_ms >= 1:
+            try:
+                page.wait_for_load_state('networkidle', timeout=remaining_ms)
+            except Exception:
+                pass
+        timings['reto'] = time.monotonic() - phase_start
+
+        phase_start = time.monotonic()
+        tracker = _ScrollTracker()
+        while time.monotonic() < deadline:
+            snapshot = page.evaluate(SCROLL_AND_SNAPSHOT_JS, SCROLL_STEP_PX)
+            page.wait_for_timeout(SCROLL_SETTLE_MS)
+            if not tracker.update(snapshot):
+                break
+        timings['scroll'] = time.monotonic() - phase_start
+        self._finish(host, saw_challenge, tracker, timings)
+
+    async def wait_async(self, page, url: str, timings: dict):
+        """Variante de `wait` para páginas de la API asíncrona de Playwright."""
+        host, deadline = self._start(url, timings)
+        if deadline is None:
+            return
+
+        phase_start = time.monotonic()
+        saw_challenge = False
+        while time.monotonic() < deadline and await page.evaluate(CHALLENGE_JS):
+            if not saw_challenge:
+                self.logger.info("Reto de seguridad detectado. Esperando a que se resuelva...")
+            saw_challenge = True
+            await page.wait_for_timeout(POLL_INTERVAL_MS)
+        remaining_ms = (deadline - time.monotonic()) * 1000
+        # Con timeout=0 Playwright esperaría sin límite: si el reto agotó el presupuesto no se espera más
+        if saw_challenge and remaining_ms >= 1:
+            try:
+                await page.wait_for_load_state('networkidle', timeout=remaining_ms)
+            except Exception:
+                pass
+        timings['reto'] = time.monotonic() - phase_start
+
+        phase_start = time.monotonic()
+        tracker = _ScrollTracker()
+        while time.monotonic() < deadline:
+            snapshot = await page.evaluate(SCROLL_AND_SNAPSHOT_JS, SCROLL_STEP_PX)
+            await page.wait_for_timeout(SCROLL_SETTLE_MS)
+            if not tracker.update(snapshot):
+                break
+        timings['scroll'] = time.monotonic() - phase_start
+        self._finish(host, saw_challenge, tracker, timings)
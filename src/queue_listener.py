@@ -0,0 +1,73 @@
+# src/queue_listener.py
+import select
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+# --- CONFIGURACIÓN ---
+SELECT_TIMEOUT_SECONDS = 1.0
+RECONNECT_DELAY_SECONDS = 5.0
+MAX_RECONNECT_DELAY_SECONDS = 60.0
+
+
+class QueueListener:
+    """
+    Escucha en un hilo propio las notificaciones que dispara el trigger de la cola (LISTEN/NOTIFY)
+    por una conexión directa de psycopg2, y llama a `on_notify()` por cada lote recibido.
+    Si la conexión cae se reintenta con espera creciente; mientras tanto el daemon sigue por sondeo.
+    """
+
+    def __init__(self, logger, dsn: str, channel: str, on_notify):
+        self.logger = logger
+        self.dsn = dsn
+        self.channel = channel
+        self.on_notify = on_notify
+        self.connected = False
+        self.notifications = 0
+        self.reconnections = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='queue-listener', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=SELECT_TIMEOUT_SECONDS * 5)
+
+    def _listen(self):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN "{self.channel}";')
+            self.connected = True
+            self.logger.info(f"Escuchando notificaciones de la cola en el canal '{self.channel}'.")
+            # Lo insertado mientras no se escuchaba no generará aviso: se fuerza una revisión
+            self.on_notify()
+            while not self._stop.is_set():
+                if not select.select([conn], [], [], SELECT_TIMEOUT_SECONDS)[0]:
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    self.notifications += len(conn.notifies)
+                    conn.notifies.clear()
+                    self.on_notify()
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self):
+        delay = RECONNECT_DELAY_SECONDS
+        while not self._stop.is_set():
+            try:
+                self._listen()
+                delay = RECONNECT_DELAY_SECONDS
+            except (psycopg2.Error, OSError) as e:
+                self.reconnections += 1
+                self.logger.warning(f"Conexión de LISTEN perdida ({e}). Reintento en {delay:.0f}s; mientras tanto, solo sondeo.")
+                self._stop.wait(delay)
+                delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
@@ -0,0 +1,146 @@
+# src/site_builder.py
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# --- CONFIGURACIÓN ---
+# El manifiesto se versiona junto a las páginas generadas: sin él, la siguiente ejecución lo regenera todo
+DEFAULT_MANIFEST_PATH = '.publish_manifest.json'
+MANIFEST_VERSION = 1
+# Índice de búsqueda: palabras de al menos SEARCH_MIN_LENGTH caracteres, sin tildes y sin palabras vacías
+SEARCH_INDEX_VERSION = 1
+SEARCH_MIN_LENGTH = 3
+SEARCH_WORD_RE = re.compile(r'[a-z0-9]+')
+SEARCH_STOPWORDS = frozenset((
+    'las', 'los', 'del', 'por', 'para', 'con', 'sin', 'una', 'uno', 'unos', 'unas', 'que', 'como', 'mas', 'pero',
+    'sus', 'este', 'esta', 'estos', 'estas', 'ese', 'esa', 'son', 'fue', 'ser', 'hay', 'entre', 'sobre', 'desde',
+    'hasta', 'cuando', 'donde', 'muy', 'tambien', 'nos', 'les', 'the', 'and',
+))
+
+
+def content_hash(*parts) -> str:
+    """SHA-256 estable de los valores dados (textos, números o dicts serializables a JSON)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def write_if_changed(path: str, content: str) -> bool:
+    """
+    Escribe `content` en `path` de forma atómica (archivo temporal + os.replace) solo si sus bytes difieren
+    de los actuales. Devuelve True si se escribió.
+    """
+    data = content.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def paginate(items: list, per_page: int) -> list:
+    """Parte `items` en páginas de `per_page` elementos; siempre devuelve al menos una página (vacía si no hay nada)."""
+    return [items[start:start + per_page] for start in range(0, len(items), per_page)] or [[]]
+
+
+def page_filename(base_path: str, number: int) -> str:
+    """Archivo de la página `number` de un listado: la primera conserva el nombre ('publicaciones.html'), las siguientes
+    llevan el número ('publicaciones-2.html'), en el mismo directorio para que los enlaces relativos sigan valiendo."""
+    if number <= 1:
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}-{number}{ext}"
+
+
+def fold_accents(text: str) -> str:
+    """Quita tildes y diacríticos ('Río' -> 'Rio', 'ñ' -> 'n') descomponiendo en NFKD."""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+
+
+def search_terms(*texts) -> list:
+    """Términos de búsqueda de los textos dados: minúsculas, sin tildes, sin palabras vacías ni repetidos."""
+    folded = fold_accents(' '.join(text for text in texts if text).lower())
+    return sorted({word for word in SEARCH_WORD_RE.findall(folded)
+                   if len(word) >= SEARCH_MIN_LENGTH and word not in SEARCH_STOPWORDS})
+
+
+def build_search_index(docs: list) -> str:
+    """
+    Índice invertido compacto para buscar en el cliente sin descargar las páginas. `docs` son dicts con slug, titulo,
+    resumen, etiquetas y terminos (ver search_terms). El JSON tiene 'docs' (filas [slug, titulo, resumen, etiquetas])
+    y 'terminos' (término -> posiciones en 'docs', ordenadas); una búsqueda intersecta las listas de sus términos.
+    """
+    postings = {}
+    for position, doc in enumerate(docs):
+        for term in doc['terminos']:
+            postings.setdefault(term, []).append(position)
+    index = {
+        'version': SEARCH_INDEX_VERSION,
+        'campos': ['slug', 'titulo', 'resumen', 'etiquetas'],
+        'docs': [[doc['slug'], doc['titulo'], doc['resumen'], doc['etiquetas']] for doc in docs],
+        'terminos': postings,
+    }
+    return json.dumps(index, ensure_ascii=False, separators=(',', ':'), sort_keys=True) + '\n'
+
+
+class PublishManifest:
+    """
+    Hashes de lo último que se publicó: las plantillas, cada archivo generado (páginas de listado, índice de búsqueda)
+    y, por slug, el contenido de la página y de la tarjeta (con su HTML ya renderizado). Con él el publicador solo
+    vuelve a renderizar lo que cambió en la hoja.
+    """
+
+    def __init__(self, path: str | None = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._data = {'version': MANIFEST_VERSION, 'hashes': {}, 'articulos': {}, 'salidas': {}}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    data.setdefault('salidas', {})
+                    self._data = data
+            except (OSError, ValueError):
+                pass
+        self._seen = set()
+        self._outputs_seen = set()
+
+    def changed(self, name: str, value_hash: str) -> bool:
+        """Registra el hash de `name` (una plantilla, el listado...) y devuelve si difiere del de la ejecución anterior."""
+        changed = self._data['hashes'].get(name) != value_hash
+        self._data['hashes'][name] = value_hash
+        return changed
+
+    def entry(self, slug: str) -> dict:
+        """Entrada del slug (se crea vacía si es nuevo); los slugs no consultados se eliminan al guardar."""
+        self._seen.add(slug)
+        return self._data['articulos'].setdefault(slug, {})
+
+    def output_changed(self, path: str, value_hash: str) -> bool:
+        """Como changed(), para un archivo generado; devuelve True también si el archivo ya no existe en disco."""
+        self._outputs_seen.add(path)
+        changed = self._data['salidas'].get(path) != value_hash or not os.path.exists(path)
+        self._data['salidas'][path] = value_hash
+        return changed
+
+    def stale_outputs(self) -> list:
+        """Archivos generados en ejecuciones anteriores que esta no ha vuelto a generar (p. ej. páginas sobrantes)."""
+        return sorted(set(self._data['salidas']) - self._outputs_seen)
+
+    def save(self):
+        if not self.path:
+            return
+        self._data['articulos'] = {slug: entry for slug, entry in self._data['articulos'].items() if slug in self._seen}
+        self._data['salidas'] = {path: value for path, value in self._data['salidas'].items() if path in self._outputs_seen}
+        write_if_changed(self.path, json.dumps(self._data, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
@@ -0,0 +1,120 @@
+# src/static_fetcher.py
+import re
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+import httpx
+
+from src.http_client import HttpClient, shared_http_client
+from src.page_readiness import HostStats
+
+# --- CONFIGURACIÓN ---
+STATIC_TIMEOUT_SECONDS = 20.0
+# Cabeceras de un navegador de escritorio: algunos CDNs sirven una página vacía a clientes "bot"
+STATIC_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+}
+# Códigos con los que los WAF suelen responder a clientes sin JavaScript
+CHALLENGE_STATUS_CODES = {403, 429, 503}
+CHALLENGE_MARKERS = ('challenge-form', 'cf-browser-verification', 'cf-challenge-running', 'challenges.cloudflare.com', '<title>just a moment')
+# Contenedores vacíos típicos de aplicaciones que se renderizan en el cliente (React, Next, Vue...)
+SPA_SHELL_RE = re.compile(r'<div[^>]+id=["\'](?:root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+NOSCRIPT_JS_RE = re.compile(r'<noscript[^>]*>[^<]*(?:enable javascript|habilita javascript|activa javascript)', re.IGNORECASE)
+
+
+def needs_browser(status_code: int, html: str) -> str | None:
+    """
+    Decide, sin parsear el DOM, si una respuesta estática no basta para extraer imágenes.
+    Devuelve el motivo del escalado al navegador o None si el HTML es utilizable.
+    """
+    if status_code in CHALLENGE_STATUS_CODES:
+        return 'reto'
+    lowered = html.lower()
+    if any(marker in lowered for marker in CHALLENGE_MARKERS):
+        return 'reto'
+    if SPA_SHELL_RE.search(html):
+        return 'spa'
+    has_images = '<img' in lowered or 'og:image' in lowered
+    if not has_images:
+        return 'noscript' if NOSCRIPT_JS_RE.search(html) else 'sin_imagenes'
+    return None
+
+
+class TieredFetcher:
+    """
+    Primer nivel de descarga: un GET con el cliente HTTP compartido del proceso (conexiones reutilizadas)
+    antes de pagar por Chromium.
+    Si la respuesta parece renderizada en el cliente o protegida por un reto, se escala al navegador
+    y la decisión se recuerda por dominio en HostStats; un error de una sola URL (404, 410, 5xx) solo escala esa URL.
+    """
+
+    def __init__(self, logger, host_stats: HostStats | None = None, client: httpx.Client | HttpClient | None = None):
+        self.logger = logger
+        self.host_stats = host_stats if host_stats is not None else HostStats(path=None)
+        self._client = client or shared_http_client(logger)
+        self._lock = threading.Lock()
+        self.counters = Counter()
+
+    def close(self):
+        """El cliente HTTP es del proceso (o de quien lo pasó) y se cierra fuera; no queda nada propio que liberar."""
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def fetch(self, url: str) -> tuple[str, str] | None:
+        """
+        Intenta obtener el HTML sin navegador. Devuelve (html, url_final) o None si hay que escalar.
+        """
+        host = urlparse(url).hostname or ''
+        if self.host_stats.preferred_tier(host) == 'navegador':
+            self.logger.info(f"Host {host} requiere navegador según ejecuciones anteriores.")
+            return None
+
+        try:
+            response = self._client.get(url, headers=STATIC_HEADERS, timeout=STATIC_TIMEOUT_SECONDS)
+        except httpx.HTTPError as e:
+            self.logger.warning(f"Descarga estática fallida para {url}: {e}. Se escala al navegador.")
+            self._count('escalado:error_red')
+            return None
+
+        content_type = response.headers.get('content-type', '')
+        # Solo un reto o un HTML que depende de JavaScript dicen algo del host; un 404/410, un error del
+        # servidor o un documento que no es HTML son de esta URL, y el navegador no los arreglaría
+        host_needs_browser = False
+        if response.status_code >= 400 and response.status_code not in CHALLENGE_STATUS_CODES:
+            reason = f'http_{response.status_code}'
+        elif 'html' not in content_type:
+            reason = 'no_html'
+        else:
+            reason = needs_browser(response.status_code, response.text)
+            host_needs_browser = reason is not None
+        if reason:
+            self.logger.info(f"La versión estática de {url} no basta (motivo: {reason}). Se escala al navegador.")
+            self._count(f'escalado:{reason}')
+            if host_needs_browser:
+                self.host_stats.set_tier(host, 'navegador')
+            return None
+
+        self.host_stats.set_tier(host, 'estatico')
+        return response.text, str(response.url)
+
+    def record_served(self, tier: str):
+        """Anota qué nivel terminó sirviendo una URL ('estatico' o 'navegador')."""
+        self._count(f'nivel:{tier}')
+
+    def log_summary(self):
+        with self._lock:
+            static_count = self.counters['nivel:estatico']
+            browser_count = self.counters['nivel:navegador']
+            reasons = {k.split(':', 1)[1]: v for k, v in self.counters.items() if k.startswith('escalado:')}
+        total = static_count + browser_count
+        if not total:
+            return
+        self.logger.info(
+            f"Niveles de descarga: estático {static_count}/{total} ({100 * static_count / total:.0f}%), "
+            f"navegador {browser_count}/{total} ({100 * browser_count / total:.0f}%). Motivos de escalado: {reasons or 'ninguno'}."
+        )
@@ -0,0 +1,49 @@
+# src/templating.py
+import html
+import re
+
+# --- CONFIGURACIÓN ---
+# Huecos de las plantillas del sitio: {{TITULO}} se escapa como HTML; {{CONTENIDOHTML|raw}} se inserta tal cual
+SLOT_RE = re.compile(r'\{\{\s*([A-Za-z0-9_]+)(\|raw)?\s*\}\}')
+# Cambia si cambia la forma de renderizar (p. ej. el escapado): invalida las páginas ya publicadas
+ENGINE_VERSION = 1
+
+
+class Template:
+    """
+    Plantilla compilada: el texto se parte una sola vez en segmentos literales y huecos.
+    render() rellena los huecos y une todo en un único ''.join, sin copiar el documento por cada hueco.
+    Los valores se escapan como HTML salvo en los huecos marcados con |raw o listados en `raw_slots`.
+    """
+
+    def __init__(self, source: str, raw_slots: tuple = ()):
+        self.source = source
+        self._parts = []
+        # (posición en _parts, nombre del hueco, si se escapa)
+        self._slots = []
+        position = 0
+        for match in SLOT_RE.finditer(source):
+            self._parts.append(source[position:match.start()])
+            name = match.group(1)
+            self._slots.append((len(self._parts), name, not (match.group(2) or name in raw_slots)))
+            self._parts.append('')
+            position = match.end()
+        self._parts.append(source[position:])
+
+    @classmethod
+    def from_file(cls, path: str, raw_slots: tuple = ()) -> 'Template':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(f.read(), raw_slots=raw_slots)
+
+    @property
+    def slot_names(self) -> set:
+        return {name for _, name, _ in self._slots}
+
+    def render(self, values: dict) -> str:
+        """Rellena los huecos con `values` (nombre -> valor); un hueco sin valor lanza KeyError."""
+        parts = self._parts.copy()
+        for position, name, escape in self._slots:
+            value = values[name]
+            value = value if isinstance(value, str) else str(value)
+            parts[position] = html.escape(value) if escape else value
+        return ''.join(parts)
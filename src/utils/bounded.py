@@ -0,0 +1,59 @@
+# src/utils/bounded.py
+import contextlib
+import threading
+from collections import OrderedDict
+
+
+class LruDict(OrderedDict):
+    """
+    Dict acotado a `max_entries` que descarta la entrada menos usada al llenarse.
+    Para los mapas por URL o por imagen que, en modo daemon, crecerían con cada URL vista.
+    No es thread-safe por sí mismo: quien lo usa lo protege con su propio lock.
+    """
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Como dict.get, pero marca la entrada como usada recientemente."""
+        if key not in self:
+            return default
+        self.move_to_end(key)
+        return super().__getitem__(key)
+
+
+class KeyedLocks:
+    """
+    Un lock por clave (URL, ruta de Storage...) que se descarta al soltarlo el último hilo que lo usaba,
+    de modo que el mapa solo contiene las claves en uso en ese momento.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # clave -> [lock, hilos que lo tienen o esperan]
+        self._locks = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._locks)
+
+    @contextlib.contextmanager
+    def hold(self, key):
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
@@ -1,32 +1,132 @@
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
+import queue
 import sys
 import os
 
-def get_logger(name):
+# --- CONFIGURACIÓN ---
+# 'sincrono': cada registro se escribe en el hilo que lo emite (texto en runa_automation.log).
+# 'cola': los hilos solo encolan el registro; un QueueListener formatea y escribe en segundo plano (JSON en runa_automation.jsonl).
+LOG_MODES = ('sincrono', 'cola')
+DEFAULT_LOG_MODE = os.getenv('RUNA_LOG_MODE', 'sincrono')
+# Rotación por tamaño: el volumen en disco queda acotado a LOG_MAX_BYTES * (LOG_BACKUP_COUNT + 1)
+LOG_MAX_BYTES = int(os.getenv('RUNA_LOG_MAX_BYTES', str(20 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('RUNA_LOG_BACKUPS', '5'))
+LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Identificadores de correlación (url_id, asset_id, imagen...) del trabajo en curso en este hilo o tarea
+_log_context = contextvars.ContextVar('runa_log_context', default={})
+# Manejadores compartidos por todos los loggers del proceso: un único archivo rotado por modo
+_shared = {}
+
+
+def bind_log_context(**fields) -> contextvars.Token:
+    """
+    Añade campos de correlación a los registros que se emitan desde el contexto actual.
+    Devuelve un token para reset_log_context(); con el token de la primera llamada se deshacen todas las posteriores.
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: contextvars.Token):
+    _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copia en el registro los campos de correlación; se ejecuta en el hilo que emite, donde vive el contexto."""
+
+    def filter(self, record):
+        # En modo 'cola' el filtro del archivo corre en el hilo del listener: conserva el contexto ya capturado
+        if not hasattr(record, 'contexto'):
+            record.contexto = _log_context.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea con fecha, nivel, logger, hilo, mensaje y los campos de correlación."""
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, DATE_FORMAT),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'hilo': record.threadName,
+            'mensaje': record.getMessage(),
+        }
+        entry.update(getattr(record, 'contexto', {}))
+        if record.exc_info:
+            entry['excepcion'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler para una cola en memoria del mismo proceso: el registro se encola tal cual, con sus argumentos
+    %-style sin resolver, y el listener construye el mensaje, el JSON y la traza y los escribe. Por eso las
+    llamadas de las rutas calientes (curador, pipeline, cliente HTTP) pasan argumentos en vez de f-strings, y
+    esos argumentos no deben modificarse después de emitir el registro.
+    """
+
+    def prepare(self, record):
+        # El QueueHandler estándar llama a format() aquí, en el hilo que emite; no hace falta: la cola no sale del proceso
+        return record
+
+
+def _file_handler(mode: str) -> logging.Handler:
+    filename = 'runa_automation.jsonl' if mode == 'cola' else 'runa_automation.log'
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, filename), mode='a', maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    handler.setLevel(logging.DEBUG)
+    handler.setFormatter(JsonFormatter() if mode == 'cola' else logging.Formatter(fmt=LOG_FORMAT, datefmt=DATE_FORMAT))
+    handler.addFilter(ContextFilter())
+    return handler
+
+
+def _stream_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setLevel(logging.INFO)
+    handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=DATE_FORMAT))
+    return handler
+
+
+def _shared_handlers(mode: str) -> list:
+    if mode in _shared:
+        return _shared[mode]
+    if mode == 'cola':
+        log_queue = queue.SimpleQueue()
+        listener = logging.handlers.QueueListener(log_queue, _stream_handler(), _file_handler(mode), respect_handler_level=True)
+        listener.start()
+        # Al salir se vacía la cola antes de cerrar el archivo
+        atexit.register(listener.stop)
+        queue_handler = _BackgroundQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        _shared[mode] = [queue_handler]
+    else:
+        _shared[mode] = [_stream_handler(), _file_handler(mode)]
+    return _shared[mode]
+
+
+def get_logger(name, mode: str | None = None):
     """
     Configura y devuelve un logger estándar para el proyecto.
-    Los logs se envían tanto a la consola como a un archivo.
+    Los logs se envían tanto a la consola como a un archivo rotado por tamaño.
+    `mode` (o RUNA_LOG_MODE) elige entre escritura síncrona en texto ('sincrono') y
+    escritura en segundo plano con registros JSON ('cola').
     """
+    mode = mode or DEFAULT_LOG_MODE
+    if mode not in LOG_MODES:
+        raise ValueError(f"Modo de log desconocido: '{mode}'. Opciones: {', '.join(LOG_MODES)}")
     logger = logging.getLogger(name)
     logger.setLevel(logging.DEBUG)
 
     if not logger.handlers:
-        # Corrección: Definir el formato en una sola línea o con concatenación explícita
-        log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        formatter = logging.Formatter(fmt=log_format, datefmt='%Y-%m-%d %H:%M:%S')
-
-        # Manejador para la consola
-        stream_handler = logging.StreamHandler(sys.stdout)
-        stream_handler.setLevel(logging.INFO)
-        stream_handler.setFormatter(formatter)
-        logger.addHandler(stream_handler)
-
-        # Manejador para el archivo
-        # Usar una ruta relativa al directorio del script actual
-        log_file_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'runa_automation.log'))
-        file_handler = logging.FileHandler(log_file_path, mode='a', encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
-
-    return logger
\ No newline at end of file
+        for handler in _shared_handlers(mode):
+            logger.addHandler(handler)
+
+    return logger
@@ -0,0 +1,81 @@
+# src/vision_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from src.page_readiness import CACHE_DIR
+
+# --- CONFIGURACIÓN ---
+DEFAULT_DB_PATH = os.path.join(CACHE_DIR, 'vision_cache.sqlite3')
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS analisis_vision (
+    sha256 TEXT NOT NULL,
+    version TEXT NOT NULL,
+    resultado TEXT NOT NULL,
+    creado_en REAL NOT NULL,
+    PRIMARY KEY (sha256, version)
+);
+"""
+
+
+class VisionCache:
+    """
+    Caché persistente (SQLite local) de los análisis de visión por hash de los bytes de la imagen.
+    La clave incluye la versión del análisis (modelo + prompt), de modo que cambiar VISION_MODEL
+    o el prompt invalida automáticamente los resultados anteriores, que se purgan al abrir la caché.
+    """
+
+    def __init__(self, logger, version: str, db_path: str = DEFAULT_DB_PATH, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.logger = logger
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        # Se comparte entre los hilos de los workers; el lock serializa el acceso
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA_SQL)
+            purged = self._conn.execute(
+                "DELETE FROM analisis_vision WHERE version != ? OR creado_en < ?",
+                (self.version, time.time() - self.ttl_seconds),
+            ).rowcount
+        if purged:
+            self.logger.info(f"Caché de visión: {purged} resultados obsoletos o caducados eliminados.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        self.log_summary()
+
+    def get(self, sha256: str) -> str | None:
+        """Devuelve el JSON del análisis guardado para esos bytes, o None si no existe o caducó."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT resultado FROM analisis_vision WHERE sha256 = ? AND version = ? AND creado_en >= ?",
+                (sha256, self.version, time.time() - self.ttl_seconds),
+            ).fetchone()
+            self.counters['aciertos' if row else 'fallos'] += 1
+        return row[0] if row else None
+
+    def put(self, sha256: str, analysis_json: str):
+        """Guarda solo los campos que usa el curador: tipo, es_relevante y descripcion_ia."""
+        data = json.loads(analysis_json)
+        stored = json.dumps({key: data.get(key) for key in ('tipo', 'es_relevante', 'descripcion_ia')}, ensure_ascii=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analisis_vision (sha256, version, resultado, creado_en) VALUES (?, ?, ?, ?)",
+                (sha256, self.version, stored, time.time()),
+            )
+
+    def log_summary(self):
+        self.logger.info(
+            f"Caché de visión: {self.counters['aciertos']} aciertos (llamadas al modelo evitadas), "
+            f"{self.counters['fallos']} fallos."
+        )
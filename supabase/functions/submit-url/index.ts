@@ -30,6 +30,14 @@ serve(async (req) => {
       .from('urls_para_procesar')
       .insert({ url: url, estado: 'pendiente' })
 
+    // 23505: la BD ya tiene esta URL o una equivalente (misma clave canónica)
+    if (error && error.code === '23505') {
+      return new Response(JSON.stringify({ message: `La URL ya estaba en la cola: ${url}`, duplicada: true }), {
+        headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+        status: 409,
+      })
+    }
+
     // Si hay un error en la inserción, lanzarlo
     if (error) {
       console.error('Error de Supabase:', error)
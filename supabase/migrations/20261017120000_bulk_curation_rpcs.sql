@@ -0,0 +1,48 @@
+-- Transiciones de curación agrupadas: una llamada RPC (una transacción) por fase
+CREATE OR REPLACE FUNCTION public.iniciar_curacion(p_url_id bigint, p_url text)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_asset_id bigint;
+BEGIN
+    UPDATE public.urls_para_procesar SET estado = 'en_proceso' WHERE id = p_url_id;
+    -- Idempotencia: se borra el activo anterior de la URL (las imágenes caen en cascada)
+    DELETE FROM public.activos WHERE source_url_id = p_url_id;
+    INSERT INTO public.activos (source_url_id, url_original) VALUES (p_url_id, p_url) RETURNING id INTO v_asset_id;
+    RETURN v_asset_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.finalizar_curacion(p_url_id bigint, p_asset_id bigint, p_metadatos jsonb, p_imagenes jsonb)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.activos
+    SET titulo = p_metadatos->>'titulo',
+        resumen = p_metadatos->>'resumen',
+        tags = p_metadatos->>'tags',
+        estado_curacion = 'completado'
+    WHERE id = p_asset_id;
+
+    INSERT INTO public.imagenes (asset_id, url_original_imagen, url_almacenamiento, descripcion_ia, tags_visuales_ia, orden_aparicion)
+    SELECT p_asset_id, i.url_original_imagen, i.url_almacenamiento, i.descripcion_ia, i.tags_visuales_ia, i.orden_aparicion
+    FROM jsonb_to_recordset(COALESCE(p_imagenes, '[]'::jsonb))
+        AS i(url_original_imagen text, url_almacenamiento text, descripcion_ia text, tags_visuales_ia text, orden_aparicion smallint);
+
+    UPDATE public.urls_para_procesar SET estado = 'completado', ultimo_error = NULL WHERE id = p_url_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.fallar_curacion(p_url_id bigint, p_asset_id bigint, p_error text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_asset_id IS NOT NULL THEN
+        UPDATE public.activos SET estado_curacion = 'fallido' WHERE id = p_asset_id;
+    END IF;
+    UPDATE public.urls_para_procesar SET estado = 'error', ultimo_error = p_error WHERE id = p_url_id;
+END;
+$$;
@@ -0,0 +1,68 @@
+-- Lease de la cola de URLs para que varios workers puedan drenarla en paralelo sin trabajo duplicado
+ALTER TABLE public.urls_para_procesar ADD COLUMN IF NOT EXISTS worker_id text;
+ALTER TABLE public.urls_para_procesar ADD COLUMN IF NOT EXISTS lease_expira timestamptz;
+
+CREATE INDEX IF NOT EXISTS idx_urls_para_procesar_cola ON public.urls_para_procesar (created_at, id) WHERE estado IN ('pendiente', 'en_proceso');
+
+CREATE OR REPLACE FUNCTION public.reclamar_urls(p_worker_id text, p_limite integer, p_lease_segundos integer DEFAULT 900)
+RETURNS SETOF public.urls_para_procesar
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.urls_para_procesar AS u
+    SET estado = 'en_proceso',
+        worker_id = p_worker_id,
+        lease_expira = now() + make_interval(secs => p_lease_segundos)
+    WHERE u.id IN (
+        SELECT c.id FROM public.urls_para_procesar AS c
+        WHERE c.estado = 'pendiente' OR (c.estado = 'en_proceso' AND c.lease_expira < now())
+        ORDER BY c.created_at, c.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING u.*;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.liberar_urls(p_worker_id text, p_ids bigint[])
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE public.urls_para_procesar
+    SET estado = 'pendiente', worker_id = NULL, lease_expira = NULL
+    WHERE id = ANY(p_ids) AND worker_id = p_worker_id AND estado = 'en_proceso';
+$$;
+
+CREATE OR REPLACE FUNCTION public.finalizar_curacion(p_url_id bigint, p_asset_id bigint, p_metadatos jsonb, p_imagenes jsonb)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.activos
+    SET titulo = p_metadatos->>'titulo',
+        resumen = p_metadatos->>'resumen',
+        tags = p_metadatos->>'tags',
+        estado_curacion = 'completado'
+    WHERE id = p_asset_id;
+
+    INSERT INTO public.imagenes (asset_id, url_original_imagen, url_almacenamiento, descripcion_ia, tags_visuales_ia, orden_aparicion)
+    SELECT p_asset_id, i.url_original_imagen, i.url_almacenamiento, i.descripcion_ia, i.tags_visuales_ia, i.orden_aparicion
+    FROM jsonb_to_recordset(COALESCE(p_imagenes, '[]'::jsonb))
+        AS i(url_original_imagen text, url_almacenamiento text, descripcion_ia text, tags_visuales_ia text, orden_aparicion smallint);
+
+    UPDATE public.urls_para_procesar SET estado = 'completado', ultimo_error = NULL, lease_expira = NULL WHERE id = p_url_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.fallar_curacion(p_url_id bigint, p_asset_id bigint, p_error text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF p_asset_id IS NOT NULL THEN
+        UPDATE public.activos SET estado_curacion = 'fallido' WHERE id = p_asset_id;
+    END IF;
+    UPDATE public.urls_para_procesar SET estado = 'error', ultimo_error = p_error, lease_expira = NULL WHERE id = p_url_id;
+END;
+$$;
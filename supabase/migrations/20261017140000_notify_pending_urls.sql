@@ -0,0 +1,16 @@
+-- Aviso al daemon del curador (curator.py --daemon) cuando una URL entra o vuelve a 'pendiente'
+CREATE OR REPLACE FUNCTION public.notificar_url_pendiente()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('urls_pendientes', '');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_urls_para_procesar_notificar ON public.urls_para_procesar;
+CREATE TRIGGER trg_urls_para_procesar_notificar
+    AFTER INSERT OR UPDATE OF estado ON public.urls_para_procesar
+    FOR EACH ROW WHEN (NEW.estado = 'pendiente')
+    EXECUTE FUNCTION public.notificar_url_pendiente();
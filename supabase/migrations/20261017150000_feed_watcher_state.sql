@@ -0,0 +1,8 @@
+-- Estado incremental del vigilante de feeds: validadores HTTP (ETag / Last-Modified) y última entrada vista por feed
+CREATE TABLE IF NOT EXISTS public.estado_feeds (
+    feed_url text PRIMARY KEY,
+    etag text,
+    last_modified text,
+    ultimo_id_entrada text,
+    revisado_en timestamptz DEFAULT now() NOT NULL
+);
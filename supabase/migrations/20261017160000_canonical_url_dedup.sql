@@ -0,0 +1,90 @@
+-- Clave canónica en urls_para_procesar para rechazar duplicados (utm_*, barra final, /amp, http/https...)
+ALTER TABLE public.urls_para_procesar ADD COLUMN IF NOT EXISTS url_canonica text;
+
+-- Clave canónica de una URL para detectar duplicados: sin esquema, 'www.'/'amp.', puerto por defecto,
+-- fragmento, barra final, sufijo /amp ni parámetros de seguimiento; el resto de parámetros, ordenados.
+-- Es la única implementación de la regla: la aplican el trigger de inserción (panel, submit-url,
+-- feed_watcher) y el curador al resolver <link rel=canonical>.
+CREATE OR REPLACE FUNCTION public.canonicalizar_url(p_url text)
+RETURNS text
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+DECLARE
+    v_rest text;
+    v_host text;
+    v_path text;
+    v_query text;
+BEGIN
+    v_rest := regexp_replace(btrim(p_url), '^[a-zA-Z][a-zA-Z0-9+.-]*://', '');
+    v_rest := split_part(v_rest, '#', 1);
+    v_host := lower(substring(v_rest from '^[^/?]*'));
+    v_host := regexp_replace(regexp_replace(v_host, '^(www|amp)\.', ''), ':(80|443)$', '');
+    v_path := COALESCE(substring(v_rest from '^[^/?]*([^?]*)'), '');
+    v_path := regexp_replace(regexp_replace(v_path, '/amp/?$', ''), '/+$', '');
+    SELECT string_agg(param, '&' ORDER BY param) INTO v_query
+    FROM unnest(string_to_array(substring(v_rest from '\?(.*)$'), '&')) AS param
+    WHERE param <> ''
+      AND lower(split_part(param, '=', 1)) !~ '^(utm_.*|fbclid|gclid|dclid|msclkid|mc_cid|mc_eid|igshid|_ga|ref|ref_src|amp|outputtype)$';
+    RETURN v_host || v_path || COALESCE('?' || v_query, '');
+END;
+$$;
+
+-- Rellenar las filas existentes; entre duplicados se conserva la más antigua y las pendientes se descartan
+UPDATE public.urls_para_procesar SET url_canonica = public.canonicalizar_url(url) WHERE url_canonica IS NULL;
+
+WITH repetidas AS (
+    SELECT id, row_number() OVER (PARTITION BY url_canonica ORDER BY id) AS posicion
+    FROM public.urls_para_procesar
+)
+UPDATE public.urls_para_procesar AS u
+SET url_canonica = NULL,
+    estado = CASE WHEN u.estado = 'pendiente' THEN 'duplicado' ELSE u.estado END
+FROM repetidas AS r
+WHERE u.id = r.id AND r.posicion > 1;
+
+-- La clave la calcula siempre la BD, de modo que ningún cliente puede saltarse la deduplicación
+CREATE OR REPLACE FUNCTION public.asignar_url_canonica()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.url_canonica := public.canonicalizar_url(NEW.url);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_urls_para_procesar_canonica ON public.urls_para_procesar;
+CREATE TRIGGER trg_urls_para_procesar_canonica
+    BEFORE INSERT ON public.urls_para_procesar
+    FOR EACH ROW EXECUTE FUNCTION public.asignar_url_canonica();
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_urls_para_procesar_canonica ON public.urls_para_procesar (url_canonica);
+
+-- Tras la extracción, adopta como clave la URL de <link rel=canonical>. Si otra fila ya la tiene,
+-- esta URL se marca 'duplicado', se borra su activo recién creado y se devuelve el id de la original.
+CREATE OR REPLACE FUNCTION public.resolver_url_canonica(p_url_id bigint, p_url_canonica text)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_clave text := public.canonicalizar_url(p_url_canonica);
+    v_original bigint;
+BEGIN
+    SELECT id INTO v_original FROM public.urls_para_procesar WHERE url_canonica = v_clave AND id <> p_url_id;
+    IF v_original IS NULL THEN
+        BEGIN
+            UPDATE public.urls_para_procesar SET url_canonica = v_clave WHERE id = p_url_id;
+            RETURN NULL;
+        EXCEPTION WHEN unique_violation THEN
+            -- Otro worker resolvió la misma clave a la vez
+            SELECT id INTO v_original FROM public.urls_para_procesar WHERE url_canonica = v_clave AND id <> p_url_id;
+        END;
+    END IF;
+    DELETE FROM public.activos WHERE source_url_id = p_url_id;
+    UPDATE public.urls_para_procesar
+    SET estado = 'duplicado', ultimo_error = 'Duplicado de la URL ID ' || v_original, lease_expira = NULL
+    WHERE id = p_url_id;
+    RETURN v_original;
+END;
+$$;
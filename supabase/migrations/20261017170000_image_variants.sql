@@ -0,0 +1,24 @@
+-- Variantes responsive (WebP/AVIF en varios anchos) de cada imagen curada, subidas junto al original en Storage
+ALTER TABLE public.imagenes ADD COLUMN IF NOT EXISTS variantes jsonb DEFAULT '[]'::jsonb NOT NULL;
+
+CREATE OR REPLACE FUNCTION public.finalizar_curacion(p_url_id bigint, p_asset_id bigint, p_metadatos jsonb, p_imagenes jsonb)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE public.activos
+    SET titulo = p_metadatos->>'titulo',
+        resumen = p_metadatos->>'resumen',
+        tags = p_metadatos->>'tags',
+        estado_curacion = 'completado'
+    WHERE id = p_asset_id;
+
+    INSERT INTO public.imagenes (asset_id, url_original_imagen, url_almacenamiento, descripcion_ia, tags_visuales_ia, orden_aparicion, variantes)
+    SELECT p_asset_id, i.url_original_imagen, i.url_almacenamiento, i.descripcion_ia, i.tags_visuales_ia, i.orden_aparicion,
+           COALESCE(i.variantes, '[]'::jsonb)
+    FROM jsonb_to_recordset(COALESCE(p_imagenes, '[]'::jsonb))
+        AS i(url_original_imagen text, url_almacenamiento text, descripcion_ia text, tags_visuales_ia text, orden_aparicion smallint, variantes jsonb);
+
+    UPDATE public.urls_para_procesar SET estado = 'completado', ultimo_error = NULL, lease_expira = NULL WHERE id = p_url_id;
+END;
+$$;
@@ -0,0 +1,91 @@
+-- Leases de la cola: filas sin lease reclamables, escrituras finales solo del dueño del lease y renovación
+
+-- Las filas 'en_proceso' sin lease_expira (workers anteriores a los leases) también se pueden reclamar
+CREATE OR REPLACE FUNCTION public.reclamar_urls(p_worker_id text, p_limite integer, p_lease_segundos integer DEFAULT 900)
+RETURNS SETOF public.urls_para_procesar
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.urls_para_procesar AS u
+    SET estado = 'en_proceso',
+        worker_id = p_worker_id,
+        lease_expira = now() + make_interval(secs => p_lease_segundos)
+    WHERE u.id IN (
+        SELECT c.id FROM public.urls_para_procesar AS c
+        WHERE c.estado = 'pendiente' OR (c.estado = 'en_proceso' AND COALESCE(c.lease_expira, '-infinity') < now())
+        ORDER BY c.created_at, c.id
+        LIMIT p_limite
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING u.*;
+END;
+$$;
+
+-- Un worker activo alarga el lease de todas las URLs que tiene reclamadas, en curso o esperando turno
+CREATE OR REPLACE FUNCTION public.renovar_leases(p_worker_id text, p_lease_segundos integer DEFAULT 900)
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH renovadas AS (
+        UPDATE public.urls_para_procesar
+        SET lease_expira = now() + make_interval(secs => p_lease_segundos)
+        WHERE worker_id = p_worker_id AND estado = 'en_proceso'
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM renovadas;
+$$;
+
+-- Con p_worker_id, las escrituras finales solo se aplican si la URL sigue reclamada por ese worker:
+-- uno cuyo lease caducó y fue reasignado no pisa el resultado del nuevo dueño. Devuelven si se aplicaron.
+DROP FUNCTION IF EXISTS public.finalizar_curacion(bigint, bigint, jsonb, jsonb);
+CREATE FUNCTION public.finalizar_curacion(p_url_id bigint, p_asset_id bigint, p_metadatos jsonb, p_imagenes jsonb, p_worker_id text DEFAULT NULL)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1 FROM public.urls_para_procesar
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    UPDATE public.activos
+    SET titulo = p_metadatos->>'titulo',
+        resumen = p_metadatos->>'resumen',
+        tags = p_metadatos->>'tags',
+        estado_curacion = 'completado'
+    WHERE id = p_asset_id;
+
+    INSERT INTO public.imagenes (asset_id, url_original_imagen, url_almacenamiento, descripcion_ia, tags_visuales_ia, orden_aparicion, variantes)
+    SELECT p_asset_id, i.url_original_imagen, i.url_almacenamiento, i.descripcion_ia, i.tags_visuales_ia, i.orden_aparicion,
+           COALESCE(i.variantes, '[]'::jsonb)
+    FROM jsonb_to_recordset(COALESCE(p_imagenes, '[]'::jsonb))
+        AS i(url_original_imagen text, url_almacenamiento text, descripcion_ia text, tags_visuales_ia text, orden_aparicion smallint, variantes jsonb);
+
+    UPDATE public.urls_para_procesar SET estado = 'completado', ultimo_error = NULL, lease_expira = NULL WHERE id = p_url_id;
+    RETURN true;
+END;
+$$;
+
+DROP FUNCTION IF EXISTS public.fallar_curacion(bigint, bigint, text);
+CREATE FUNCTION public.fallar_curacion(p_url_id bigint, p_asset_id bigint, p_error text, p_worker_id text DEFAULT NULL)
+RETURNS boolean
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM 1 FROM public.urls_para_procesar
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN false;
+    END IF;
+
+    IF p_asset_id IS NOT NULL THEN
+        UPDATE public.activos SET estado_curacion = 'fallido' WHERE id = p_asset_id;
+    END IF;
+    UPDATE public.urls_para_procesar SET estado = 'error', ultimo_error = p_error, lease_expira = NULL WHERE id = p_url_id;
+    RETURN true;
+END;
+$$;
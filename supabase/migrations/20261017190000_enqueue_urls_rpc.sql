@@ -0,0 +1,17 @@
+-- Encolado en lote que no falla por duplicados. El upsert con ON CONFLICT (url_canonica) no cubría la
+-- restricción UNIQUE de url: una URL ya encolada cuya clave cambió (rel=canonical resuelto, o duplicado
+-- anulado por el relleno de canonical_url_dedup) lanzaba unique_violation y tumbaba todo el lote del feed.
+-- ON CONFLICT sin objetivo ignora ambas restricciones. Devuelve cuántas URLs eran nuevas.
+CREATE OR REPLACE FUNCTION public.encolar_urls(p_urls text[])
+RETURNS integer
+LANGUAGE sql
+AS $$
+    WITH nuevas AS (
+        INSERT INTO public.urls_para_procesar (url)
+        SELECT u.url FROM unnest(p_urls) WITH ORDINALITY AS u(url, posicion)
+        ORDER BY u.posicion
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM nuevas;
+$$;
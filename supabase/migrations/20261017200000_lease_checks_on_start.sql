@@ -0,0 +1,62 @@
+-- Leases: iniciar_curacion y resolver_url_canonica también comprueban que la URL siga reclamada por el worker.
+-- Sin esto, un worker cuyo lease caducó y fue reasignado podía borrar el activo del nuevo dueño o marcar la URL
+-- como 'duplicado'. Las versiones sin p_worker_id se borran: con ellas, PostgREST no sabría qué sobrecarga llamar.
+
+-- Tras la extracción, adopta como clave la URL de <link rel=canonical>. Si otra fila ya la tiene,
+-- esta URL se marca 'duplicado', se borra su activo recién creado y se devuelve el id de la original.
+-- Con p_worker_id, no hace nada (y devuelve NULL) si la URL ya no está reclamada por ese worker.
+DROP FUNCTION IF EXISTS public.resolver_url_canonica(bigint, text);
+CREATE OR REPLACE FUNCTION public.resolver_url_canonica(p_url_id bigint, p_url_canonica text, p_worker_id text DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_clave text := public.canonicalizar_url(p_url_canonica);
+    v_original bigint;
+BEGIN
+    PERFORM 1 FROM public.urls_para_procesar
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id)
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT id INTO v_original FROM public.urls_para_procesar WHERE url_canonica = v_clave AND id <> p_url_id;
+    IF v_original IS NULL THEN
+        BEGIN
+            UPDATE public.urls_para_procesar SET url_canonica = v_clave WHERE id = p_url_id;
+            RETURN NULL;
+        EXCEPTION WHEN unique_violation THEN
+            -- Otro worker resolvió la misma clave a la vez
+            SELECT id INTO v_original FROM public.urls_para_procesar WHERE url_canonica = v_clave AND id <> p_url_id;
+        END;
+    END IF;
+    DELETE FROM public.activos WHERE source_url_id = p_url_id;
+    UPDATE public.urls_para_procesar
+    SET estado = 'duplicado', ultimo_error = 'Duplicado de la URL ID ' || v_original, lease_expira = NULL
+    WHERE id = p_url_id;
+    RETURN v_original;
+END;
+$$;
+
+-- Transiciones de curación agrupadas: una llamada RPC (una transacción) por fase.
+-- Con p_worker_id, iniciar_curacion no toca el activo de la URL (y devuelve NULL) si su lease pasó a otro worker.
+DROP FUNCTION IF EXISTS public.iniciar_curacion(bigint, text);
+CREATE OR REPLACE FUNCTION public.iniciar_curacion(p_url_id bigint, p_url text, p_worker_id text DEFAULT NULL)
+RETURNS bigint
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_asset_id bigint;
+BEGIN
+    UPDATE public.urls_para_procesar SET estado = 'en_proceso'
+    WHERE id = p_url_id AND (p_worker_id IS NULL OR worker_id = p_worker_id);
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    -- Idempotencia: se borra el activo anterior de la URL (las imágenes caen en cascada)
+    DELETE FROM public.activos WHERE source_url_id = p_url_id;
+    INSERT INTO public.activos (source_url_id, url_original) VALUES (p_url_id, p_url) RETURNING id INTO v_asset_id;
+    RETURN v_asset_id;
+END;
+$$;
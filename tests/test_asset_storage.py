@@ -0,0 +1,71 @@
+# tests/test_asset_storage.py
+
+import hashlib
+import logging
+from types import SimpleNamespace
+
+from benchmarks.fakes import FakeSupabase
+from src.asset_storage import AssetStorage, object_extension
+
+
+def test_identical_bytes_are_stored_once_across_runs():
+    fake = FakeSupabase()
+    data = b'\x89PNG misma imagen'
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    storage = AssetStorage(logging.getLogger("test"), fake)
+    first = storage.store(data, 'image/png', source='https://a.example/foto.png')
+    again = storage.store(data, 'image/png', source='https://b.example/otra-url.png')
+    assert first == again == f"sha256/{sha256[:2]}/{sha256}.png"
+    assert fake.storage_calls['upload'] == 1
+
+    # Otra ejecución (p. ej. re-curar el artículo) no sobrescribe el objeto existente
+    next_run = AssetStorage(logging.getLogger("test"), fake)
+    assert next_run.store(data, 'image/png') == first
+    assert next_run.counters['ya_existentes'] == 1 and len(fake.objects) == 1
+
+
+def test_public_urls_are_resolved_per_distinct_path():
+    storage = AssetStorage(logging.getLogger("test"), FakeSupabase())
+    paths = ['sha256/ab/ab.jpg', 'sha256/ab/ab.jpg', None, 'sha256/cd/cd.png']
+    urls = storage.public_urls(paths)
+    assert set(urls) == {'sha256/ab/ab.jpg', 'sha256/cd/cd.png'}
+    assert urls['sha256/cd/cd.png'].endswith('/runa-asset-images/sha256/cd/cd.png')
+
+
+def test_object_extension_prefers_content_type():
+    assert object_extension('image/jpeg; charset=binary', 'https://a.example/x.png') == '.jpg'
+    assert object_extension('application/octet-stream', 'https://a.example/x.webp?w=800') == '.webp'
+    assert object_extension('', '') == '.jpg'
+
+
+def test_only_a_409_status_means_the_object_already_exists():
+    class StorageApiError(Exception):
+        def __init__(self, message, code, status):
+            super().__init__(message)
+            self.status = status
+
+    class FailingBucket:
+        def __init__(self, error):
+            self.error = error
+
+        def upload(self, path, file, file_options=None):
+            raise self.error
+
+    class FakeClient:
+        def __init__(self, error):
+            self.storage = SimpleNamespace(from_=lambda bucket: FailingBucket(error))
+
+    # Un hash con '409' repetido en el mensaje de un error de servidor no es un duplicado
+    data = b'imagen cuya ruta contiene 409'
+    path = f"sha256/40/4090{'0' * 60}.jpg"
+    server_error = StorageApiError(f"Internal error uploading {path}", 'InternalError', 500)
+    storage = AssetStorage(logging.getLogger("test"), FakeClient(server_error))
+    assert storage.store(data, 'image/jpeg', sha256=f"4090{'0' * 60}") is None
+    assert storage.counters['errores'] == 1
+
+    # Storage responde HTTP 400 con statusCode '409' en el cuerpo
+    duplicate = StorageApiError('The resource already exists', 'Duplicate', '409')
+    storage = AssetStorage(logging.getLogger("test"), FakeClient(duplicate))
+    assert storage.store(data, 'image/jpeg', sha256=f"4090{'0' * 60}") == path
+    assert storage.counters['ya_existentes'] == 1
@@ -0,0 +1,36 @@
+# tests/test_bounded.py
+
+import threading
+
+from src.utils.bounded import KeyedLocks, LruDict
+
+
+def test_lru_dict_evicts_least_recently_used():
+    entries = LruDict(max_entries=2)
+    entries['a'] = 1
+    entries['b'] = 2
+    assert entries.get('a') == 1
+    entries['c'] = 3
+    assert list(entries) == ['a', 'c']
+    assert entries.get('b') is None
+
+
+def test_keyed_locks_are_dropped_once_released():
+    locks = KeyedLocks()
+    inside = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with locks.hold('https://cdn.example/a.jpg'):
+            inside.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    inside.wait()
+    assert len(locks) == 1
+    release.set()
+    thread.join()
+    with locks.hold('https://cdn.example/b.jpg'):
+        pass
+    assert len(locks) == 0
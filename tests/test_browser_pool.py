@@ -0,0 +1,111 @@
+# tests/test_browser_pool.py
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from playwright.sync_api import Error as PlaywrightError
+
+from src.browser_pool import AsyncBrowserPool, BrowserPool
+
+
+class StubContext:
+    def __init__(self, browser):
+        self.browser = browser
+
+    def new_page(self):
+        return SimpleNamespace(browser=self.browser)
+
+    def close(self):
+        self.browser.open_contexts -= 1
+
+
+class StubBrowser:
+    def __init__(self):
+        self.connected = True
+        self.closed = False
+        self.open_contexts = 0
+
+    def is_connected(self):
+        return self.connected
+
+    def new_context(self):
+        self.open_contexts += 1
+        return StubContext(self)
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+def stub_playwright(browsers: list):
+    """Playwright simulado: cada launch() crea un StubBrowser y lo añade a `browsers`."""
+    def launch(headless=True):
+        browsers.append(StubBrowser())
+        return browsers[-1]
+    return SimpleNamespace(chromium=SimpleNamespace(launch=launch), stop=lambda: None)
+
+
+def test_pool_recycles_after_max_pages_and_relaunches_after_a_crash():
+    browsers = []
+    pool = BrowserPool(logging.getLogger("test"), max_pages=2)
+    pool._playwright = stub_playwright(browsers)
+
+    for _ in range(3):
+        with pool.page() as page:
+            assert page.browser is browsers[-1]
+    assert pool.launch_count == 2 and browsers[0].closed and not browsers[1].closed
+    assert all(browser.open_contexts == 0 for browser in browsers)
+
+    # El navegador se cae a mitad de la navegación: la siguiente página usa uno nuevo
+    with pytest.raises(PlaywrightError):
+        with pool.page() as page:
+            page.browser.connected = False
+            raise PlaywrightError("Target page, context or browser has been closed")
+    with pool.page() as page:
+        assert page.browser is browsers[2]
+    assert pool.launch_count == 3 and browsers[1].open_contexts == 0
+
+
+class AsyncStubContext(StubContext):
+    async def new_page(self):
+        return SimpleNamespace(browser=self.browser)
+
+    async def close(self):
+        self.browser.open_contexts -= 1
+
+
+class AsyncStubBrowser(StubBrowser):
+    async def new_context(self):
+        self.open_contexts += 1
+        return AsyncStubContext(self)
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+def test_async_pool_closes_a_recycled_browser_only_after_its_pages_finish():
+    browsers = []
+
+    async def launch(headless=True):
+        browsers.append(AsyncStubBrowser())
+        return browsers[-1]
+
+    async def scenario():
+        pool = AsyncBrowserPool(logging.getLogger("test"), max_pages=1)
+        pool._lock = asyncio.Lock()
+        pool._playwright = SimpleNamespace(chromium=SimpleNamespace(launch=launch))
+        async with pool.page() as (first, _):
+            # La segunda página recicla el navegador mientras la primera sigue abierta en él
+            async with pool.page() as (second, _):
+                assert second.browser is not first.browser
+                assert not first.browser.closed
+        assert first.browser.closed and not second.browser.closed
+        assert pool.launch_count == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,52 @@
+# tests/test_canonical_url.py
+
+from benchmarks.fakes import FakeSupabase
+from src.canonical_url import canonicalize_url, is_credible_canonical
+
+
+def test_tracking_params_are_dropped_and_the_rest_sorted():
+    assert canonicalize_url("https://example.org/nota?utm_source=tw&b=2&fbclid=x&a=1&gclid=y") == "example.org/nota?a=1&b=2"
+    assert canonicalize_url("https://example.org/nota?UTM_Medium=x&ref=home") == "example.org/nota"
+    assert canonicalize_url("https://example.org/nota?&&id=3") == "example.org/nota?id=3"
+
+
+def test_host_scheme_port_slash_amp_and_fragment_variants_share_a_key():
+    key = "example.org/2024/rio-amazonas"
+    for variant in (
+        "https://example.org/2024/rio-amazonas",
+        "http://www.example.org/2024/rio-amazonas/",
+        "https://amp.example.org/2024/rio-amazonas",
+        "https://Example.ORG:443/2024/rio-amazonas//",
+        "http://example.org:80/2024/rio-amazonas/amp/",
+        "https://example.org/2024/rio-amazonas#comentarios",
+        "  https://example.org/2024/rio-amazonas?amp=1  ",
+    ):
+        assert canonicalize_url(variant) == key, variant
+    # La ruta conserva mayúsculas y un puerto no estándar distingue el host
+    assert canonicalize_url("https://example.org/2024/Rio-Amazonas") != key
+    assert canonicalize_url("https://example.org:8080/2024/rio-amazonas") == "example.org:8080/2024/rio-amazonas"
+    assert canonicalize_url("https://example.org/") == "example.org"
+
+
+def test_canonicals_pointing_at_home_section_or_other_host_are_ignored():
+    url = "https://www.example.org/noticias/2024/rio?utm_source=x"
+    assert is_credible_canonical(url, "https://example.org/noticias/2024/rio")
+    assert is_credible_canonical("https://example.org/nota/amp", "https://example.org/nota")
+    assert not is_credible_canonical(url, "https://example.org/")
+    assert not is_credible_canonical(url, "https://example.org/noticias")
+    assert not is_credible_canonical(url, "https://otro.example/noticias/2024/rio")
+
+
+def test_fake_resolver_uses_the_canonical_key():
+    fake = FakeSupabase()
+    original, variant = fake.enqueue(["https://example.org/nota", "https://example.org/?p=123"])
+    assert fake.rpc('resolver_url_canonica', {'p_url_id': variant, 'p_url_canonica': "https://www.example.org/nota/"}).execute().data == original
+    assert fake.urls[variant]['estado'] == 'duplicado'
+
+
+def test_fake_enqueue_ignores_the_same_url_after_its_key_changed():
+    fake = FakeSupabase()
+    (url_id,) = fake.enqueue(["https://example.org/nota?id=7"])
+    fake.rpc('resolver_url_canonica', {'p_url_id': url_id, 'p_url_canonica': "https://example.org/2024/nota-7"}).execute()
+    urls = ["https://example.org/nota?id=7", "https://example.org/2024/nota-7/", "https://example.org/otra"]
+    assert fake.rpc('encolar_urls', {'p_urls': urls}).execute().data == 1
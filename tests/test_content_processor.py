@@ -0,0 +1,104 @@
+# tests/test_content_processor.py
+
+import json
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("playwright")
+
+from src import content_processor
+from src.content_processor import _parse_batch_verdicts, classify_images_batch
+
+URLS = [f"https://example.org/img/{name}.jpg" for name in ('a', 'b', 'c')]
+
+
+def verdict(index, name):
+    return {'indice': index, 'tipo': 'fotografia_principal', 'es_relevante': True, 'descripcion_ia': f"imagen {name}"}
+
+
+class StubModel:
+    """Modelo de visión simulado: responde a los lotes con `batch_replies` y a cada imagen suelta según sus bytes."""
+
+    batch_replies = []
+    prompts = []
+
+    def __init__(self, model_name):
+        pass
+
+    def generate_content(self, prompt_parts):
+        StubModel.prompts.append(prompt_parts)
+        if prompt_parts[1] == content_processor.VISION_USER_PROMPT:
+            name = prompt_parts[2]['data'].decode()
+            text = json.dumps({'tipo': 'fotografia_principal', 'es_relevante': True, 'descripcion_ia': f"imagen {name}"})
+        else:
+            text = StubModel.batch_replies.pop(0)
+        return SimpleNamespace(text=text, usage_metadata=None)
+
+
+class DictImageCache:
+    def get(self, image_url):
+        return SimpleNamespace(data=image_url.rsplit('/', 1)[1].split('.')[0].encode(), content_type='image/jpeg')
+
+
+class DictVisionCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, sha256):
+        return self.entries.get(sha256)
+
+    def put(self, sha256, analysis):
+        self.entries[sha256] = analysis
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    StubModel.batch_replies, StubModel.prompts = [], []
+    monkeypatch.setattr(content_processor.genai, 'GenerativeModel', StubModel)
+    return StubModel
+
+
+def classify(vision_cache=None):
+    return classify_images_batch(URLS, logging.getLogger("test"), image_cache=DictImageCache(), vision_cache=vision_cache)
+
+
+def descriptions(results):
+    return [json.loads(result)['descripcion_ia'] if result else None for result in results]
+
+
+def test_reordered_verdicts_are_aligned_by_index(stub_model):
+    stub_model.batch_replies = [json.dumps([verdict(2, 'c'), verdict(0, 'a'), verdict(1, 'b')])]
+    vision_cache = DictVisionCache()
+    results, stats = classify(vision_cache)
+    assert descriptions(results) == ["imagen a", "imagen b", "imagen c"]
+    assert stats['peticiones'] == 1 and stats['reintentos_individuales'] == 0
+
+    # Las imágenes ya analizadas salen de la caché sin llamar al modelo
+    again, stats = classify(vision_cache)
+    assert again == results and stats['desde_cache'] == 3 and len(stub_model.prompts) == 1
+
+
+@pytest.mark.parametrize('reply', [
+    json.dumps([verdict(0, 'a'), verdict(2, 'c')]),                   # omite una imagen
+    json.dumps([verdict(0, 'a'), verdict(0, 'b'), verdict(2, 'c')]),  # índice repetido
+    json.dumps([verdict(0, 'a'), dict(verdict(1, 'b'), indice=True), verdict(2, 'c')]),
+    json.dumps([{k: v for k, v in verdict(i, n).items() if k != 'indice'} for i, n in enumerate('cab')]),
+    '[{"indice": 0, "tipo": "fotografia_principal"',                  # JSON truncado
+])
+def test_invalid_batch_falls_back_to_one_call_per_image(stub_model, reply):
+    stub_model.batch_replies = [reply]
+    results, stats = classify()
+    assert descriptions(results) == ["imagen a", "imagen b", "imagen c"]
+    assert stats['peticiones'] == 4 and stats['reintentos_individuales'] == 3
+
+
+def test_parse_batch_verdicts_keeps_only_the_expected_fields():
+    text = json.dumps([dict(verdict(1, 'b'), extra='x'), verdict(0, 'a')])
+    assert _parse_batch_verdicts(text, 2) == [
+        {'tipo': 'fotografia_principal', 'es_relevante': True, 'descripcion_ia': "imagen a"},
+        {'tipo': 'fotografia_principal', 'es_relevante': True, 'descripcion_ia': "imagen b"},
+    ]
+    assert _parse_batch_verdicts('{"indice": 0}', 1) is None
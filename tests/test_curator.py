@@ -1,5 +1,14 @@
 # tests/test_curator.py
 
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
 import pytest
 
 # Esta es una prueba "smoke test" muy simple.
@@ -18,3 +27,83 @@ def test_curator_imports_successfully():
 def test_always_passes():
     """Esta prueba siempre debe pasar, confirmando que el test suite se ejecuta."""
     assert True
+
+
+class StubBrowserPool:
+    """Sustituye al AsyncBrowserPool: los `process` simulados no navegan."""
+
+    def __init__(self, log, max_pages):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeCuration:
+    """`process` simulado que registra cuántas URLs de cada host están en curso a la vez."""
+
+    def __init__(self, seconds=0.05, on_start=None):
+        self.seconds, self.on_start = seconds, on_start
+        self.lock = threading.Lock()
+        self.in_flight = Counter()
+        self.peak = Counter()
+        self.done = []
+
+    def __call__(self, url_item, extract):
+        host = urlparse(url_item['url']).hostname
+        with self.lock:
+            self.in_flight[host] += 1
+            self.peak[host] = max(self.peak[host], self.in_flight[host])
+        if self.on_start is not None:
+            self.on_start(url_item)
+        time.sleep(self.seconds)
+        with self.lock:
+            self.in_flight[host] -= 1
+            self.done.append(url_item['id'])
+        return True
+
+
+def run(process, first_batch, claim=lambda: [], concurrency=4, per_host_limit=2):
+    curator = pytest.importorskip("curator")
+    released = []
+    metrics = Counter()
+    asyncio.run(curator.run_concurrent(process, claim, released.extend, first_batch, logging.getLogger("test"), None, None,
+                                       concurrency, per_host_limit, browser_max_pages=1, metrics=metrics))
+    return released, metrics
+
+
+def items(*urls):
+    return [{'id': i, 'url': url} for i, url in enumerate(urls, 1)]
+
+
+def test_run_concurrent_respects_the_per_host_limit(monkeypatch):
+    monkeypatch.setattr("curator.AsyncBrowserPool", StubBrowserPool)
+    batches = [items(*(f"https://a.example/{n}" for n in range(6)), "https://b.example/1", "https://b.example/2"), []]
+    process = FakeCuration()
+    released, metrics = run(process, [], claim=lambda: batches.pop(0))
+
+    assert process.peak == {'a.example': 2, 'b.example': 2}
+    assert sorted(process.done) == list(range(1, 9)) and metrics['procesadas'] == 8
+    assert released == [] and metrics['reclamos'] == 2
+
+
+def test_sigterm_releases_claimed_urls_that_were_not_started(monkeypatch):
+    monkeypatch.setattr("curator.AsyncBrowserPool", StubBrowserPool)
+    stop_sent = threading.Event()
+
+    def stop_on_first(url_item):
+        if not stop_sent.is_set():
+            stop_sent.set()
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    first_batch = items(*(f"https://host{n}.example/nota" for n in range(8)))
+    process = FakeCuration(seconds=0.2, on_start=stop_on_first)
+    released, metrics = run(process, first_batch, claim=lambda: pytest.fail("no debe reclamar tras la señal"), concurrency=2)
+
+    # Las URLs en curso terminan; las que no se tomaron vuelven a 'pendiente'
+    assert 1 <= len(process.done) <= 2
+    assert sorted(process.done + released) == list(range(1, 9))
+    assert metrics['en_curso'] == 0
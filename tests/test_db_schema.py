@@ -0,0 +1,98 @@
+# tests/test_db_schema.py
+"""
+Pruebas de las funciones SQL de db_manager.SCHEMA_SQL contra un Postgres real.
+SCHEMA_SQL borra y recrea las tablas, así que solo se ejecutan si RUNA_TEST_DATABASE_URL apunta a una BD desechable.
+"""
+
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("supabase")
+
+from src.canonical_url import canonicalize_url
+from src.db_manager import SCHEMA_SQL
+
+DATABASE_URL = os.getenv('RUNA_TEST_DATABASE_URL')
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="RUNA_TEST_DATABASE_URL no definida")
+
+
+@pytest.fixture
+def db():
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(SCHEMA_SQL)
+    try:
+        yield cursor
+    finally:
+        conn.close()
+
+
+def call(cursor, function_name: str, **params):
+    """Llama a una RPC con argumentos por nombre, como PostgREST, y devuelve su valor escalar."""
+    arguments = ', '.join(f"{name} => %({name})s" for name in params)
+    cursor.execute(f"SELECT public.{function_name}({arguments})", params)
+    return cursor.fetchone()[0]
+
+
+def enqueue(cursor, url: str) -> int:
+    cursor.execute("INSERT INTO public.urls_para_procesar (url) VALUES (%s) RETURNING id", (url,))
+    return cursor.fetchone()[0]
+
+
+def test_sql_canonical_key_matches_python_mirror(db):
+    for url in (
+        "https://example.org/nota?utm_source=tw&b=2&fbclid=x&a=1&gclid=y",
+        "http://www.example.org/2024/rio-amazonas/amp/",
+        "https://Example.ORG:443/2024/Rio-Amazonas//#comentarios",
+        "https://example.org:8080/nota?&&id=3",
+        "  https://amp.example.org/?amp=1  ",
+    ):
+        assert call(db, 'canonicalizar_url', p_url=url) == canonicalize_url(url), url
+
+
+def test_enqueue_ignores_urls_whose_key_changed_after_resolving_rel_canonical(db):
+    url_id = enqueue(db, "https://example.org/nota?id=7")
+    assert call(db, 'resolver_url_canonica', p_url_id=url_id, p_url_canonica="https://example.org/2024/nota-7") is None
+    db.execute("SELECT url_canonica FROM public.urls_para_procesar WHERE id = %s", (url_id,))
+    assert db.fetchone()[0] != canonicalize_url("https://example.org/nota?id=7")
+
+    # La misma URL literal (conflicto en url, no en url_canonica), una variante de la canónica y una nueva
+    new_count = call(db, 'encolar_urls', p_urls=[
+        "https://example.org/nota?id=7", "https://www.example.org/2024/nota-7/", "https://example.org/otra",
+    ])
+    assert new_count == 1
+    db.execute("SELECT url FROM public.urls_para_procesar ORDER BY id")
+    assert [row[0] for row in db.fetchall()] == ["https://example.org/nota?id=7", "https://example.org/otra"]
+
+
+def test_only_the_lease_owner_can_write_a_claimed_url(db):
+    url_id = enqueue(db, "https://example.org/nota")
+    other_id = enqueue(db, "https://example.org/otra")
+    # Fila dejada 'en_proceso' por un worker anterior a los leases: sin lease_expira, sigue siendo reclamable
+    db.execute("UPDATE public.urls_para_procesar SET estado = 'en_proceso', lease_expira = NULL WHERE id = %s", (other_id,))
+    db.execute("SELECT id FROM public.reclamar_urls(p_worker_id => 'w1', p_limite => 2, p_lease_segundos => 60)")
+    assert sorted(row[0] for row in db.fetchall()) == [url_id, other_id]
+    assert call(db, 'iniciar_curacion', p_url_id=url_id, p_url="https://example.org/nota", p_worker_id='w1') is not None
+
+    # El lease de w1 caduca y w2 reclama la URL
+    db.execute("UPDATE public.urls_para_procesar SET lease_expira = now() - interval '1 second' WHERE id = %s", (url_id,))
+    db.execute("SELECT id FROM public.reclamar_urls(p_worker_id => 'w2', p_limite => 1, p_lease_segundos => 60)")
+    assert db.fetchall() == [(url_id,)]
+    asset_id = call(db, 'iniciar_curacion', p_url_id=url_id, p_url="https://example.org/nota", p_worker_id='w2')
+
+    # Las llamadas tardías de w1 no tocan nada
+    assert call(db, 'iniciar_curacion', p_url_id=url_id, p_url="https://example.org/nota", p_worker_id='w1') is None
+    assert call(db, 'resolver_url_canonica', p_url_id=url_id, p_url_canonica="https://example.org/otra", p_worker_id='w1') is None
+    assert call(db, 'fallar_curacion', p_url_id=url_id, p_asset_id=asset_id, p_error='tarde', p_worker_id='w1') is False
+    assert call(db, 'finalizar_curacion', p_url_id=url_id, p_asset_id=asset_id, p_metadatos='{}', p_imagenes='[]', p_worker_id='w1') is False
+    db.execute("SELECT estado FROM public.urls_para_procesar WHERE id = %s", (url_id,))
+    assert db.fetchone()[0] == 'en_proceso'
+    db.execute("SELECT id, estado_curacion FROM public.activos WHERE source_url_id = %s", (url_id,))
+    assert db.fetchall() == [(asset_id, 'iniciado')]
+
+    assert call(db, 'finalizar_curacion', p_url_id=url_id, p_asset_id=asset_id, p_metadatos='{"titulo": "t"}', p_imagenes='[]', p_worker_id='w2') is True
+    db.execute("SELECT u.estado, a.titulo FROM public.urls_para_procesar u JOIN public.activos a ON a.source_url_id = u.id WHERE u.id = %s", (url_id,))
+    assert db.fetchone() == ('completado', 't')
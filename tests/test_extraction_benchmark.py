@@ -0,0 +1,38 @@
+# tests/test_extraction_benchmark.py
+
+import copy
+
+from benchmarks.extraction import compare
+
+BASELINE = {
+    'nota.html': {
+        'tiempos_ms': {'arbol': 10.0, 'contenedor': 1.0, 'total': 12.0},
+        'memoria_pico_kb': 1000.0,
+        'candidatos': {'img': 7, 'scripts': 3},
+        'imagenes': ['https://a.org/1.jpg'],
+    }
+}
+
+
+def test_noise_within_tolerance_or_absolute_floor_is_not_a_regression():
+    result = copy.deepcopy(BASELINE)
+    result['nota.html']['tiempos_ms'].update(arbol=14.0, contenedor=2.5)  # +40 % y +1.5 ms
+    result['nota.html']['memoria_pico_kb'] = 1200.0
+    assert compare(result, BASELINE, tolerance=0.5) == []
+
+
+def test_slower_phases_more_memory_and_changed_output_are_reported():
+    result = copy.deepcopy(BASELINE)
+    result['nota.html']['tiempos_ms']['arbol'] = 25.0
+    result['nota.html']['memoria_pico_kb'] = 2000.0
+    result['nota.html']['candidatos']['img'] = 8
+    result['nota.html']['imagenes'] = []
+
+    regressions = compare(result, BASELINE, tolerance=0.5)
+
+    assert len(regressions) == 4
+    assert any("fase 'arbol'" in regression for regression in regressions)
+
+
+def test_fixtures_without_baseline_are_ignored():
+    assert compare({'nueva.html': BASELINE['nota.html']}, BASELINE) == []
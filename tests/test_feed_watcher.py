@@ -0,0 +1,42 @@
+# tests/test_feed_watcher.py
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("feedparser")
+pytest.importorskip("dotenv")
+
+import feed_watcher
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Feed de prueba</title>
+<item><guid>n3</guid><link>https://ejemplo.org/n3</link><title>3</title></item>
+<item><guid>n2</guid><link>https://ejemplo.org/n2</link><title>2</title></item>
+<item><guid>n1</guid><link>https://ejemplo.org/n1</link><title>1</title></item>
+</channel></rss>"""
+
+
+def _client(seen_headers):
+    def handler(request):
+        seen_headers.append(dict(request.headers))
+        if request.headers.get('if-none-match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=RSS, headers={'ETag': '"v1"', 'Last-Modified': 'Fri, 16 Oct 2026 10:00:00 GMT'})
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def test_only_entries_newer_than_last_seen_are_returned():
+    seen = []
+    entries, state = feed_watcher.fetch_feed(_client(seen), 'https://ejemplo.org/feed', {'ultimo_id_entrada': 'n2'})
+
+    assert [entry.link for entry in entries] == ['https://ejemplo.org/n3']
+    assert state['etag'] == '"v1"'
+    assert state['ultimo_id_entrada'] == 'n3'
+
+
+def test_conditional_get_returns_nothing_when_unchanged():
+    seen = []
+    entries, state = feed_watcher.fetch_feed(_client(seen), 'https://ejemplo.org/feed', {'etag': '"v1"', 'last_modified': 'x'})
+
+    assert (entries, state) == ([], None)
+    assert seen[0]['if-none-match'] == '"v1"' and seen[0]['if-modified-since'] == 'x'
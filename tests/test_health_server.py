@@ -0,0 +1,33 @@
+# tests/test_health_server.py
+
+import json
+import logging
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.health_server import HealthServer
+
+
+def _get(port, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read() or b'null')
+
+
+def test_healthz_follows_snapshot_and_metrics_expose_it():
+    state = {'sano': True, 'procesadas': 3}
+    server = HealthServer(logging.getLogger("test"), 0, lambda: dict(state), host='127.0.0.1')
+    server.start()
+    try:
+        assert _get(server.port, '/healthz') == (200, {'sano': True})
+        assert _get(server.port, '/metrics') == (200, {'sano': True, 'procesadas': 3})
+        state['sano'] = False
+        assert _get(server.port, '/healthz') == (503, {'sano': False})
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"http://127.0.0.1:{server.port}/otra", timeout=5)
+    finally:
+        server.close()
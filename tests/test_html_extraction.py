@@ -0,0 +1,61 @@
+# tests/test_html_extraction.py
+
+import pytest
+
+pytest.importorskip("bs4")
+
+from benchmarks.container_selection import legacy_select_main_container
+from src.html_extraction import PARSER_BACKENDS, available_parser, make_soup, scan_document, script_image_urls, select_main_container
+
+CASES = [
+    # Empate de longitud: gana el selector anterior aunque aparezca después en el documento
+    '<div class="post">abcd</div><article>abcd</article>',
+    # Anidados: el contenedor exterior suma el texto de los interiores
+    '<main><div class="content">uno <b>dos</b></div><div id="body-x">tres</div></main>',
+    # Comentarios, <script> y <style> no cuentan como texto
+    '<div class="post-a"><!-- comentario largo --><script>var x = 1;</script><style>p{}</style>hola</div><div class="post-b">hola!</div>',
+    # Un mismo <div> coincide con varios selectores; uno sin texto no se elige
+    '<div class="content body" id="post">  texto  </div><article>   </article>',
+    '<p>sin candidatos</p>',
+]
+
+
+def soup_with(html_content: str, parser: str):
+    """Sopa con `parser`; la prueba se omite si su dependencia (lxml) no está instalada."""
+    if available_parser(parser) != parser:
+        pytest.skip(f"Parser '{parser}' no instalado")
+    return make_soup(html_content, parser)
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+@pytest.mark.parametrize('html_content', CASES)
+def test_single_pass_matches_selector_loop(html_content, parser):
+    soup = soup_with(html_content, parser)
+    candidates, _ = scan_document(soup)
+    assert select_main_container(candidates) == legacy_select_main_container(soup)
+
+
+@pytest.mark.parametrize('parser', PARSER_BACKENDS)
+def test_single_pass_matches_selector_loop_on_saved_page(parser):
+    with open('tests/fixtures/html/ojo_publico.html', encoding='utf-8') as f:
+        soup = soup_with(f.read(), parser)
+    candidates, scripts = scan_document(soup)
+    assert select_main_container(candidates) == legacy_select_main_container(soup)
+    assert scripts == soup.find_all('script')
+
+
+def test_lxml_selects_the_same_container_as_html_parser():
+    with open('tests/fixtures/html/ojo_publico.html', encoding='utf-8') as f:
+        html_content = f.read()
+    results = {}
+    for parser in PARSER_BACKENDS:
+        candidates, scripts = scan_document(soup_with(html_content, parser))
+        container, length = select_main_container(candidates)
+        results[parser] = (container.name, container.get_text(), length,
+                           [url for script in scripts for url in script_image_urls(script.get_text())])
+    assert results['lxml'] == results['html.parser']
+
+
+def test_script_scan_skips_scripts_without_image_urls():
+    assert script_image_urls('var a = "https://x.org/api";') == []
+    assert script_image_urls('{"img": "https://x.org/a/b.webp"}') == ['https://x.org/a/b.webp']
@@ -0,0 +1,77 @@
+# tests/test_http_client.py
+
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src import http_client
+from src.http_client import HttpClient
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(http_client.time, 'sleep', lambda seconds: None)
+
+
+def test_transient_errors_are_retried():
+    attempts = []
+
+    def handler(request):
+        attempts.append(request.url.path)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("conexión rechazada", request=request)
+        if len(attempts) == 2:
+            return httpx.Response(503, headers={'Retry-After': '1'})
+        return httpx.Response(200, content=b'ok')
+
+    client = HttpClient(logging.getLogger("test"), transport=httpx.MockTransport(handler))
+    assert client.get("https://cdn.example/a.jpg").content == b'ok'
+    assert len(attempts) == 3
+    assert client.counters['reintentos:ConnectError'] == 1 and client.counters['reintentos:http_503'] == 1
+
+
+def test_gives_up_after_max_retries():
+    def handler(request):
+        raise httpx.ReadTimeout("lento", request=request)
+
+    client = HttpClient(logging.getLogger("test"), max_retries=1, transport=httpx.MockTransport(handler))
+    with pytest.raises(httpx.ReadTimeout):
+        client.get("https://cdn.example/a.jpg")
+    assert client.counters['errores'] == 1
+    # Un 404 no es transitorio: se devuelve sin reintentar
+    not_found = HttpClient(logging.getLogger("test"), transport=httpx.MockTransport(lambda request: httpx.Response(404)))
+    assert not_found.get("https://cdn.example/b.jpg").status_code == 404
+    assert not_found.counters['peticiones'] == 1
+
+
+def test_images_from_the_same_host_reuse_one_connection():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            body = self.path.encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = HttpClient(logging.getLogger("test"), http2=False)
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        assert [client.get(f"{base}/img/{i}.jpg").text for i in range(3)] == [f"/img/{i}.jpg" for i in range(3)]
+        with client.stream('GET', f"{base}/img/3.jpg") as response:
+            assert response.read() == b'/img/3.jpg'
+    finally:
+        client.close()
+        server.shutdown()
+    assert client.counters['conexiones_nuevas'] == 1
+    assert client.counters['conexiones_reutilizadas'] == 3
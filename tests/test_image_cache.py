@@ -0,0 +1,40 @@
+# tests/test_image_cache.py
+
+import logging
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.image_cache import ImageCache
+
+
+def _cache_with_transport(requests_seen, **kwargs):
+    def handler(request):
+        requests_seen.append(str(request.url))
+        return httpx.Response(200, content=str(request.url).encode() * 100, headers={'content-type': 'image/jpeg'})
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    return ImageCache(logging.getLogger("test"), client=client, **kwargs)
+
+
+def test_each_image_crosses_the_network_once():
+    requests_seen = []
+    cache = _cache_with_transport(requests_seen)
+    first = cache.get("https://cdn.example/a.jpg")
+    second = cache.get("https://cdn.example/a.jpg")
+    assert requests_seen == ["https://cdn.example/a.jpg"]
+    assert first.sha256 == second.sha256
+    assert cache.counters['aciertos_memoria'] == 1
+    assert cache.counters['bytes_ahorrados'] == len(first.data)
+    cache.close()
+
+
+def test_evicted_images_are_served_from_disk():
+    requests_seen = []
+    cache = _cache_with_transport(requests_seen, max_memory_bytes=3000)
+    a = cache.get("https://cdn.example/a.jpg")
+    cache.get("https://cdn.example/b.jpg")
+    assert cache.get("https://cdn.example/a.jpg").data == a.data
+    assert cache.counters['aciertos_disco'] == 1
+    assert len(requests_seen) == 2
+    cache.close()
@@ -0,0 +1,81 @@
+# tests/test_image_derivatives.py
+
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from benchmarks.fakes import FakeSupabase
+from src.asset_storage import AssetStorage
+from src.image_derivatives import MAX_BYTES_PER_WIDTH_PIXEL, DerivativeGenerator, available_formats, encode_derivatives
+
+
+def make_jpeg(width: int, height: int) -> bytes:
+    image = Image.new('RGB', (width, height))
+    image.putdata([((x * 7) % 256, (y * 3) % 256, (x * y) % 256) for y in range(height) for x in range(width)])
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=95)
+    return buffer.getvalue()
+
+
+def test_encode_skips_upscaling_and_caps_size():
+    formats = {'webp': (90, 50)}
+    variants = encode_derivatives(make_jpeg(800, 400), (320, 640, 1280), formats)
+    assert [(v['ancho'], v['alto']) for v in variants] == [(320, 160), (640, 320)]
+    for variant in variants:
+        assert Image.open(io.BytesIO(variant['data'])).format == 'WEBP'
+        assert len(variant['data']) <= variant['ancho'] * MAX_BYTES_PER_WIDTH_PIXEL or variant['calidad'] == 50
+
+    # Más pequeña que todos los anchos: se transcodifica a su tamaño original
+    assert [v['ancho'] for v in encode_derivatives(make_jpeg(200, 100), (320, 640), formats)] == [200]
+
+
+def test_generator_uploads_variants_under_original_prefix():
+    if not available_formats():
+        pytest.skip("Pillow sin soporte WebP/AVIF")
+    fake = FakeSupabase()
+    generator = DerivativeGenerator(logging.getLogger("test"), AssetStorage(logging.getLogger("test"), fake), workers=1, widths=(320,))
+    try:
+        records = generator.generate(make_jpeg(640, 480), 'ab' * 32)
+        assert generator.generate(make_jpeg(640, 480), 'ab' * 32) == records
+    finally:
+        generator.close()
+    assert {record['formato'] for record in records} == set(available_formats())
+    assert all(record['ruta'].startswith(f"sha256/ab/{'ab' * 32}/v1-w320.") for record in records)
+    # Las variantes más su manifiesto
+    assert len(fake.objects) == len(records) + 1 and generator.counters['reutilizadas'] == 1
+
+
+def test_next_run_reuses_variants_from_storage_without_encoding():
+    if not available_formats():
+        pytest.skip("Pillow sin soporte WebP/AVIF")
+    fake = FakeSupabase()
+    data, sha256 = make_jpeg(640, 480), 'cd' * 32
+    first = DerivativeGenerator(logging.getLogger("test"), AssetStorage(logging.getLogger("test"), fake), workers=1, widths=(320,))
+    try:
+        records = first.generate(data, sha256)
+    finally:
+        first.close()
+    uploads = fake.storage_calls['upload']
+
+    next_run = DerivativeGenerator(logging.getLogger("test"), AssetStorage(logging.getLogger("test"), fake), workers=1, widths=(320,))
+    assert next_run.generate(data, sha256) == records
+    assert next_run._executor is None and fake.storage_calls['upload'] == uploads
+    assert next_run.counters['desde_storage'] == 1 and next_run.counters['imagenes'] == 0
+
+
+def test_concurrent_calls_for_the_same_image_encode_once():
+    if not available_formats():
+        pytest.skip("Pillow sin soporte WebP/AVIF")
+    generator = DerivativeGenerator(logging.getLogger("test"), AssetStorage(logging.getLogger("test"), FakeSupabase()), workers=1, widths=(320,))
+    data = make_jpeg(640, 480)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as threads:
+            results = list(threads.map(lambda _: generator.generate(data, 'ef' * 32), range(4)))
+    finally:
+        generator.close()
+    assert all(result == results[0] for result in results) and results[0]
+    assert generator.counters['imagenes'] == 1 and generator.counters['reutilizadas'] == 3
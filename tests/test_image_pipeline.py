@@ -0,0 +1,59 @@
+# tests/test_image_pipeline.py
+
+import argparse
+import logging
+import threading
+import time
+
+import pytest
+
+from src.image_pipeline import ImagePipeline, parse_stage_workers
+
+
+def test_results_keep_order_and_failures_stay_isolated():
+    pipeline = ImagePipeline(logging.getLogger("test"), stage_workers={'analisis': 4, 'subida': 2})
+
+    def analyze(i, url):
+        time.sleep(0.01 * (5 - i))  # las primeras imágenes terminan las últimas
+        return None if url.endswith('logo.png') else url
+
+    def upload(i, url):
+        if url.endswith('rota.jpg'):
+            raise RuntimeError("fallo de red")
+        return {'url_original_imagen': url, 'orden_aparicion': i}
+
+    urls = ['a.jpg', 'logo.png', 'rota.jpg', 'b.jpg', 'c.jpg']
+    rows, stats = pipeline.run(urls, [('analisis', analyze), ('subida', upload)])
+    pipeline.close()
+
+    assert rows == [{'url_original_imagen': 'a.jpg', 'orden_aparicion': 0}, None, None,
+                    {'url_original_imagen': 'b.jpg', 'orden_aparicion': 3}, {'url_original_imagen': 'c.jpg', 'orden_aparicion': 4}]
+    assert stats['analisis']['procesadas'] == 5
+    assert stats['subida']['procesadas'] == 4 and stats['subida']['fallidas'] == 1
+
+
+def test_stages_run_images_in_parallel():
+    pipeline = ImagePipeline(logging.getLogger("test"), stage_workers={'descarga': 5})
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def download(i, url):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return url
+
+    pipeline.run([f'{i}.jpg' for i in range(5)], [('descarga', download)])
+    pipeline.close()
+    assert peak[0] > 1
+
+
+def test_parse_stage_workers():
+    assert parse_stage_workers('descarga=8')['descarga'] == 8
+    assert parse_stage_workers('')['analisis'] == 4
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_stage_workers('subida=0')
+    with pytest.raises(argparse.ArgumentTypeError, match='analize'):
+        parse_stage_workers('analize=4')
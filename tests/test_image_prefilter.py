@@ -0,0 +1,51 @@
+# tests/test_image_prefilter.py
+
+import logging
+import struct
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.image_cache import ImageCache
+from src.image_prefilter import ImagePrefilter, read_image_size, resize_variant_key
+
+
+def test_reads_dimensions_from_header_bytes():
+    png = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', 1200, 800)
+    gif = b'GIF89a' + struct.pack('<HH', 1, 1)
+    jpeg = b'\xff\xd8' + b'\xff\xe0\x00\x04\x00\x00' + b'\xff\xc0\x00\x11\x08' + struct.pack('>HH', 683, 1024)
+    webp = b'RIFF\x00\x00\x00\x00WEBPVP8X' + b'\x00' * 8 + (639).to_bytes(3, 'little') + (479).to_bytes(3, 'little')
+    assert read_image_size(png) == (1200, 800)
+    assert read_image_size(gif) == (1, 1)
+    assert read_image_size(jpeg) == (1024, 683)
+    assert read_image_size(webp) == (640, 480)
+    assert read_image_size(b'<html>') is None
+
+
+def test_resized_variants_share_a_key():
+    original = "https://imgs.mongabay.com/wp-content/uploads/2024/05/rio.jpg"
+    assert resize_variant_key("https://imgs.mongabay.com/wp-content/uploads/2024/05/rio-768x512.jpg") == resize_variant_key(original)
+    assert resize_variant_key("https://imgs.mongabay.com/wp-content/uploads/2024/05/rio.jpg?w=300&ssl=1") == resize_variant_key(original)
+    assert resize_variant_key("https://imgs.mongabay.com/wp-content/uploads/2024/05/selva.jpg") != resize_variant_key(original)
+
+
+def test_each_candidate_is_fetched_once():
+    """La imagen que supera el prefiltro no se vuelve a descargar para la Capa 3."""
+    requests_seen = []
+    png = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\rIHDR' + struct.pack('>II', 1200, 800) + b'\x00' * 2000
+
+    def handler(request):
+        requests_seen.append(str(request.url))
+        # Servidor que ignora Range: la respuesta ya trae la imagen completa
+        return httpx.Response(200, content=png, headers={'content-type': 'image/png'})
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    cache = ImageCache(logging.getLogger("test"), client=client)
+    prefilter = ImagePrefilter(logging.getLogger("test"), client=client)
+    try:
+        assert prefilter.filter(["https://cdn.example/rio.png"], image_cache=cache) == ["https://cdn.example/rio.png"]
+        assert cache.get("https://cdn.example/rio.png").data == png
+    finally:
+        cache.close()
+    assert requests_seen == ["https://cdn.example/rio.png"]
@@ -0,0 +1,84 @@
+# tests/test_load_harness.py
+
+import json
+import struct
+import urllib.request
+
+from benchmarks.curator_load import percentile
+from benchmarks.fakes import FakeSupabase, FixtureServer, StubVisionModel
+
+
+def test_fake_queue_claims_each_url_once_and_records_latency():
+    fake = FakeSupabase()
+    fake.enqueue(['http://a/1', 'http://a/2', 'http://a/3'])
+
+    first = fake.rpc('reclamar_urls', {'p_worker_id': 'w1', 'p_limite': 2, 'p_lease_segundos': 60}).execute().data
+    second = fake.rpc('reclamar_urls', {'p_worker_id': 'w2', 'p_limite': 2, 'p_lease_segundos': 60}).execute().data
+    assert [row['id'] for row in first] == [1, 2] and [row['id'] for row in second] == [3]
+
+    asset_id = fake.rpc('iniciar_curacion', {'p_url_id': 1, 'p_url': 'http://a/1'}).execute().data
+    fake.rpc('finalizar_curacion', {'p_url_id': 1, 'p_asset_id': asset_id, 'p_metadatos': {'titulo': 't'},
+                                    'p_imagenes': [{'orden_aparicion': 0}]}).execute()
+    fake.rpc('liberar_urls', {'p_worker_id': 'w1', 'p_ids': [2]}).execute()
+
+    assert fake.states() == {'completado': 1, 'pendiente': 1, 'en_proceso': 1}
+    assert len(fake.latencies()) == 1 and fake.images == [{'orden_aparicion': 0, 'asset_id': asset_id}]
+    assert sum(fake.round_trips.values()) == 5
+
+
+def test_stub_vision_model_answers_single_and_batch_prompts():
+    StubVisionModel.configure(relevant_ratio=1.0)
+    model = StubVisionModel('modelo')
+    image = {'mime_type': 'image/png', 'data': b'abc'}
+
+    single = json.loads(model.generate_content(['sistema', 'usuario', image]).text)
+    batch = json.loads(model.generate_content(['sistema', 'lote', 'Imagen 0:', image, 'Imagen 1:', image]).text)
+
+    assert single['es_relevante'] is True
+    assert [verdict['indice'] for verdict in batch] == [0, 1]
+    assert StubVisionModel.counters['imagenes'] == 3
+
+
+def test_fixture_server_serves_articles_and_sized_images():
+    server = FixtureServer(images_per_article=2)
+    server.start()
+    try:
+        html = urllib.request.urlopen(server.article_url(5), timeout=5).read().decode('utf-8')
+        image = urllib.request.urlopen(f"{server.base_url}/img/a5-0.png", timeout=5).read()
+        pixel = urllib.request.urlopen(f"{server.base_url}/img/pixel-5.png", timeout=5).read()
+    finally:
+        server.close()
+
+    assert '/img/a5-1.png' in html and '/img/a5-2.png' not in html
+    assert struct.unpack('>II', image[16:24]) == (400, 300)
+    assert struct.unpack('>II', pixel[16:24]) == (1, 1)
+
+
+def test_percentile_uses_nearest_rank():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3, 1, 2, 4], 0.5) == 2
+    assert percentile(list(range(1, 101)), 0.99) == 99
+
+
+def test_fake_queue_leases_follow_their_owner():
+    fake = FakeSupabase()
+    fake.enqueue(['http://a/1', 'http://a/2'])
+    # Fila dejada 'en_proceso' por un worker anterior a los leases: sin lease_expira, sigue siendo reclamable
+    fake.urls[2].update(estado='en_proceso', lease_expira=None)
+
+    claimed = fake.rpc('reclamar_urls', {'p_worker_id': 'w1', 'p_limite': 2, 'p_lease_segundos': 60}).execute().data
+    assert [row['id'] for row in claimed] == [1, 2]
+    assert fake.rpc('renovar_leases', {'p_worker_id': 'w1', 'p_lease_segundos': 60}).execute().data == 2
+
+    # El lease de w1 caduca y w2 reclama la URL: el resultado tardío de w1 ya no se aplica
+    fake.urls[1]['lease_expira'] = 0
+    assert [row['id'] for row in fake.rpc('reclamar_urls', {'p_worker_id': 'w2', 'p_limite': 1}).execute().data] == [1]
+    asset_id = fake.rpc('iniciar_curacion', {'p_url_id': 1, 'p_url': 'http://a/1', 'p_worker_id': 'w2'}).execute().data
+    # w1 ya no puede borrar el activo de w2 ni marcar la URL como duplicado
+    assert fake.rpc('iniciar_curacion', {'p_url_id': 1, 'p_url': 'http://a/1', 'p_worker_id': 'w1'}).execute().data is None
+    assert fake.rpc('resolver_url_canonica', {'p_url_id': 1, 'p_url_canonica': 'http://a/2', 'p_worker_id': 'w1'}).execute().data is None
+    assert asset_id in fake.assets and fake.urls[1]['estado'] == 'en_proceso'
+    assert fake.rpc('finalizar_curacion', {'p_url_id': 1, 'p_asset_id': asset_id, 'p_metadatos': {}, 'p_imagenes': [],
+                                           'p_worker_id': 'w2'}).execute().data is True
+    assert fake.rpc('fallar_curacion', {'p_url_id': 1, 'p_asset_id': None, 'p_error': 'tarde', 'p_worker_id': 'w1'}).execute().data is False
+    assert fake.urls[1]['estado'] == 'completado'
@@ -0,0 +1,87 @@
+# tests/test_logger.py
+
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+import pytest
+
+from src.image_pipeline import ImagePipeline
+from src.utils import logger as runa_logger
+
+
+def _queue_logger(name):
+    """Logger con el QueueHandler del modo 'cola' y un listener que escribe JSON en memoria."""
+    log_queue = queue.SimpleQueue()
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(json.loads(self.format(record)))
+
+    collector = Collect()
+    collector.setFormatter(runa_logger.JsonFormatter())
+    listener = logging.handlers.QueueListener(log_queue, collector)
+    handler = runa_logger._BackgroundQueueHandler(log_queue)
+    handler.addFilter(runa_logger.ContextFilter())
+    log = logging.getLogger(name)
+    log.handlers = [handler]
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    listener.start()
+    return log, listener, records
+
+
+def test_queue_mode_emits_json_with_lazy_args_and_correlation_ids():
+    log, listener, records = _queue_logger("test-logger-cola")
+    token = runa_logger.bind_log_context(url_id=7)
+    runa_logger.bind_log_context(asset_id=42)
+    stats = {'peticiones': 1}
+    log.info("Visión: %d peticiones", stats['peticiones'])
+    runa_logger.reset_log_context(token)
+    log.warning("fuera de contexto")
+    listener.stop()
+
+    assert records[0]['mensaje'] == "Visión: 1 peticiones"
+    assert records[0]['url_id'] == 7 and records[0]['asset_id'] == 42 and records[0]['nivel'] == 'INFO'
+    assert 'url_id' not in records[1]
+
+
+def test_queue_mode_formats_messages_in_the_listener_thread():
+    log, listener, records = _queue_logger("test-logger-hilo")
+    formatted_in = []
+
+    class Probe:
+        def __str__(self):
+            formatted_in.append(threading.current_thread())
+            return "sonda"
+
+    log.info("valor: %s", Probe())
+    listener.stop()
+
+    assert records[0]['mensaje'] == "valor: sonda"
+    assert formatted_in and threading.current_thread() not in formatted_in
+
+
+def test_image_pipeline_stages_inherit_the_article_context():
+    log, listener, records = _queue_logger("test-logger-pipeline")
+    pipeline = ImagePipeline(log, stage_workers={'analisis': 2})
+    token = runa_logger.bind_log_context(url_id=3)
+
+    def analyze(i, url):
+        log.info("analizando %s", url)
+        return url
+
+    pipeline.run(['a.jpg', 'b.jpg'], [('analisis', analyze)])
+    pipeline.close()
+    runa_logger.reset_log_context(token)
+    listener.stop()
+
+    assert sorted((record['url_id'], record['imagen']) for record in records) == [(3, 0), (3, 1)]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        runa_logger.get_logger("test-logger-modo", mode='asincrono')
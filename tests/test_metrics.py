@@ -0,0 +1,72 @@
+# tests/test_metrics.py
+
+import json
+import logging
+
+from src.image_pipeline import ImagePipeline
+from src.metrics import NULL_METRICS, Metrics
+
+
+def test_spans_and_counters_aggregate_per_label_set():
+    metrics = Metrics()
+    for seconds in (0.5, 1.5):
+        metrics.observe('fase', seconds, fase='navegacion')
+    with metrics.span('fase', fase='parseo'):
+        pass
+    metrics.incr('imagenes', 3, etapa='extraidas')
+    metrics.incr('imagenes', 2, etapa='extraidas')
+    metrics.add_counters('prefiltro', {'evaluadas': 4, 'rechazo:pequena': 1}, 'evento')
+
+    summary = metrics.summary()
+    durations = {record['etiquetas']['fase']: record for record in summary['duraciones']}
+    assert durations['navegacion']['n'] == 2 and durations['navegacion']['suma'] == 2.0 and durations['navegacion']['max'] == 1.5
+    assert durations['parseo']['n'] == 1
+    counters = {(record['nombre'], tuple(record['etiquetas'].values())): record['valor'] for record in summary['contadores']}
+    assert counters[('imagenes', ('extraidas',))] == 5
+    assert counters[('prefiltro', ('rechazo:pequena',))] == 1
+
+
+def test_disabled_metrics_record_nothing_and_return_the_original_callable():
+    def claim():
+        return ['url']
+
+    assert NULL_METRICS.timed(claim, 'fase', fase='reclamo') is claim
+    with NULL_METRICS.span('fase', fase='parseo'):
+        NULL_METRICS.incr('imagenes', etapa='extraidas')
+    summary = NULL_METRICS.summary()
+    assert summary['contadores'] == [] and summary['duraciones'] == []
+
+
+def test_exports_json_lines_and_prometheus_text(tmp_path):
+    metrics = Metrics()
+    metrics.incr('imagenes', 2, etapa='capa3_aprobadas')
+    metrics.observe('url', 0.25, resultado='curada')
+
+    path = tmp_path / 'metricas.jsonl'
+    metrics.write(str(path), 'jsonl', run_id='worker-1')
+    metrics.write(str(path), 'jsonl', run_id='worker-1')
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [record['tipo'] for record in records] == ['contador', 'duracion', 'resumen'] * 2
+    assert records[0] == {'ejecucion': 'worker-1', 'tipo': 'contador', 'nombre': 'imagenes', 'etiquetas': {'etapa': 'capa3_aprobadas'}, 'valor': 2}
+
+    text = metrics.to_prometheus()
+    assert '# TYPE runa_imagenes_total counter\nruna_imagenes_total{etapa="capa3_aprobadas"} 2\n' in text
+    assert 'runa_url_segundos_sum{resultado="curada"} 0.250000' in text
+    assert 'runa_url_segundos_count{resultado="curada"} 1' in text
+    assert 'runa_url_segundos_max{resultado="curada"} 0.250000' in text
+
+
+def test_image_pipeline_reports_each_stage_run():
+    metrics = Metrics()
+    pipeline = ImagePipeline(logging.getLogger("test"), metrics=metrics)
+
+    def upload(i, url):
+        if url == 'rota.jpg':
+            raise RuntimeError("fallo de red")
+        return url
+
+    pipeline.run(['a.jpg', 'rota.jpg'], [('analisis', lambda i, url: url), ('subida', upload)])
+    pipeline.close()
+
+    runs = {tuple(record['etiquetas'].values()): record['n'] for record in metrics.summary()['duraciones']}
+    assert runs == {('analisis', 'ok'): 2, ('subida', 'ok'): 1, ('subida', 'error'): 1}
@@ -0,0 +1,101 @@
+# tests/test_page_readiness.py
+
+import asyncio
+import logging
+import time
+
+from src import page_readiness
+from src.page_readiness import HostStats, PageReadiness, _ScrollTracker
+
+
+def test_scroll_stops_when_dom_stops_gaining_images():
+    """El scroll se detiene tras STABLE_ROUNDS pasos sin nuevas imágenes."""
+    tracker = _ScrollTracker()
+    assert tracker.update({'imgs': 5, 'lazy': 2, 'bottom': False})
+    assert tracker.update({'imgs': 8, 'lazy': 2, 'bottom': False})
+    keep_going = True
+    rounds = 0
+    while keep_going:
+        keep_going = tracker.update({'imgs': 8, 'lazy': 2, 'bottom': False})
+        rounds += 1
+    assert rounds == page_readiness.STABLE_ROUNDS
+    assert tracker.grew
+
+
+def test_scroll_stops_at_bottom_of_static_page():
+    tracker = _ScrollTracker()
+    assert tracker.update({'imgs': 3, 'lazy': 0, 'bottom': False})
+    assert not tracker.update({'imgs': 3, 'lazy': 0, 'bottom': True})
+    assert not tracker.grew
+
+
+def test_host_becomes_static_after_clean_visits(tmp_path):
+    stats = HostStats(path=str(tmp_path / 'host_stats.json'))
+    for _ in range(page_readiness.STATIC_AFTER_VISITS):
+        assert not stats.is_static('es.mongabay.com')
+        stats.record('es.mongabay.com', saw_challenge=False, grew=False, probed=True)
+    assert stats.is_static('es.mongabay.com')
+
+    stats.save()
+    assert HostStats(path=str(tmp_path / 'host_stats.json')).is_static('es.mongabay.com')
+
+
+def test_host_with_challenge_is_never_static():
+    stats = HostStats(path=None)
+    stats.record('ojo-publico.com', saw_challenge=True, grew=False, probed=True)
+    for _ in range(page_readiness.STATIC_AFTER_VISITS):
+        stats.record('ojo-publico.com', saw_challenge=False, grew=False, probed=True)
+    assert not stats.is_static('ojo-publico.com')
+
+
+class NeverClearingChallengePage:
+    """Página falsa cuyo reto nunca se resuelve; networkidle nunca llega."""
+
+    def __init__(self):
+        self.load_state_timeouts = []
+
+    def evaluate(self, script, *args):
+        if script == page_readiness.CHALLENGE_JS:
+            return True
+        return {'imgs': 0, 'lazy': 0, 'bottom': True}
+
+    def wait_for_timeout(self, ms):
+        time.sleep(0.01)
+
+    def wait_for_load_state(self, state, timeout):
+        self.load_state_timeouts.append(timeout)
+        if not timeout:
+            raise AssertionError("timeout=0 en Playwright significa esperar sin límite")
+
+
+class AsyncNeverClearingChallengePage(NeverClearingChallengePage):
+    async def evaluate(self, script, *args):
+        return super().evaluate(script, *args)
+
+    async def wait_for_timeout(self, ms):
+        await asyncio.sleep(0.01)
+
+    async def wait_for_load_state(self, state, timeout):
+        super().wait_for_load_state(state, timeout)
+
+
+def test_challenge_that_never_clears_stays_within_budget():
+    readiness = PageReadiness(logging.getLogger("test"), budget_seconds=0.05)
+    page, timings = NeverClearingChallengePage(), {}
+    readiness.wait(page, 'https://reto.example/articulo', timings)
+    assert all(timeout >= 1 for timeout in page.load_state_timeouts)
+    assert timings['reto'] < 1
+
+    async_page, timings = AsyncNeverClearingChallengePage(), {}
+    asyncio.run(readiness.wait_async(async_page, 'https://reto.example/articulo', timings))
+    assert all(timeout >= 1 for timeout in async_page.load_state_timeouts)
+    assert timings['reto'] < 1
+
+
+def test_host_stats_are_saved_periodically(tmp_path):
+    path = str(tmp_path / 'host_stats.json')
+    stats = HostStats(path=path, save_interval=0)
+    for _ in range(page_readiness.STATIC_AFTER_VISITS):
+        stats.record('es.mongabay.com', saw_challenge=False, grew=False, probed=True)
+    # Un daemon que muere sin llegar a save() conserva lo aprendido hasta el último guardado
+    assert HostStats(path=path).is_static('es.mongabay.com')
@@ -0,0 +1,12 @@
+# tests/test_publish.py
+
+import pytest
+
+pytest.importorskip("gspread")
+
+from publish import parse_tags
+
+
+def test_tag_slugs_fold_accents_instead_of_dropping_letters():
+    article = {'Etiquetas': 'Río, Ro, Educación,  rio , Año Nuevo, ¿?'}
+    assert parse_tags(article) == [('rio', 'Río'), ('ro', 'Ro'), ('educacion', 'Educación'), ('ano-nuevo', 'Año Nuevo')]
@@ -0,0 +1,67 @@
+# tests/test_site_builder.py
+
+import json
+import os
+
+from src.site_builder import (PublishManifest, build_search_index, content_hash, page_filename, paginate,
+                              search_terms, write_if_changed)
+
+
+def test_write_if_changed_skips_identical_bytes(tmp_path):
+    path = str(tmp_path / 'publicaciones' / 'uno.html')
+    assert write_if_changed(path, '<h1>Uno</h1>') is True
+    mtime = os.stat(path).st_mtime_ns
+    assert write_if_changed(path, '<h1>Uno</h1>') is False
+    assert os.stat(path).st_mtime_ns == mtime
+    assert write_if_changed(path, '<h1>Uno (editado)</h1>') is True
+    assert not os.path.exists(path + '.tmp')
+
+
+def test_manifest_tracks_hashes_and_drops_unpublished_slugs(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    manifest = PublishManifest(path)
+    assert manifest.changed('plantilla_articulo', content_hash('<html>v1</html>')) is True
+    manifest.entry('uno')['pagina'] = content_hash(['Uno', 'Autora'])
+    manifest.entry('dos')['pagina'] = content_hash(['Dos', 'Autora'])
+    manifest.save()
+
+    # Siguiente ejecución: 'dos' ya no está publicado en la hoja
+    manifest = PublishManifest(path)
+    assert manifest.changed('plantilla_articulo', content_hash('<html>v1</html>')) is False
+    assert manifest.entry('uno')['pagina'] == content_hash(['Uno', 'Autora'])
+    manifest.save()
+    assert PublishManifest(path).entry('dos') == {}
+
+
+def test_manifest_reports_outputs_not_generated_again(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    first, second = str(tmp_path / 'etiqueta-memoria.html'), str(tmp_path / 'publicaciones-2.html')
+    manifest = PublishManifest(path)
+    for output in (first, second):
+        assert manifest.output_changed(output, 'h1') is True
+        write_if_changed(output, 'x')
+    manifest.save()
+
+    manifest = PublishManifest(path)
+    assert manifest.output_changed(first, 'h1') is False
+    assert manifest.stale_outputs() == [second]
+    os.remove(first)
+    assert manifest.output_changed(first, 'h1') is True
+
+
+def test_pagination_keeps_first_page_name():
+    assert paginate([1, 2, 3, 4, 5], 2) == [[1, 2], [3, 4], [5]]
+    assert paginate([], 2) == [[]]
+    assert page_filename('publicaciones.html', 1) == 'publicaciones.html'
+    assert page_filename('etiqueta-memoria.html', 3) == 'etiqueta-memoria-3.html'
+
+
+def test_search_index_maps_folded_terms_to_docs():
+    assert search_terms('Educación y Memoria', None, 'la memoria del río') == ['educacion', 'memoria', 'rio']
+    docs = [
+        {'slug': 'uno', 'titulo': 'Uno', 'resumen': 'Memoria', 'etiquetas': ['Río'], 'terminos': ['memoria', 'rio']},
+        {'slug': 'dos', 'titulo': 'Dos', 'resumen': 'Río', 'etiquetas': [], 'terminos': ['rio']},
+    ]
+    index = json.loads(build_search_index(docs))
+    assert index['docs'][1] == ['dos', 'Dos', 'Río', []]
+    assert index['terminos'] == {'memoria': [0], 'rio': [0, 1]}
@@ -0,0 +1,45 @@
+# tests/test_static_fetcher.py
+
+import logging
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.page_readiness import HostStats
+from src.static_fetcher import TieredFetcher, needs_browser
+
+
+def test_rendered_article_is_served_statically():
+    html = '<html><head><meta property="og:image" content="https://x/a.jpg"></head><body><article><img src="a.jpg"></article></body></html>'
+    assert needs_browser(200, html) is None
+
+
+def test_challenge_pages_escalate():
+    assert needs_browser(503, '<html></html>') == 'reto'
+    assert needs_browser(200, '<html><title>Just a moment...</title><form id="challenge-form"></form></html>') == 'reto'
+
+
+def test_client_rendered_shells_escalate():
+    assert needs_browser(200, '<html><body><div id="__next"></div><script src="app.js"></script></body></html>') == 'spa'
+    assert needs_browser(200, '<html><body><noscript>Please enable JavaScript</noscript></body></html>') == 'noscript'
+    assert needs_browser(200, '<html><body><p>Sin imágenes</p></body></html>') == 'sin_imagenes'
+
+
+class FixedResponseClient:
+    """Cliente HTTP simulado que responde a todo con el mismo código y HTML."""
+
+    def __init__(self, status_code: int, html: str):
+        self.status_code, self.html = status_code, html
+
+    def get(self, url, headers=None, timeout=None):
+        return httpx.Response(self.status_code, text=self.html, headers={'content-type': 'text/html; charset=utf-8'},
+                              request=httpx.Request('GET', url))
+
+
+@pytest.mark.parametrize('status_code, pins_host', [(404, False), (410, False), (500, False), (403, True), (429, True)])
+def test_only_browser_fixable_failures_pin_the_host(status_code, pins_host):
+    host_stats = HostStats(path=None)
+    fetcher = TieredFetcher(logging.getLogger("test"), host_stats, client=FixedResponseClient(status_code, '<html><body>No encontrada</body></html>'))
+    assert fetcher.fetch('https://example.org/nota-borrada') is None
+    assert (host_stats.preferred_tier('example.org') == 'navegador') is pins_host
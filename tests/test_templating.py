@@ -0,0 +1,33 @@
+# tests/test_templating.py
+
+import pytest
+
+from src.templating import Template
+
+
+def test_render_escapes_values_except_raw_slots():
+    template = Template('<h1>{{TITULO}}</h1><div>{{ CONTENIDO|raw }}</div><p>{{AUTOR}}</p>', raw_slots=('AUTOR',))
+    assert template.slot_names == {'TITULO', 'CONTENIDO', 'AUTOR'}
+    page = template.render({'TITULO': 'Tierra & "agua"', 'CONTENIDO': '<p>Hola</p>', 'AUTOR': '<b>Ana</b>'})
+    assert page == '<h1>Tierra &amp; &quot;agua&quot;</h1><div><p>Hola</p></div><p><b>Ana</b></p>'
+
+
+def test_repeated_slots_and_non_string_values():
+    template = Template('{{N}}-{{N}}|{{X}}')
+    assert template.render({'N': 3, 'X': ''}) == '3-3|'
+    # Renderizar no altera los segmentos compilados
+    assert template.render({'N': 'a', 'X': 'b'}) == 'a-a|b'
+
+
+def test_missing_slot_raises_key_error():
+    with pytest.raises(KeyError):
+        Template('<p>{{TITULO}}</p>').render({})
+
+
+def test_matches_chained_replace_without_special_characters():
+    source = '<title>{{TITULO}}</title><h1>{{TITULO}}</h1><img src="{{IMAGEN_URL}}">{{CONTENIDOHTML}}'
+    values = {'TITULO': 'Artículo uno', 'IMAGEN_URL': 'https://cdn.example.org/1.jpg', 'CONTENIDOHTML': '<p>Texto</p>'}
+    legacy = source
+    for name, value in values.items():
+        legacy = legacy.replace('{{' + name + '}}', value)
+    assert Template(source, raw_slots=('CONTENIDOHTML',)).render(values) == legacy
@@ -0,0 +1,34 @@
+# tests/test_vision_cache.py
+
+import json
+import logging
+
+from src.vision_cache import VisionCache
+
+LOG = logging.getLogger("test")
+ANALYSIS = json.dumps({"tipo": "fotografia_principal", "es_relevante": True, "descripcion_ia": "Bosque amazónico.", "extra": 1})
+
+
+def test_hit_returns_only_curator_fields(tmp_path):
+    cache = VisionCache(LOG, version="v1", db_path=str(tmp_path / "vision.sqlite3"))
+    cache.put("abc", ANALYSIS)
+    assert json.loads(cache.get("abc")) == {"tipo": "fotografia_principal", "es_relevante": True, "descripcion_ia": "Bosque amazónico."}
+    assert cache.get("otro") is None
+    assert cache.counters['aciertos'] == 1 and cache.counters['fallos'] == 1
+    cache.close()
+
+
+def test_model_or_prompt_change_invalidates_entries(tmp_path):
+    db_path = str(tmp_path / "vision.sqlite3")
+    cache = VisionCache(LOG, version="v1", db_path=db_path)
+    cache.put("abc", ANALYSIS)
+    cache.close()
+
+    assert VisionCache(LOG, version="v2", db_path=db_path).get("abc") is None
+    assert VisionCache(LOG, version="v1", db_path=db_path).get("abc") is None
+
+
+def test_expired_entries_are_ignored(tmp_path):
+    cache = VisionCache(LOG, version="v1", db_path=str(tmp_path / "vision.sqlite3"), ttl_seconds=-1)
+    cache.put("abc", ANALYSIS)
+    assert cache.get("abc") is None